@@ -0,0 +1,183 @@
+"""
+Admission control with priority load shedding.
+
+``AdmissionMiddleware`` lets at most ``limit`` requests into the app at
+once. Requests beyond that wait in one FIFO queue per priority, and a freed
+slot always goes to the oldest request of the highest waiting priority. The
+queues hold ``queue_size`` requests in total: when they are full, a new
+request takes the place of the newest waiting request of a lower priority,
+or is turned away at once. Requests that are turned away, pushed out or
+left waiting longer than ``queue_timeout`` get a ``503`` with
+``Retry-After``, so an overloaded server answers quickly instead of letting
+every request time out.
+
+Priorities are assigned before routing, from the request alone:
+
+- high: requests to the admin-only routes that check an ``admin_id``
+  query parameter (rosters, force-deregistration, /admin), when it names
+  an admin. Other routes ignore the parameter, so it raises nothing there.
+  Roles are only read from the role cache, so classifying never waits on
+  storage; an admin not cached yet is classified like anyone else until
+  their first checked request.
+- normal: other writes (enrollments, deregistration, course changes)
+- low: other reads (the public catalog, schedules, profiles)
+
+``/health`` and ``/metrics`` are never queued, so the service can still be
+monitored while it sheds load. Like the request metrics, the controller is
+only used from the event loop thread and takes no locks.
+"""
+import asyncio
+import re
+from collections import deque
+from typing import Deque, Dict, List, Optional
+from urllib.parse import parse_qs
+from starlette.responses import JSONResponse
+from starlette.types import ASGIApp, Receive, Scope, Send
+from app.auth import role_cache
+from app.config import settings
+
+HIGH, NORMAL, LOW = 0, 1, 2
+PRIORITY_NAMES = ("high", "normal", "low")
+EXEMPT_PATHS = frozenset(("/health", "/metrics"))
+READ_METHODS = frozenset(("GET", "HEAD", "OPTIONS"))
+# "<method> <path>" of the routes that verify the ``admin_id`` query parameter
+ADMIN_ROUTES = re.compile("|".join((
+    r"GET /enrollments/",
+    r"GET /enrollments/course/\d+",
+    r"DELETE /enrollments/admin/\d+",
+    r"GET /enrollments/waitlist/\d+",
+    r"DELETE /courses/\d+",
+    r"[A-Z]+ /admin/.*",
+)))
+
+
+def classify(scope: Scope) -> Optional[int]:
+    """Priority of a request, or None if it bypasses admission control"""
+    if scope["path"] in EXEMPT_PATHS:
+        return None
+    query = scope.get("query_string", b"")
+    if b"admin_id=" in query and ADMIN_ROUTES.fullmatch(f"{scope['method']} {scope['path']}"):
+        values = parse_qs(query.decode("latin-1")).get("admin_id")
+        try:
+            if values and role_cache.peek(int(values[0])) == "admin":
+                return HIGH
+        except ValueError:
+            pass
+    return LOW if scope["method"] in READ_METHODS else NORMAL
+
+
+class AdmissionController:
+    """Concurrency limit with bounded per-priority wait queues"""
+
+    def __init__(self, limit: int, queue_size: int, queue_timeout: float):
+        self.limit = limit
+        self.queue_size = queue_size
+        self.queue_timeout = queue_timeout
+        self.active = 0
+        # Waiters per priority, oldest first. A waiter that gave up is left
+        # in place (cancelled) and skipped when reached; ``queued`` only
+        # counts live waiters.
+        self.queues: List[Deque[asyncio.Future]] = [deque() for _ in PRIORITY_NAMES]
+        self.queued = 0
+        self.admitted = [0] * len(PRIORITY_NAMES)
+        self.rejected = [0] * len(PRIORITY_NAMES)
+
+    async def acquire(self, priority: int) -> bool:
+        """Wait for a slot; False if the request should be rejected"""
+        if self.active < self.limit and not self.queued:
+            self.active += 1
+            self.admitted[priority] += 1
+            return True
+        if self.queued >= self.queue_size and not self._shed_below(priority):
+            self.rejected[priority] += 1
+            return False
+
+        waiter = asyncio.get_running_loop().create_future()
+        self.queues[priority].append(waiter)
+        self.queued += 1
+        try:
+            granted = await asyncio.wait_for(waiter, self.queue_timeout)
+        except asyncio.TimeoutError:
+            self._abandon(waiter)
+            granted = False
+        except BaseException:
+            self._abandon(waiter)
+            raise
+        if granted:
+            self.admitted[priority] += 1
+        else:
+            self.rejected[priority] += 1
+        return granted
+
+    def _abandon(self, waiter: asyncio.Future):
+        if not waiter.done() or waiter.cancelled():
+            waiter.cancel()
+            self.queued -= 1
+        elif waiter.result():
+            # Handed a slot just as it gave up: pass the slot on
+            self.release()
+
+    def _shed_below(self, priority: int) -> bool:
+        """Push out the newest waiter of the lowest priority below ``priority``"""
+        for level in range(len(self.queues) - 1, priority, -1):
+            queue = self.queues[level]
+            while queue:
+                waiter = queue.pop()
+                if not waiter.done():
+                    self.queued -= 1
+                    waiter.set_result(False)
+                    return True
+        return False
+
+    def release(self):
+        """Hand the slot to the next waiter, or free it"""
+        for queue in self.queues:
+            while queue:
+                waiter = queue.popleft()
+                if not waiter.done():
+                    self.queued -= 1
+                    waiter.set_result(True)
+                    return
+        self.active -= 1
+
+    def waiting(self) -> Dict[str, int]:
+        """Live waiters per priority"""
+        return {
+            name: sum(not waiter.done() for waiter in queue)
+            for name, queue in zip(PRIORITY_NAMES, self.queues)
+        }
+
+
+class AdmissionMiddleware:
+    """ASGI middleware admitting requests through an ``AdmissionController``"""
+
+    def __init__(self, app: ASGIApp, controller: AdmissionController, retry_after: int = 1):
+        self.app = app
+        self.controller = controller
+        self.retry_after = retry_after
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        priority = classify(scope) if scope["type"] == "http" else None
+        if priority is None:
+            await self.app(scope, receive, send)
+            return
+
+        if not await self.controller.acquire(priority):
+            response = JSONResponse(
+                {"detail": "Server is overloaded, please retry later"},
+                status_code=503,
+                headers={"Retry-After": str(self.retry_after)}
+            )
+            await response(scope, receive, send)
+            return
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            self.controller.release()
+
+
+admission_controller = AdmissionController(
+    limit=settings.admission_limit,
+    queue_size=settings.admission_queue_size,
+    queue_timeout=settings.admission_queue_timeout
+)
@@ -0,0 +1,90 @@
+import asyncio
+import functools
+from typing import Any, Callable, List, Optional
+import anyio
+from app.config import settings
+from app.database import db
+from app.tracing import StorageStats, storage_stats, traced_call
+
+
+class AsyncDatabase:
+    """
+    Async view of a storage backend, used by the route handlers.
+
+    Every public backend method is available as a coroutine with the same
+    signature. Backends that only touch memory (``blocking = False``) are
+    called inline on the event loop, which avoids a threadpool hop per
+    call. Backends that do blocking I/O are run on worker threads, with at
+    most ``max_blocking_calls`` in flight at once.
+
+    With ``stats`` set, every call is timed and counted there (see
+    app/tracing.py).
+
+    The coroutine wrapping a method is built on first use and kept in the
+    instance ``__dict__``, so later calls skip ``__getattr__`` entirely.
+    Assigning ``backend`` drops the cached wrappers.
+    """
+
+    def __init__(
+        self, backend: Any, max_blocking_calls: int, stats: Optional[StorageStats] = None
+    ):
+        self._wrapped: List[str] = []
+        self.backend = backend
+        self.max_blocking_calls = max_blocking_calls
+        self.stats = stats
+        self._limiter: Optional[anyio.CapacityLimiter] = None
+        self._limiter_loop: Optional[asyncio.AbstractEventLoop] = None
+
+    @property
+    def backend(self) -> Any:
+        return self._backend
+
+    @backend.setter
+    def backend(self, backend: Any):
+        self._backend = backend
+        for name in self._wrapped:
+            del self.__dict__[name]
+        self._wrapped.clear()
+
+    def _get_limiter(self) -> anyio.CapacityLimiter:
+        # Limiters are bound to the event loop they are first used on
+        loop = asyncio.get_running_loop()
+        if self._limiter is None or self._limiter_loop is not loop:
+            self._limiter = anyio.CapacityLimiter(self.max_blocking_calls)
+            self._limiter_loop = loop
+        return self._limiter
+
+    async def run(self, func: Callable, *args, **kwargs):
+        """Run a backend callable without blocking the event loop"""
+        if not getattr(self.backend, "blocking", True):
+            return func(*args, **kwargs)
+        return await anyio.to_thread.run_sync(
+            functools.partial(func, *args, **kwargs),
+            limiter=self._get_limiter()
+        )
+
+    def __getattr__(self, name: str):
+        if name in ("_backend", "_wrapped"):
+            # Read before __init__ set them; never proxied
+            raise AttributeError(name)
+        method = getattr(self.backend, name)
+        if name.startswith("_") or not callable(method):
+            return method
+
+        @functools.wraps(method)
+        async def call(*args, **kwargs):
+            if self.stats is None:
+                return await self.run(method, *args, **kwargs)
+            return await traced_call(self.stats, name, self.run, method, *args, **kwargs)
+
+        self.__dict__[name] = call
+        self._wrapped.append(name)
+        return call
+
+
+# Async view of the global database instance
+async_db = AsyncDatabase(
+    db,
+    max_blocking_calls=settings.blocking_call_limit,
+    stats=storage_stats if settings.storage_tracing else None
+)
@@ -0,0 +1,60 @@
+"""
+Role checks shared by the routers.
+
+``verify_admin`` and ``verify_student`` can be called directly (when the
+user id comes from a request body) or used as FastAPI dependencies (when
+it is an ``admin_id`` query parameter). Roles are served from a
+``RoleCache`` that is invalidated by the storage backend's user listeners.
+"""
+from typing import Optional
+from fastapi import HTTPException, status
+from app.async_database import async_db
+from app.config import settings
+from app.database import db
+from app.role_cache import RoleCache
+
+role_cache = RoleCache(capacity=settings.role_cache_size)
+db.user_listeners.append(role_cache.invalidate)
+
+
+async def get_role(user_id: int) -> Optional[str]:
+    """Return the user's role, or None if the user does not exist"""
+    role = role_cache.get(user_id)
+    if role is None:
+        generation = role_cache.generation
+        user = await async_db.get_user(user_id)
+        if user is None:
+            return None
+        role = user.role
+        role_cache.put(user_id, role, generation)
+    return role
+
+
+async def verify_admin(admin_id: int):
+    """Verify that ``admin_id`` names an admin"""
+    role = await get_role(admin_id)
+    if role is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Admin user not found"
+        )
+    if role != "admin":
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Only admins can perform this action"
+        )
+
+
+async def verify_student(user_id: int):
+    """Verify that ``user_id`` names a student"""
+    role = await get_role(user_id)
+    if role is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="User not found"
+        )
+    if role != "student":
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Only students can perform this action"
+        )
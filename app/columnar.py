@@ -0,0 +1,161 @@
+"""
+Column-oriented storage for the enrollments table.
+
+An enrollment is three integers, so instead of one pydantic object per row
+the table keeps parallel ``array('q')`` columns (8 bytes per value) and
+builds EnrollmentRecord objects only when rows leave the Database. Rows are
+appended in id order, so the id column stays sorted and doubles as the
+id -> slot map via binary search. Deletes overwrite the slot's user id
+with a tombstone; once tombstones make up half of the table the columns are
+compacted in place.
+"""
+from array import array
+from bisect import bisect_left, bisect_right
+from itertools import compress
+from typing import Iterable, List, MutableMapping, Optional, Sequence, Set, Tuple
+from app.records import EnrollmentRecord
+from app.tracing import examined
+
+DELETED = -1
+
+
+class EnrollmentTable:
+    """Enrollment rows stored as id, user_id and course_id columns"""
+
+    def __init__(
+        self,
+        ids: Optional[array] = None,
+        user_ids: Optional[array] = None,
+        course_ids: Optional[array] = None
+    ):
+        self.ids = array("q") if ids is None else ids
+        self.user_ids = array("q") if user_ids is None else user_ids
+        self.course_ids = array("q") if course_ids is None else course_ids
+        self.dead = 0
+
+    def __len__(self) -> int:
+        return len(self.ids) - self.dead
+
+    def _slot(self, enrollment_id: int) -> Optional[int]:
+        ids = self.ids
+        slot = bisect_left(ids, enrollment_id)
+        if slot < len(ids) and ids[slot] == enrollment_id and self.user_ids[slot] != DELETED:
+            return slot
+        return None
+
+    def _build(self, slot: int) -> EnrollmentRecord:
+        return EnrollmentRecord(self.ids[slot], self.user_ids[slot], self.course_ids[slot])
+
+    def append(self, enrollment_id: int, user_id: int, course_id: int):
+        if self.ids and enrollment_id <= self.ids[-1]:
+            raise ValueError(f"Enrollment id {enrollment_id} is not above the last id")
+        self.ids.append(enrollment_id)
+        self.user_ids.append(user_id)
+        self.course_ids.append(course_id)
+
+    def __contains__(self, enrollment_id: int) -> bool:
+        return self._slot(enrollment_id) is not None
+
+    def get(self, enrollment_id: int) -> Optional[EnrollmentRecord]:
+        slot = self._slot(enrollment_id)
+        return None if slot is None else self._build(slot)
+
+    def row(self, enrollment_id: int) -> Optional[Tuple[int, int]]:
+        """Return (user_id, course_id) without building a model"""
+        slot = self._slot(enrollment_id)
+        return None if slot is None else (self.user_ids[slot], self.course_ids[slot])
+
+    def select(self, enrollment_ids: Iterable[int]) -> List[EnrollmentRecord]:
+        """Build records for ``enrollment_ids``, which must all be live"""
+        ids, build = self.ids, self._build
+        return [build(bisect_left(ids, i)) for i in enrollment_ids]
+
+    def page(self, after_id: Optional[int] = None, limit: Optional[int] = None) -> List[EnrollmentRecord]:
+        ids, user_ids = self.ids, self.user_ids
+        start = bisect_right(ids, after_id) if after_id is not None else 0
+        rows = []
+        slot = start - 1
+        for slot in range(start, len(ids)):
+            if user_ids[slot] != DELETED:
+                rows.append(self._build(slot))
+                if limit is not None and len(rows) >= limit:
+                    break
+        # Tombstoned slots walked past count as examined too
+        examined(slot - start + 1)
+        return rows
+
+    def pair_keys(self) -> Set[int]:
+        """``pair_key`` of every live row, for rebuilding the pair index"""
+        return {
+            pair_key(user_id, course_id)
+            for user_id, course_id in zip(self.user_ids, self.course_ids)
+            if user_id != DELETED
+        }
+
+    def remove(self, enrollment_id: int) -> Optional[Tuple[int, int]]:
+        """Delete a row, returning its (user_id, course_id) if it existed"""
+        slot = self._slot(enrollment_id)
+        if slot is None:
+            return None
+        row = (self.user_ids[slot], self.course_ids[slot])
+        self.user_ids[slot] = DELETED
+        self.dead += 1
+        if self.dead * 2 > len(self.ids):
+            self.compact()
+        return row
+
+    def compact(self):
+        """Drop tombstoned slots, reusing the existing column objects"""
+        if not self.dead:
+            return
+        live = [u != DELETED for u in self.user_ids]
+        for column in (self.ids, self.user_ids, self.course_ids):
+            column[:] = array("q", compress(column, live))
+        self.dead = 0
+
+    def copy(self) -> "EnrollmentTable":
+        """Compacted copy of the columns (for export_state)"""
+        columns = (self.ids, self.user_ids, self.course_ids)
+        if self.dead:
+            live = [u != DELETED for u in self.user_ids]
+            return EnrollmentTable(*(array("q", compress(c, live)) for c in columns))
+        return EnrollmentTable(*(array("q", c) for c in columns))
+
+    def columns(self) -> Tuple[array, array, array]:
+        """The id, user_id and course_id columns; only valid when compacted"""
+        if self.dead:
+            raise ValueError("Table has deleted slots; compact or copy it first")
+        return self.ids, self.user_ids, self.course_ids
+
+
+def pair_key(user_id: int, course_id: int) -> int:
+    """Pack a (user_id, course_id) pair into one int; ids must fit in 32 bits"""
+    return (user_id << 32) | course_id
+
+
+def add_to_group(index: MutableMapping[int, array], group: int, enrollment_id: int):
+    """Append to a group's id list; ids arrive in increasing order"""
+    ids = index.get(group)
+    if ids is None:
+        index[group] = array("q", (enrollment_id,))
+    else:
+        ids.append(enrollment_id)
+
+
+def remove_from_group(index: MutableMapping[int, array], group: int, enrollment_id: int):
+    ids = index.get(group)
+    if ids is None:
+        return
+    position = bisect_left(ids, enrollment_id)
+    if position < len(ids) and ids[position] == enrollment_id:
+        del ids[position]
+        if not ids:
+            del index[group]
+
+
+def page_group(ids: Optional[Sequence[int]], after_id: Optional[int], limit: Optional[int]) -> Sequence[int]:
+    """Keyset page of a sorted group id list"""
+    if not ids:
+        return ()
+    start = bisect_right(ids, after_id) if after_id is not None else 0
+    return ids[start:] if limit is None else ids[start:start + limit]
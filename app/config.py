@@ -0,0 +1,68 @@
+import os
+
+
+def _env_bool(name: str, default: bool) -> bool:
+    value = os.environ.get(name)
+    if not value:
+        return default
+    return value.strip().lower() in ("1", "true", "yes", "on")
+
+
+def _env_int(name: str, default: int) -> int:
+    value = os.environ.get(name)
+    return int(value) if value else default
+
+
+def _env_float(name: str, default: float) -> float:
+    value = os.environ.get(name)
+    return float(value) if value else default
+
+
+class Settings:
+    """Application settings, read from environment variables at startup"""
+
+    def __init__(self):
+        # Storage backend: "memory" (default) or "sqlite"
+        self.database_backend = os.environ.get("DATABASE_BACKEND", "memory")
+        # Database file used by the sqlite backend
+        self.sqlite_path = os.environ.get("SQLITE_PATH", "enrollment.db")
+        # Case-fold emails and course codes before checking uniqueness
+        self.normalize_keys = _env_bool("NORMALIZE_KEYS", False)
+        # Directory for the in-memory backend's journal and snapshots;
+        # durability is disabled when empty
+        self.journal_dir = os.environ.get("JOURNAL_DIR", "")
+        # Group commit interval for journal fsyncs
+        self.journal_flush_interval = _env_float("JOURNAL_FLUSH_INTERVAL", 0.01)
+        # Seconds between snapshots, and journal records that force one early
+        self.snapshot_interval = _env_float("SNAPSHOT_INTERVAL", 300.0)
+        self.snapshot_max_journal_records = _env_int("SNAPSHOT_MAX_JOURNAL_RECORDS", 100000)
+        # Maximum number of blocking storage calls running on worker
+        # threads at once (only used by backends that do blocking I/O)
+        self.blocking_call_limit = _env_int("BLOCKING_CALL_LIMIT", 40)
+        # Serve course reads from cached JSON. Invalidation only sees this
+        # process's writes, so it is off by default for the sqlite backend,
+        # whose file may be shared by several workers
+        self.course_cache = _env_bool("COURSE_CACHE", self.database_backend == "memory")
+        # Entries kept by the user id -> role cache behind the auth checks
+        self.role_cache_size = _env_int("ROLE_CACHE_SIZE", 10000)
+        # Record per-route request metrics and serve them at /metrics
+        self.metrics = _env_bool("METRICS", True)
+        # Time and count storage calls per method (GET /admin/storage) and
+        # send per-request storage time in a Server-Timing header
+        self.storage_tracing = _env_bool("STORAGE_TRACING", True)
+        # Profile requests sent with an ``X-Profile: <admin id>`` header,
+        # plus this fraction of all requests; keep the latest profiles
+        self.profiling = _env_bool("PROFILING", False)
+        self.profile_sample_rate = _env_float("PROFILE_SAMPLE_RATE", 0.0)
+        self.profile_buffer_size = _env_int("PROFILE_BUFFER_SIZE", 50)
+        # Admission control: at most ADMISSION_LIMIT requests are handled at
+        # once (0 disables it); up to ADMISSION_QUEUE_SIZE more wait, by
+        # priority, for at most ADMISSION_QUEUE_TIMEOUT seconds. Requests
+        # that cannot wait get a 503 with Retry-After: ADMISSION_RETRY_AFTER
+        self.admission_limit = _env_int("ADMISSION_LIMIT", 64)
+        self.admission_queue_size = _env_int("ADMISSION_QUEUE_SIZE", 256)
+        self.admission_queue_timeout = _env_float("ADMISSION_QUEUE_TIMEOUT", 2.0)
+        self.admission_retry_after = _env_int("ADMISSION_RETRY_AFTER", 1)
+
+
+settings = Settings()
@@ -0,0 +1,65 @@
+"""
+Cache of encoded JSON responses for the public course catalog.
+
+``GET /courses/`` (unpaginated) and ``GET /courses/{id}`` serve these bytes
+directly. Entries are dropped by the storage backend's course listeners,
+which fire on every course create, update and delete, and on reset.
+
+A fill records the cache generation before reading from storage and is
+discarded if any invalidation happened since, so a response encoded from
+a row that changed mid-request is never stored.
+"""
+import threading
+from typing import Dict, Iterable, List, Optional
+from pydantic import TypeAdapter
+from app.config import settings
+from app.database import db
+from app.models import Course
+
+_listing_adapter = TypeAdapter(List[Course])
+
+
+class CourseCache:
+    """Encoded course bodies keyed by id, plus the full listing"""
+
+    def __init__(self, enabled: bool = True):
+        self.enabled = enabled
+        self._lock = threading.Lock()
+        self.generation = 0
+        self._courses: Dict[int, bytes] = {}
+        self._listing: Optional[bytes] = None
+
+    def invalidate(self, course_id: Optional[int] = None):
+        """Drop one course (or all when None) and the listing"""
+        with self._lock:
+            self.generation += 1
+            self._listing = None
+            if course_id is None:
+                self._courses.clear()
+            else:
+                self._courses.pop(course_id, None)
+
+    def get(self, course_id: int) -> Optional[bytes]:
+        return self._courses.get(course_id)
+
+    def get_listing(self) -> Optional[bytes]:
+        return self._listing
+
+    def store(self, course, generation: int) -> bytes:
+        """Encode ``course`` and keep it unless the cache changed since ``generation``"""
+        body = Course.model_validate(course).model_dump_json().encode()
+        with self._lock:
+            if self.enabled and generation == self.generation:
+                self._courses[course.id] = body
+        return body
+
+    def store_listing(self, courses: Iterable, generation: int) -> bytes:
+        body = _listing_adapter.dump_json(_listing_adapter.validate_python(list(courses)))
+        with self._lock:
+            if self.enabled and generation == self.generation:
+                self._listing = body
+        return body
+
+
+course_cache = CourseCache(enabled=settings.course_cache)
+db.course_listeners.append(course_cache.invalidate)
@@ -1,133 +1,768 @@
-from typing import List, Optional
-from app.models import User, Course, Enrollment
+import time
+from array import array
+from bisect import bisect_right
+from collections import OrderedDict
+from contextlib import contextmanager
+from itertools import chain, count
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Sequence, Set, Tuple
+from app.columnar import (
+    EnrollmentTable, add_to_group, page_group, pair_key, remove_from_group
+)
+from app.config import Settings, settings
+from app.locks import RWLock
+from app.records import (
+    UserRecord, CourseRecord, EnrollmentRecord, EnrollOutcome, SeatCount,
+    ENROLLED, WAITLISTED, ALREADY_ENROLLED, ALREADY_WAITLISTED, COURSE_NOT_FOUND,
+    COURSE_FULL, UNCHANGED
+)
+from app.tracing import examined
+
+
+class KeyOrder:
+    """
+    Ascending list of a table's ids, used to seek to a keyset position.
+
+    Deletes only count a tombstone; the list is compacted once dead ids make
+    up half of it, so both deletes and seeks stay cheap on average. ``base``
+    is an optional read-only prefix of ids (a mapped snapshot column); ids
+    appended later are always larger.
+    """
+
+    def __init__(self, base: Sequence[int] = ()):
+        self.base = base
+        self.ids: List[int] = []
+        self.dead = 0
+
+    def append(self, row_id: int):
+        self.ids.append(row_id)
+
+    def discard(self, table: Dict[int, object]):
+        self.dead += 1
+        if self.dead * 2 > len(self.base) + len(self.ids):
+            self.ids = [i for i in chain(self.base, self.ids) if i in table]
+            self.base = ()
+            self.dead = 0
+
+    def page(self, table: Dict[int, object], after_id: Optional[int], limit: Optional[int]) -> list:
+        rows = []
+        visited = 0
+        for ids in (self.base, self.ids):
+            start = bisect_right(ids, after_id) if after_id is not None else 0
+            for i in range(start, len(ids)):
+                visited += 1
+                row = table.get(ids[i])
+                if row is not None:
+                    rows.append(row)
+                    if limit is not None and len(rows) >= limit:
+                        examined(visited)
+                        return rows
+        # Dead ids walked past count as examined too
+        examined(visited)
+        return rows
 
 
 class Database:
-    def __init__(self):
-        self.users: List[User] = []
-        self.courses: List[Course] = []
-        self.enrollments: List[Enrollment] = []
+    """
+    In-memory store, safe for use from FastAPI's threadpool.
+
+    Each table (users, courses, enrollments) is guarded by its own
+    reader/writer lock together with its indexes and id counter, so reads
+    only wait for writes to the same table. Methods that touch several
+    tables acquire the locks in that fixed order to avoid deadlocks. The
+    try_* methods combine a uniqueness check with the insert under a single
+    write lock, so concurrent requests cannot both pass the check.
+
+    Courses may have a capacity. Seats are counted from the course's
+    enrollment index and only taken under the enrollment write lock, so a
+    course can never be oversold; students turned away join a per-course
+    FIFO waitlist (guarded by the same lock) and are promoted as seats free.
+    """
+
+    # Calls never wait on I/O, so async callers may run them inline
+    blocking = False
+
+    def __init__(self, normalize_keys: bool = False):
+        # Always acquired in this order: users, courses, enrollments
+        self.user_lock = RWLock()
+        self.course_lock = RWLock()
+        self.enrollment_lock = RWLock()
+        # Optional durability (see app/journal.py); when set, every mutation
+        # is appended to the journal while its table lock is still held
+        self.durability = None
+        # Called with a row id (or None for every row) whenever the users or
+        # courses table changes, while its write lock is held; used to
+        # invalidate the role cache and cached course responses
+        self.user_listeners: List[Callable[[Optional[int]], None]] = []
+        self.course_listeners: List[Callable[[Optional[int]], None]] = []
+        # Change counters for conditional GETs, per table and per student /
+        # course enrollment set. All are drawn from one clock that is never
+        # reset, so a value is never reused for different contents; the
+        # epoch tells this process's versions apart from a previous run's.
+        self.version_epoch = time.time_ns()
+        self._version_clock = count(1)
+        self.table_versions = dict.fromkeys(("users", "courses", "enrollments"), 0)
+        self.student_versions: Dict[int, int] = {}
+        self.course_enrollment_versions: Dict[int, int] = {}
+        self._group_version_base = 0
+        # When enabled, emails and course codes are case-folded before they
+        # are indexed, so "CS101" and "cs101" are treated as the same code.
+        self.normalize_keys = normalize_keys
+        # Users and courses are keyed by primary id. Ids are handed out in
+        # increasing order and dicts preserve insertion order, so iterating a
+        # table still yields rows in creation order. Rows are plain records
+        # (app/records.py); response models are built from them by the
+        # routers. Enrollments are stored column-wise (see app/columnar.py)
+        # and only built into records on the way out.
+        self.users: Dict[int, UserRecord] = {}
+        self.courses: Dict[int, CourseRecord] = {}
+        self.enrollments = EnrollmentTable()
+        # Unique secondary indexes: email -> user id, code -> course id
+        self.email_index: Dict[str, int] = {}
+        self.course_code_index: Dict[str, int] = {}
+        # Enrollment adjacency indexes: ascending enrollment ids per student
+        # and per course
+        self.enrollments_by_student: Dict[int, array] = {}
+        self.enrollments_by_course: Dict[int, array] = {}
+        # Enrolled (student, course) pairs packed by pair_key, for O(1)
+        # duplicate checks; rebuilt from the columns when a snapshot is attached
+        self.enrollment_pairs: Set[int] = set()
+        # Waitlists of full courses: course id -> user ids in arrival order.
+        # Guarded by the enrollment lock; empty queues are dropped.
+        self.waitlists: Dict[int, "OrderedDict[int, None]"] = {}
+        # Id order per table, for keyset pagination (the enrollment id
+        # column is already ordered)
+        self.user_order = KeyOrder()
+        self.course_order = KeyOrder()
         self.user_id_counter = 1
         self.course_id_counter = 1
         self.enrollment_id_counter = 1
 
     def reset(self):
         """Reset all data - useful for testing"""
-        self.users = []
-        self.courses = []
-        self.enrollments = []
+        with self._all_write():
+            self._clear()
+            self._log("reset")
+
+    def close(self):
+        """Flush and stop durability, if enabled"""
+        if self.durability is not None:
+            self.durability.close()
+            self.durability = None
+
+    @contextmanager
+    def _all_write(self) -> Iterator[None]:
+        with self.user_lock.write, self.course_lock.write, self.enrollment_lock.write:
+            yield
+
+    @contextmanager
+    def frozen(self) -> Iterator[None]:
+        """Block all writes (but not reads) while the block runs"""
+        with self.user_lock.read, self.course_lock.read, self.enrollment_lock.read:
+            yield
+
+    def _log(self, op: str, **fields: Any):
+        if self.durability is not None:
+            self.durability.journal.append(op, fields)
+
+    def _user_changed(self, user_id: Optional[int]):
+        self.table_versions["users"] = next(self._version_clock)
+        for listener in self.user_listeners:
+            listener(user_id)
+
+    def _course_changed(self, course_id: Optional[int]):
+        self.table_versions["courses"] = next(self._version_clock)
+        for listener in self.course_listeners:
+            listener(course_id)
+
+    def _clear(self):
+        self.users = {}
+        self.courses = {}
+        self.enrollments = EnrollmentTable()
+        self.email_index = {}
+        self.course_code_index = {}
+        self.enrollments_by_student = {}
+        self.enrollments_by_course = {}
+        self.enrollment_pairs = set()
+        self.waitlists = {}
+        self.user_order = KeyOrder()
+        self.course_order = KeyOrder()
         self.user_id_counter = 1
         self.course_id_counter = 1
         self.enrollment_id_counter = 1
+        self._user_changed(None)
+        self._course_changed(None)
+        version = next(self._version_clock)
+        self.table_versions = dict.fromkeys(("users", "courses", "enrollments"), version)
+        self.student_versions = {}
+        self.course_enrollment_versions = {}
+        self._group_version_base = version
+
+    def _enrollment_changed(self, user_id: int, course_id: int):
+        version = next(self._version_clock)
+        self.table_versions["enrollments"] = version
+        self.student_versions[user_id] = version
+        self.course_enrollment_versions[course_id] = version
+
+    def _index_key(self, value: str) -> str:
+        return value.casefold() if self.normalize_keys else value
+
+    def _is_enrolled(self, user_id: int, course_id: int) -> bool:
+        return pair_key(user_id, course_id) in self.enrollment_pairs
 
     # User operations
-    def create_user(self, name: str, email: str, role: str) -> User:
-        user = User(
-            id=self.user_id_counter,
+    def create_user(self, name: str, email: str, role: str) -> UserRecord:
+        with self.user_lock.write:
+            return self._insert_user(name, email, role)
+
+    def try_create_user(self, name: str, email: str, role: str) -> Optional[UserRecord]:
+        """Atomically create a user unless the email is taken (returns None)"""
+        with self.user_lock.write:
+            if self._index_key(email) in self.email_index:
+                return None
+            return self._insert_user(name, email, role)
+
+    def _insert_user(
+        self, name: str, email: str, role: str, user_id: Optional[int] = None
+    ) -> UserRecord:
+        user = UserRecord(
+            id=self.user_id_counter if user_id is None else user_id,
             name=name,
             email=email,
             role=role
         )
-        self.users.append(user)
-        self.user_id_counter += 1
+        self.users[user.id] = user
+        self.email_index[self._index_key(email)] = user.id
+        self.user_order.append(user.id)
+        self.user_id_counter = max(self.user_id_counter, user.id + 1)
+        self._log("create_user", id=user.id, name=name, email=email, role=role)
+        self._user_changed(user.id)
         return user
 
-    def get_user(self, user_id: int) -> Optional[User]:
-        for user in self.users:
-            if user.id == user_id:
-                return user
-        return None
+    def create_users(self, rows: List[Tuple[str, str, str]]) -> List[Optional[UserRecord]]:
+        """
+        Insert many (name, email, role) rows in one pass.
+
+        Rows whose email is already stored, or repeats an earlier row in the
+        batch, are skipped and reported as None at their position.
+        """
+        created: List[Optional[UserRecord]] = []
+        with self.user_lock.write:
+            for name, email, role in rows:
+                if self._index_key(email) in self.email_index:
+                    created.append(None)
+                else:
+                    created.append(self._insert_user(name, email, role))
+        return created
+
+    def get_user(self, user_id: int) -> Optional[UserRecord]:
+        with self.user_lock.read:
+            return self.users.get(user_id)
+
+    def get_users(self, user_ids: Iterable[int]) -> Dict[int, UserRecord]:
+        """Look up many users at once; missing ids are left out"""
+        with self.user_lock.read:
+            users = self.users
+            return {i: users[i] for i in user_ids if i in users}
 
-    def get_all_users(self) -> List[User]:
-        return self.users.copy()
+    def get_all_users(
+        self, after_id: Optional[int] = None, limit: Optional[int] = None
+    ) -> List[UserRecord]:
+        with self.user_lock.read:
+            return self.user_order.page(self.users, after_id, limit)
 
     def email_exists(self, email: str) -> bool:
-        return any(user.email == email for user in self.users)
+        with self.user_lock.read:
+            return self._index_key(email) in self.email_index
 
     # Course operations
-    def create_course(self, title: str, code: str) -> Course:
-        course = Course(
-            id=self.course_id_counter,
+    def create_course(self, title: str, code: str, capacity: Optional[int] = None) -> CourseRecord:
+        with self.course_lock.write:
+            return self._insert_course(title, code, capacity)
+
+    def try_create_course(
+        self, title: str, code: str, capacity: Optional[int] = None
+    ) -> Optional[CourseRecord]:
+        """Atomically create a course unless the code is taken (returns None)"""
+        with self.course_lock.write:
+            if self._index_key(code) in self.course_code_index:
+                return None
+            return self._insert_course(title, code, capacity)
+
+    def _insert_course(
+        self, title: str, code: str, capacity: Optional[int] = None,
+        course_id: Optional[int] = None
+    ) -> CourseRecord:
+        course = CourseRecord(
+            id=self.course_id_counter if course_id is None else course_id,
             title=title,
-            code=code
+            code=code,
+            capacity=capacity
         )
-        self.courses.append(course)
-        self.course_id_counter += 1
+        self.courses[course.id] = course
+        self.course_code_index[self._index_key(code)] = course.id
+        self.course_order.append(course.id)
+        self.course_id_counter = max(self.course_id_counter, course.id + 1)
+        self._log("create_course", id=course.id, title=title, code=code, capacity=capacity)
+        self._course_changed(course.id)
         return course
 
-    def get_course(self, course_id: int) -> Optional[Course]:
-        for course in self.courses:
-            if course.id == course_id:
-                return course
-        return None
+    def create_courses(
+        self, rows: List[Tuple[str, str, Optional[int]]]
+    ) -> List[Optional[CourseRecord]]:
+        """
+        Insert many (title, code, capacity) rows in one pass.
+
+        Rows whose code is already stored, or repeats an earlier row in the
+        batch, are skipped and reported as None at their position.
+        """
+        created: List[Optional[CourseRecord]] = []
+        with self.course_lock.write:
+            for title, code, capacity in rows:
+                if self._index_key(code) in self.course_code_index:
+                    created.append(None)
+                else:
+                    created.append(self._insert_course(title, code, capacity))
+        return created
+
+    def get_course(self, course_id: int) -> Optional[CourseRecord]:
+        with self.course_lock.read:
+            return self.courses.get(course_id)
 
-    def get_all_courses(self) -> List[Course]:
-        return self.courses.copy()
+    def get_courses(self, course_ids: Iterable[int]) -> Dict[int, CourseRecord]:
+        """Look up many courses at once; missing ids are left out"""
+        with self.course_lock.read:
+            courses = self.courses
+            return {i: courses[i] for i in course_ids if i in courses}
+
+    def get_all_courses(
+        self, after_id: Optional[int] = None, limit: Optional[int] = None
+    ) -> List[CourseRecord]:
+        with self.course_lock.read:
+            return self.course_order.page(self.courses, after_id, limit)
+
+    def _code_owner_conflicts(self, code: str, exclude_id: Optional[int]) -> bool:
+        owner_id = self.course_code_index.get(self._index_key(code))
+        return owner_id is not None and owner_id != exclude_id
 
     def course_code_exists(self, code: str, exclude_id: Optional[int] = None) -> bool:
-        for course in self.courses:
-            if course.code == code and course.id != exclude_id:
-                return True
-        return False
-
-    def update_course(self, course_id: int, title: str, code: str) -> Optional[Course]:
-        for course in self.courses:
-            if course.id == course_id:
-                course.title = title
-                course.code = code
-                return course
-        return None
+        with self.course_lock.read:
+            return self._code_owner_conflicts(code, exclude_id)
+
+    def update_course(
+        self, course_id: int, title: str, code: str, capacity: Optional[int] = UNCHANGED
+    ) -> Optional[CourseRecord]:
+        with self.course_lock.write, self.enrollment_lock.write:
+            course = self._apply_course_update(course_id, title, code, capacity)
+            self._promote(course_id)
+            return course
 
-    def delete_course(self, course_id: int) -> bool:
-        for i, course in enumerate(self.courses):
-            if course.id == course_id:
-                del self.courses[i]
-                # Also delete all enrollments for this course
-                self.enrollments = [
-                    e for e in self.enrollments if e.course_id != course_id
-                ]
-                return True
-        return False
+    def try_update_course(
+        self, course_id: int, title: str, code: str, capacity: Optional[int] = UNCHANGED
+    ) -> Optional[CourseRecord]:
+        """
+        Atomically update a course unless its new code belongs to another
+        course. Returns None if the course is missing or the code is taken.
+        The seat limit is kept unless ``capacity`` is given (None removes
+        it). Raising the capacity promotes waitlisted students into the new
+        seats; lowering it below the current enrollment only stops new
+        enrollments.
+        """
+        with self.course_lock.write, self.enrollment_lock.write:
+            if self._code_owner_conflicts(code, course_id):
+                return None
+            course = self._apply_course_update(course_id, title, code, capacity)
+            self._promote(course_id)
+            return course
+
+    def _apply_course_update(
+        self, course_id: int, title: str, code: str, capacity: Optional[int]
+    ) -> Optional[CourseRecord]:
+        course = self.courses.get(course_id)
+        if course is None:
+            return None
+        if capacity is UNCHANGED:
+            capacity = course.capacity
+        old_key = self._index_key(course.code)
+        new_key = self._index_key(code)
+        if old_key != new_key:
+            if self.course_code_index.get(old_key) == course_id:
+                del self.course_code_index[old_key]
+            self.course_code_index[new_key] = course_id
+        course.title = title
+        course.code = code
+        course.capacity = capacity
+        self._log("update_course", id=course_id, title=title, code=code, capacity=capacity)
+        self._course_changed(course_id)
+        return course
+
+    def delete_course(self, course_id: int) -> Optional[int]:
+        """
+        Delete a course and cascade to its enrollments.
+
+        Returns the number of enrollments removed, or None if the course
+        does not exist.
+        """
+        with self.course_lock.write, self.enrollment_lock.write:
+            return self._remove_course(course_id)
+
+    def _remove_course(self, course_id: int) -> Optional[int]:
+        course = self.courses.pop(course_id, None)
+        if course is None:
+            return None
+        code_key = self._index_key(course.code)
+        if self.course_code_index.get(code_key) == course_id:
+            del self.course_code_index[code_key]
+        self.course_order.discard(self.courses)
+        # Also delete all enrollments for this course, touching only its rows
+        enrollment_ids = self.enrollments_by_course.pop(course_id, ())
+        examined(len(enrollment_ids) + 1)
+        for enrollment_id in enrollment_ids:
+            user_id, _ = self.enrollments.remove(enrollment_id)
+            remove_from_group(self.enrollments_by_student, user_id, enrollment_id)
+            self.enrollment_pairs.discard(pair_key(user_id, course_id))
+            self._enrollment_changed(user_id, course_id)
+        self.course_enrollment_versions[course_id] = next(self._version_clock)
+        self.waitlists.pop(course_id, None)
+        self._log("delete_course", id=course_id)
+        self._course_changed(course_id)
+        return len(enrollment_ids)
 
     # Enrollment operations
-    def create_enrollment(self, user_id: int, course_id: int) -> Enrollment:
-        enrollment = Enrollment(
-            id=self.enrollment_id_counter,
+    def create_enrollment(self, user_id: int, course_id: int) -> EnrollmentRecord:
+        with self.enrollment_lock.write:
+            return self._insert_enrollment(user_id, course_id)
+
+    def try_create_enrollment(self, user_id: int, course_id: int) -> Optional[EnrollmentRecord]:
+        """
+        Atomically enroll a student unless already enrolled. Returns None if
+        the pair exists, the course is full or the course has been deleted
+        in the meantime.
+        """
+        with self.course_lock.read, self.enrollment_lock.write:
+            course = self.courses.get(course_id)
+            if (course is None or not self._has_seat(course)
+                    or self._is_enrolled(user_id, course_id)):
+                return None
+            return self._insert_enrollment(user_id, course_id)
+
+    def try_enroll(self, user_id: int, course_id: int) -> EnrollOutcome:
+        """
+        Atomically take a seat in a course, or join its waitlist when it is
+        full. A student is never enrolled ahead of earlier waitlisted ones.
+        """
+        with self.course_lock.read, self.enrollment_lock.write:
+            course = self.courses.get(course_id)
+            if course is None:
+                return EnrollOutcome(COURSE_NOT_FOUND)
+            if self._is_enrolled(user_id, course_id):
+                return EnrollOutcome(ALREADY_ENROLLED)
+            waitlist = self.waitlists.get(course_id)
+            if waitlist:
+                if user_id in waitlist:
+                    return EnrollOutcome(
+                        ALREADY_WAITLISTED, position=self._waitlist_position(waitlist, user_id)
+                    )
+            elif self._has_seat(course):
+                return EnrollOutcome(ENROLLED, enrollment=self._insert_enrollment(user_id, course_id))
+            if waitlist is None:
+                waitlist = self.waitlists[course_id] = OrderedDict()
+            waitlist[user_id] = None
+            self._log("join_waitlist", user_id=user_id, course_id=course_id)
+            return EnrollOutcome(WAITLISTED, position=len(waitlist))
+
+    def _has_seat(self, course: CourseRecord) -> bool:
+        return (course.capacity is None
+                or len(self.enrollments_by_course.get(course.id, ())) < course.capacity)
+
+    @staticmethod
+    def _waitlist_position(waitlist: "OrderedDict[int, None]", user_id: int) -> Optional[int]:
+        for position, waiting_id in enumerate(waitlist, 1):
+            if waiting_id == user_id:
+                return position
+        return None
+
+    def _promote(self, course_id: int):
+        """Give free seats to waitlisted students, first come first served"""
+        waitlist = self.waitlists.get(course_id)
+        if not waitlist:
+            return
+        course = self.courses.get(course_id)
+        while waitlist and course is not None and self._has_seat(course):
+            user_id, _ = waitlist.popitem(last=False)
+            self._log("leave_waitlist", user_id=user_id, course_id=course_id)
+            # Admins can enroll a waitlisted student directly; skip them here
+            if not self._is_enrolled(user_id, course_id):
+                self._insert_enrollment(user_id, course_id)
+        if not waitlist:
+            del self.waitlists[course_id]
+
+    def _remove_from_waitlist(self, user_id: int, course_id: int) -> bool:
+        waitlist = self.waitlists.get(course_id)
+        if not waitlist or user_id not in waitlist:
+            return False
+        del waitlist[user_id]
+        if not waitlist:
+            del self.waitlists[course_id]
+        return True
+
+    def leave_waitlist(self, user_id: int, course_id: int) -> bool:
+        """Take a student off a course's waitlist; False if they were not on it"""
+        with self.enrollment_lock.write:
+            if not self._remove_from_waitlist(user_id, course_id):
+                return False
+            self._log("leave_waitlist", user_id=user_id, course_id=course_id)
+            return True
+
+    def get_waitlist(self, course_id: int) -> List[int]:
+        """User ids waiting for a seat, next to be promoted first"""
+        with self.enrollment_lock.read:
+            return list(self.waitlists.get(course_id, ()))
+
+    def get_waitlist_position(self, user_id: int, course_id: int) -> Optional[int]:
+        with self.enrollment_lock.read:
+            waitlist = self.waitlists.get(course_id)
+            return self._waitlist_position(waitlist, user_id) if waitlist else None
+
+    def get_seats(self, course_id: int) -> Optional[SeatCount]:
+        """Capacity, seats taken and waitlist length; None if the course is missing"""
+        with self.course_lock.read, self.enrollment_lock.read:
+            course = self.courses.get(course_id)
+            if course is None:
+                return None
+            return SeatCount(
+                course.capacity,
+                len(self.enrollments_by_course.get(course_id, ())),
+                len(self.waitlists.get(course_id, ()))
+            )
+
+    def _insert_enrollment(
+        self, user_id: int, course_id: int, enrollment_id: Optional[int] = None
+    ) -> EnrollmentRecord:
+        enrollment = EnrollmentRecord(
+            id=self.enrollment_id_counter if enrollment_id is None else enrollment_id,
             user_id=user_id,
             course_id=course_id
         )
-        self.enrollments.append(enrollment)
-        self.enrollment_id_counter += 1
+        self.enrollments.append(enrollment.id, user_id, course_id)
+        add_to_group(self.enrollments_by_student, user_id, enrollment.id)
+        add_to_group(self.enrollments_by_course, course_id, enrollment.id)
+        self.enrollment_pairs.add(pair_key(user_id, course_id))
+        self._enrollment_changed(user_id, course_id)
+        self.enrollment_id_counter = max(self.enrollment_id_counter, enrollment.id + 1)
+        self._log("create_enrollment", id=enrollment.id, user_id=user_id, course_id=course_id)
         return enrollment
 
-    def get_enrollment(self, enrollment_id: int) -> Optional[Enrollment]:
-        for enrollment in self.enrollments:
-            if enrollment.id == enrollment_id:
-                return enrollment
-        return None
+    def create_enrollments(self, pairs: List[Tuple[int, int]]) -> List[EnrollOutcome]:
+        """
+        Insert many (user_id, course_id) pairs in one pass.
 
-    def get_all_enrollments(self) -> List[Enrollment]:
-        return self.enrollments.copy()
+        Each pair gets an outcome at its position: ENROLLED, or the reason it
+        was skipped (ALREADY_ENROLLED, also for a pair repeated within the
+        batch, COURSE_FULL or COURSE_NOT_FOUND), decided under the same locks
+        as the insert.
+        """
+        outcomes: List[EnrollOutcome] = []
+        with self.course_lock.read, self.enrollment_lock.write:
+            for user_id, course_id in pairs:
+                course = self.courses.get(course_id)
+                if course is None:
+                    outcomes.append(EnrollOutcome(COURSE_NOT_FOUND))
+                elif self._is_enrolled(user_id, course_id):
+                    # Also catches pairs inserted earlier in this batch
+                    outcomes.append(EnrollOutcome(ALREADY_ENROLLED))
+                elif not self._has_seat(course):
+                    outcomes.append(EnrollOutcome(COURSE_FULL))
+                else:
+                    outcomes.append(EnrollOutcome(
+                        ENROLLED, enrollment=self._insert_enrollment(user_id, course_id)
+                    ))
+        return outcomes
 
-    def get_enrollments_by_student(self, user_id: int) -> List[Enrollment]:
-        return [e for e in self.enrollments if e.user_id == user_id]
+    def get_enrollment(self, enrollment_id: int) -> Optional[EnrollmentRecord]:
+        with self.enrollment_lock.read:
+            return self.enrollments.get(enrollment_id)
 
-    def get_enrollments_by_course(self, course_id: int) -> List[Enrollment]:
-        return [e for e in self.enrollments if e.course_id == course_id]
+    def get_all_enrollments(
+        self, after_id: Optional[int] = None, limit: Optional[int] = None
+    ) -> List[EnrollmentRecord]:
+        with self.enrollment_lock.read:
+            return self.enrollments.page(after_id, limit)
+
+    def get_enrollments_by_student(
+        self, user_id: int, after_id: Optional[int] = None, limit: Optional[int] = None
+    ) -> List[EnrollmentRecord]:
+        with self.enrollment_lock.read:
+            return self.enrollments.select(
+                page_group(self.enrollments_by_student.get(user_id), after_id, limit)
+            )
+
+    def get_enrollments_by_course(
+        self, course_id: int, after_id: Optional[int] = None, limit: Optional[int] = None
+    ) -> List[EnrollmentRecord]:
+        with self.enrollment_lock.read:
+            return self.enrollments.select(
+                page_group(self.enrollments_by_course.get(course_id), after_id, limit)
+            )
 
     def enrollment_exists(self, user_id: int, course_id: int) -> bool:
-        return any(
-            e.user_id == user_id and e.course_id == course_id
-            for e in self.enrollments
-        )
+        with self.enrollment_lock.read:
+            return self._is_enrolled(user_id, course_id)
 
     def delete_enrollment(self, enrollment_id: int) -> bool:
-        for i, enrollment in enumerate(self.enrollments):
-            if enrollment.id == enrollment_id:
-                del self.enrollments[i]
-                return True
-        return False
+        """Delete an enrollment and hand its seat to the course's waitlist"""
+        with self.course_lock.read, self.enrollment_lock.write:
+            row = self._remove_enrollment(enrollment_id)
+            if row is None:
+                return False
+            self._promote(row[1])
+            return True
+
+    def _remove_enrollment(self, enrollment_id: int) -> Optional[Tuple[int, int]]:
+        row = self.enrollments.remove(enrollment_id)
+        if row is None:
+            return None
+        remove_from_group(self.enrollments_by_student, row[0], enrollment_id)
+        remove_from_group(self.enrollments_by_course, row[1], enrollment_id)
+        self.enrollment_pairs.discard(pair_key(*row))
+        self._enrollment_changed(*row)
+        self._log("delete_enrollment", id=enrollment_id)
+        return row
+
+    # Change counters
+    def get_table_version(self, table: str) -> int:
+        if table not in self.table_versions:
+            raise ValueError(f"Unknown table: {table}")
+        return self.table_versions[table]
+
+    def get_student_enrollments_version(self, user_id: int) -> int:
+        with self.enrollment_lock.read:
+            return self.student_versions.get(user_id, self._group_version_base)
+
+    def get_course_enrollments_version(self, course_id: int) -> int:
+        with self.enrollment_lock.read:
+            return self.course_enrollment_versions.get(course_id, self._group_version_base)
+
+    def table_sizes(self) -> Dict[str, int]:
+        """Row count per table (for monitoring)"""
+        return {
+            "users": len(self.users),
+            "courses": len(self.courses),
+            "enrollments": len(self.enrollments)
+        }
+
+    # Snapshot and recovery support
+    def export_state(self) -> Dict[str, Any]:
+        """
+        Capture all rows and id counters. Must be called inside frozen().
+
+        Only the tables are copied here, which is fast (mapped tables are
+        copied without touching their base rows and enrollment columns are
+        copied as flat arrays); users are never modified in place, so
+        callers can iterate them after leaving frozen(). Courses are copied
+        row by row because update_course mutates them.
+        """
+        return {
+            "users": self.users.copy(),
+            "courses": [course.copy() for course in self.courses.values()],
+            "enrollments": self.enrollments.copy(),
+            "waitlists": [
+                (course_id, list(waitlist)) for course_id, waitlist in self.waitlists.items()
+            ],
+            "counters": {
+                "user": self.user_id_counter,
+                "course": self.course_id_counter,
+                "enrollment": self.enrollment_id_counter
+            }
+        }
+
+    def attach_snapshot(self, snapshot):
+        """
+        Replace all data with a MappedSnapshot (see app/snapshot.py).
+
+        No rows are materialized here: the enrollment columns are copied out
+        of the mapped file in bulk, the pair index is rebuilt from them in one
+        pass, and every other table and index is a view over the file.
+        """
+        if snapshot.normalize_keys != self.normalize_keys:
+            raise ValueError("Snapshot was written with a different normalize_keys setting")
+        with self._all_write():
+            self._clear()
+            self.users, self.email_index = snapshot.users()
+            self.courses, self.course_code_index = snapshot.courses()
+            (self.enrollments, self.enrollments_by_student,
+             self.enrollments_by_course) = snapshot.enrollments()
+            self.enrollment_pairs = self.enrollments.pair_keys()
+            self.waitlists = snapshot.waitlists()
+            self.user_order = KeyOrder(base=self.users.ids)
+            self.course_order = KeyOrder(base=self.courses.ids)
+            self.user_id_counter = snapshot.counters["user"]
+            self.course_id_counter = snapshot.counters["course"]
+            self.enrollment_id_counter = snapshot.counters["enrollment"]
+
+    def replay(self, records: Iterable[Dict[str, Any]]):
+        """Re-apply journal records, in order, without journaling them again"""
+        with self._all_write():
+            durability, self.durability = self.durability, None
+            try:
+                for record in records:
+                    self._apply_record(record)
+            finally:
+                self.durability = durability
+
+    def _apply_record(self, record: Dict[str, Any]):
+        op = record["op"]
+        if op == "create_user":
+            self._insert_user(record["name"], record["email"], record["role"], user_id=record["id"])
+        elif op == "create_course":
+            self._insert_course(
+                record["title"], record["code"], record.get("capacity"), course_id=record["id"]
+            )
+        elif op == "update_course":
+            self._apply_course_update(
+                record["id"], record["title"], record["code"], record.get("capacity")
+            )
+        elif op == "delete_course":
+            self._remove_course(record["id"])
+        elif op == "create_enrollment":
+            self._insert_enrollment(
+                record["user_id"], record["course_id"], enrollment_id=record["id"]
+            )
+        elif op == "delete_enrollment":
+            # Promotions were journaled as their own records
+            self._remove_enrollment(record["id"])
+        elif op == "join_waitlist":
+            self.waitlists.setdefault(record["course_id"], OrderedDict())[record["user_id"]] = None
+        elif op == "leave_waitlist":
+            self._remove_from_waitlist(record["user_id"], record["course_id"])
+        elif op == "reset":
+            self._clear()
+        else:
+            raise ValueError(f"Unknown journal operation: {op}")
+
+
+def create_database(config: Settings):
+    """Build the storage backend selected by configuration"""
+    if config.database_backend == "sqlite":
+        from app.sqlite_database import SQLiteDatabase
+        return SQLiteDatabase(
+            config.sqlite_path,
+            normalize_keys=config.normalize_keys,
+            trace_steps=config.storage_tracing
+        )
+    if config.database_backend != "memory":
+        raise ValueError(f"Unknown database backend: {config.database_backend}")
+    database = Database(normalize_keys=config.normalize_keys)
+    if config.journal_dir:
+        from app.journal import enable_durability
+        enable_durability(
+            database,
+            config.journal_dir,
+            flush_interval=config.journal_flush_interval,
+            snapshot_interval=config.snapshot_interval,
+            max_journal_records=config.snapshot_max_journal_records
+        )
+    return database
 
 
 # Global database instance
-db = Database()
+db = create_database(settings)
@@ -0,0 +1,57 @@
+from typing import Optional
+from fastapi import Request, Response, status
+
+ETAG_HEADER = "ETag"
+
+
+def make_etag(epoch: int, version: int, key: Optional[int] = None) -> str:
+    """
+    Build a strong ETag from a storage epoch and change counter.
+
+    Single-item reads pass the item's id as ``key``: the counter covers a
+    whole table or group, so without it one item's tag would match another.
+    """
+    if key is None:
+        return f'"{epoch:x}-{version:x}"'
+    return f'"{epoch:x}-{version:x}-{key:x}"'
+
+
+def matches(request: Request, etag: str, wildcard: bool = True) -> bool:
+    """
+    Check whether the request's If-None-Match covers ``etag``.
+
+    ``*`` matches any current representation, so callers that have not yet
+    seen the resource exist pass ``wildcard=False``.
+    """
+    header = request.headers.get("if-none-match")
+    if header is None:
+        return False
+    for candidate in header.split(","):
+        candidate = candidate.strip()
+        if wildcard and candidate == "*":
+            return True
+        # If-None-Match uses weak comparison
+        if candidate.startswith("W/"):
+            candidate = candidate[2:]
+        if candidate == etag:
+            return True
+    return False
+
+
+def not_modified(
+    request: Request, response: Response, etag: str, wildcard: bool = True
+) -> Optional[Response]:
+    """
+    Return a 304 response if the client already has this version;
+    otherwise tag ``response`` with the ETag and return None.
+
+    Read the version before the rows it describes: a change landing in
+    between then only makes the tag older than the rows, which costs the
+    client one extra full response instead of a wrong 304 later. Checks
+    made before the row is known to exist pass ``wildcard=False`` and
+    check again once it is found.
+    """
+    if matches(request, etag, wildcard):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers={ETAG_HEADER: etag})
+    response.headers[ETAG_HEADER] = etag
+    return None
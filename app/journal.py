@@ -0,0 +1,257 @@
+"""
+Optional durability for the in-memory Database.
+
+Every mutation is appended to a journal segment as one JSON line. A
+background flusher writes and fsyncs the pending lines as a group every
+``flush_interval`` seconds, so writers never wait on the disk; at most one
+interval of acknowledged writes can be lost on a crash. A compactor
+periodically writes a full snapshot, after which the segments it covers are
+deleted, which keeps recovery time bounded by the snapshot size plus at most
+``max_journal_records`` replayed records.
+
+Snapshots use the mmap-able binary format from app/snapshot.py, so
+recovery attaches the snapshot in constant time and only the journal tail
+is replayed row by row.
+
+Files in the journal directory::
+
+    snapshot.bin           latest snapshot (written atomically)
+    journal.000042.log     journal segments, replayed in order
+"""
+import json
+import os
+import threading
+from typing import Any, Dict, Iterator, List, Optional
+from app.snapshot import MappedSnapshot, write_snapshot
+
+SNAPSHOT_FILE = "snapshot.bin"
+SEGMENT_PREFIX = "journal."
+SEGMENT_SUFFIX = ".log"
+
+
+def segment_path(directory: str, segment: int) -> str:
+    return os.path.join(directory, f"{SEGMENT_PREFIX}{segment:06d}{SEGMENT_SUFFIX}")
+
+
+def list_segments(directory: str) -> List[int]:
+    segments = []
+    for name in os.listdir(directory):
+        if name.startswith(SEGMENT_PREFIX) and name.endswith(SEGMENT_SUFFIX):
+            number = name[len(SEGMENT_PREFIX):-len(SEGMENT_SUFFIX)]
+            if number.isdigit():
+                segments.append(int(number))
+    return sorted(segments)
+
+
+def _fsync_directory(directory: str):
+    # Make renames and new files durable (not supported on all platforms)
+    try:
+        fd = os.open(directory, os.O_RDONLY)
+    except OSError:
+        return
+    try:
+        os.fsync(fd)
+    except OSError:
+        pass
+    finally:
+        os.close(fd)
+
+
+class Journal:
+    """Append-only mutation log with group commit"""
+
+    def __init__(
+        self,
+        directory: str,
+        segment: int,
+        flush_interval: float = 0.01,
+        max_records: Optional[int] = None,
+        on_full=None
+    ):
+        self.directory = directory
+        self.segment = segment
+        self.flush_interval = flush_interval
+        # Records appended since the last rotation; when it reaches
+        # max_records, on_full() is called to request a snapshot
+        self.records_in_segment = 0
+        self.max_records = max_records
+        self.on_full = on_full
+        self._pending: List[str] = []
+        self._lock = threading.Lock()  # guards _pending and counters
+        self._io_lock = threading.Lock()  # serializes writes and rotation
+        self._file = open(segment_path(directory, segment), "a", encoding="utf-8")
+        self._stop = threading.Event()
+        self._flusher = threading.Thread(
+            target=self._flush_loop, name="journal-flusher", daemon=True
+        )
+        self._flusher.start()
+
+    def append(self, op: str, fields: Dict[str, Any]):
+        """Queue one record; it becomes durable at the next group commit"""
+        line = json.dumps({"op": op, **fields}, separators=(",", ":"))
+        with self._lock:
+            self._pending.append(line)
+            self.records_in_segment += 1
+            full = self.max_records is not None and self.records_in_segment == self.max_records
+        if full and self.on_full is not None:
+            self.on_full()
+
+    def _write_pending(self):
+        # Caller holds _io_lock
+        with self._lock:
+            lines, self._pending = self._pending, []
+        if lines:
+            self._file.write("\n".join(lines) + "\n")
+            self._file.flush()
+            os.fsync(self._file.fileno())
+
+    def flush(self):
+        """Write and fsync everything appended so far"""
+        with self._io_lock:
+            self._write_pending()
+
+    def _flush_loop(self):
+        while not self._stop.wait(self.flush_interval):
+            self.flush()
+
+    def rotate(self) -> int:
+        """
+        Close the current segment and start a new one, returning the new
+        segment number. Callers must stop appends (Database.frozen()) so no
+        record can land on either side of the cut by mistake.
+        """
+        with self._io_lock:
+            self._write_pending()
+            self._file.close()
+            self.segment += 1
+            self._file = open(segment_path(self.directory, self.segment), "a", encoding="utf-8")
+            _fsync_directory(self.directory)
+            with self._lock:
+                self.records_in_segment = 0
+            return self.segment
+
+    def close(self):
+        self._stop.set()
+        self._flusher.join()
+        with self._io_lock:
+            self._write_pending()
+            self._file.close()
+
+
+def read_segment(path: str) -> Iterator[Dict[str, Any]]:
+    """Yield records from a segment, stopping at a torn final line"""
+    with open(path, encoding="utf-8") as segment:
+        for line in segment:
+            if not line.endswith("\n"):
+                return
+            try:
+                yield json.loads(line)
+            except ValueError:
+                return
+
+
+def recover(database, directory: str) -> int:
+    """
+    Attach the latest snapshot to ``database`` and replay the journal
+    segments written after it. Returns the segment number to append to next.
+    """
+    path = os.path.join(directory, SNAPSHOT_FILE)
+    first_segment = 0
+    if os.path.exists(path):
+        snapshot = MappedSnapshot(path)
+        database.attach_snapshot(snapshot)
+        first_segment = snapshot.segment
+    segments = [s for s in list_segments(directory) if s >= first_segment]
+    for segment in segments:
+        database.replay(read_segment(segment_path(directory, segment)))
+    # Always continue in a fresh segment, after any torn tail
+    return max(segments + [first_segment - 1]) + 1
+
+
+class Durability:
+    """
+    Journal plus background compactor attached to a Database.
+
+    Use ``enable_durability`` rather than constructing this directly.
+    """
+
+    def __init__(
+        self,
+        database,
+        directory: str,
+        segment: int,
+        flush_interval: float,
+        snapshot_interval: float,
+        max_journal_records: int
+    ):
+        self.database = database
+        self.directory = directory
+        self.snapshot_interval = snapshot_interval
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._compact_lock = threading.Lock()
+        self.journal = Journal(
+            directory,
+            segment,
+            flush_interval=flush_interval,
+            max_records=max_journal_records,
+            on_full=self._wake.set
+        )
+        self._compactor = threading.Thread(
+            target=self._compact_loop, name="journal-compactor", daemon=True
+        )
+        self._compactor.start()
+
+    def compact(self):
+        """Write a snapshot and drop the journal segments it covers"""
+        with self._compact_lock:
+            with self.database.frozen():
+                segment = self.journal.rotate()
+                state = self.database.export_state()
+            # Serializing happens with writes unblocked again
+            write_snapshot(
+                os.path.join(self.directory, SNAPSHOT_FILE),
+                state,
+                segment=segment,
+                normalize_keys=self.database.normalize_keys
+            )
+            _fsync_directory(self.directory)
+            for old in list_segments(self.directory):
+                if old < segment:
+                    os.remove(segment_path(self.directory, old))
+
+    def _compact_loop(self):
+        while True:
+            self._wake.wait(self.snapshot_interval)
+            if self._stop.is_set():
+                return
+            self._wake.clear()
+            self.compact()
+
+    def close(self):
+        self._stop.set()
+        self._wake.set()
+        self._compactor.join()
+        self.journal.close()
+
+
+def enable_durability(
+    database,
+    directory: str,
+    flush_interval: float = 0.01,
+    snapshot_interval: float = 300.0,
+    max_journal_records: int = 100000
+) -> Durability:
+    """Recover ``database`` from ``directory`` and journal it from now on"""
+    os.makedirs(directory, exist_ok=True)
+    segment = recover(database, directory)
+    durability = Durability(
+        database,
+        directory,
+        segment,
+        flush_interval=flush_interval,
+        snapshot_interval=snapshot_interval,
+        max_journal_records=max_journal_records
+    )
+    database.durability = durability
+    return durability
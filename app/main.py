@@ -1,20 +1,57 @@
-from fastapi import FastAPI
-from app.routers import users, courses, enrollments
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, Response
+from app.admission import PRIORITY_NAMES, AdmissionMiddleware, admission_controller
+from app.async_database import async_db
+from app.auth import role_cache
+from app.config import settings
+from app.database import db
+from app.metrics import CONTENT_TYPE, MetricsMiddleware, RequestMetrics, render
+from app.profiling import ProfilingMiddleware, profile_store
+from app.routers import users, courses, enrollments, admin
+from app.tracing import TracingMiddleware, storage_stats
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    yield
+    # Flush the journal or close connections on shutdown
+    db.close()
+
 
 app = FastAPI(
     title="Course Enrollment Management API",
     description="A RESTful API for managing course enrollments with role-based access control",
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=lifespan
 )
 
 # Include routers
 app.include_router(users.router)
 app.include_router(courses.router)
 app.include_router(enrollments.router)
+app.include_router(admin.router)
+
+# Middleware added last runs first, so metrics time the profiling overhead too,
+# and count (and time the queueing of) requests that admission control sheds
+if settings.storage_tracing:
+    app.add_middleware(TracingMiddleware)
+if settings.profiling:
+    app.add_middleware(
+        ProfilingMiddleware, store=profile_store, sample_rate=settings.profile_sample_rate
+    )
+if settings.admission_limit > 0:
+    app.add_middleware(
+        AdmissionMiddleware,
+        controller=admission_controller,
+        retry_after=settings.admission_retry_after
+    )
+request_metrics = RequestMetrics()
+if settings.metrics:
+    app.add_middleware(MetricsMiddleware, metrics=request_metrics)
 
 
 @app.get("/")
-def root():
+async def root():
     """Root endpoint - API health check"""
     return {
         "message": "Course Enrollment Management API",
@@ -24,6 +61,64 @@ def root():
 
 
 @app.get("/health")
-def health_check():
+async def health_check():
     """Health check endpoint"""
     return {"status": "healthy"}
+
+
+@app.get("/metrics", include_in_schema=False)
+async def metrics():
+    """Request, storage and cache metrics in Prometheus text format"""
+    sizes = await async_db.table_sizes()
+    cache = role_cache.stats()
+    # Counters must never go backwards, so not the totals an admin can reset
+    operations = storage_stats.summary(lifetime=True)
+    waiting = admission_controller.waiting()
+    families = {
+        "app_table_rows": (
+            "gauge", "Rows per storage table.", ("table",),
+            {(table,): count for table, count in sizes.items()}
+        ),
+        "app_storage_calls_total": (
+            "counter", "Storage calls, by backend method.", ("method",),
+            {(op["method"],): op["calls"] for op in operations}
+        ),
+        "app_storage_seconds_total": (
+            "counter", "Time spent in storage calls, by backend method.", ("method",),
+            {(op["method"],): op["total_ms"] / 1000 for op in operations}
+        ),
+        "app_storage_rows_examined_total": (
+            "counter", "Rows examined by storage calls, by backend method.", ("method",),
+            {(op["method"],): op["rows_examined"] for op in operations}
+        ),
+        "app_storage_rows_returned_total": (
+            "counter", "Rows returned by storage calls, by backend method.", ("method",),
+            {(op["method"],): op["rows_returned"] for op in operations}
+        ),
+        "app_admission_active": (
+            "gauge", "Requests holding an admission slot.", (),
+            {(): admission_controller.active}
+        ),
+        "app_admission_queued": (
+            "gauge", "Requests waiting for an admission slot, by priority.", ("priority",),
+            {(name,): count for name, count in waiting.items()}
+        ),
+        "app_admission_admitted_total": (
+            "counter", "Requests admitted, by priority.", ("priority",),
+            {(name,): admission_controller.admitted[i] for i, name in enumerate(PRIORITY_NAMES)}
+        ),
+        "app_admission_rejected_total": (
+            "counter", "Requests shed with 503, by priority.", ("priority",),
+            {(name,): admission_controller.rejected[i] for i, name in enumerate(PRIORITY_NAMES)}
+        ),
+        "app_role_cache_entries": ("gauge", "Entries in the role cache.", (), {(): cache["size"]}),
+        "app_role_cache_hits_total": ("counter", "Role cache hits.", (), {(): cache["hits"]}),
+        "app_role_cache_misses_total": ("counter", "Role cache misses.", (), {(): cache["misses"]}),
+        "app_role_cache_evictions_total": (
+            "counter", "Role cache evictions.", (), {(): cache["evictions"]}
+        ),
+        "app_role_cache_rejections_total": (
+            "counter", "Role cache fills refused by admission.", (), {(): cache["rejections"]}
+        )
+    }
+    return Response(content=render(request_metrics, families), media_type=CONTENT_TYPE)
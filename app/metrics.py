@@ -0,0 +1,162 @@
+"""
+Request metrics in the Prometheus text exposition format.
+
+``MetricsMiddleware`` records, per method, route template and status code,
+a request counter and a latency histogram, plus an in-flight gauge per
+route. ``render`` serialises them (and any extra families, such as table
+sizes) for ``/metrics``.
+
+Recording takes no locks: the middleware only runs on the event loop
+thread, so each update is a few plain integer and list operations. Every
+worker process keeps its own numbers; scrape each worker separately.
+"""
+import time
+from bisect import bisect_left
+from typing import Dict, Iterable, List, Mapping, Optional, Tuple
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+# Upper bounds in seconds; the +Inf bucket is implicit
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+# Label used for requests that match no route, so unknown paths cannot
+# create unbounded label values
+UNMATCHED_ROUTE = "<unmatched>"
+
+
+class Histogram:
+    """Per-bucket (not cumulative) counts plus the running sum"""
+
+    __slots__ = ("buckets", "sum", "count")
+
+    def __init__(self):
+        self.buckets = [0] * (len(LATENCY_BUCKETS) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float):
+        self.buckets[bisect_left(LATENCY_BUCKETS, value)] += 1
+        self.sum += value
+        self.count += 1
+
+
+def route_template(scope: Scope) -> str:
+    """The path template of the route that handled (or is handling) ``scope``"""
+    route = scope.get("route")
+    return getattr(route, "path", UNMATCHED_ROUTE)
+
+
+class RequestMetrics:
+    """Latency histograms keyed by (method, route, status), plus live requests"""
+
+    def __init__(self):
+        self.latency: Dict[Tuple[str, str, str], Histogram] = {}
+        # Scopes of requests being handled, by id(scope). The route is only
+        # known once routing has run, so in-flight counts per route are
+        # worked out from these when scraped rather than on every request.
+        self.active: Dict[int, Scope] = {}
+
+    def reset(self):
+        self.latency.clear()
+        self.active.clear()
+
+    def in_flight(self) -> Dict[Tuple[str, str], int]:
+        counts: Dict[Tuple[str, str], int] = {}
+        for scope in list(self.active.values()):
+            key = (scope["method"], route_template(scope))
+            counts[key] = counts.get(key, 0) + 1
+        return counts
+
+
+class MetricsMiddleware:
+    """ASGI middleware feeding a ``RequestMetrics``"""
+
+    def __init__(self, app: ASGIApp, metrics: RequestMetrics):
+        self.app = app
+        self.metrics = metrics
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        active = self.metrics.active
+        active[id(scope)] = scope
+        status_code = 500
+        start = time.perf_counter()
+
+        async def send_wrapper(message: Message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            elapsed = time.perf_counter() - start
+            del active[id(scope)]
+            # Routing stores the matched route in the (shared) scope
+            key = (scope["method"], route_template(scope), str(status_code))
+            histogram = self.metrics.latency.get(key)
+            if histogram is None:
+                histogram = self.metrics.latency[key] = Histogram()
+            histogram.observe(elapsed)
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _labels(names: Iterable[str], values: Iterable[str]) -> str:
+    return ",".join(f'{name}="{_escape(str(value))}"' for name, value in zip(names, values))
+
+
+def _number(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+# An extra metric family: (type, help text, label names, {label values: value})
+Family = Tuple[str, str, Tuple[str, ...], Mapping[Tuple[str, ...], float]]
+
+
+def render(metrics: RequestMetrics, families: Optional[Dict[str, Family]] = None) -> str:
+    """Serialise request metrics and extra families in the text format"""
+    lines: List[str] = []
+    latency = sorted(metrics.latency.items())
+
+    lines.append("# HELP http_requests_total Requests handled, by route and status code.")
+    lines.append("# TYPE http_requests_total counter")
+    for key, histogram in latency:
+        lines.append(
+            f"http_requests_total{{{_labels(('method', 'route', 'status'), key)}}} {histogram.count}"
+        )
+
+    lines.append("# HELP http_request_duration_seconds Request latency, by route and status code.")
+    lines.append("# TYPE http_request_duration_seconds histogram")
+    for key, histogram in latency:
+        labels = _labels(("method", "route", "status"), key)
+        cumulative = 0
+        for bound, count in zip(LATENCY_BUCKETS + (float("inf"),), histogram.buckets):
+            cumulative += count
+            lines.append(
+                f'http_request_duration_seconds_bucket{{{labels},le="{_number(bound)}"}} {cumulative}'
+            )
+        lines.append(f"http_request_duration_seconds_sum{{{labels}}} {_number(histogram.sum)}")
+        lines.append(f"http_request_duration_seconds_count{{{labels}}} {histogram.count}")
+
+    lines.append("# HELP http_requests_in_flight Requests currently being handled, by route.")
+    lines.append("# TYPE http_requests_in_flight gauge")
+    for key, count in sorted(metrics.in_flight().items()):
+        lines.append(f"http_requests_in_flight{{{_labels(('method', 'route'), key)}}} {count}")
+
+    for name, (kind, help_text, label_names, values) in (families or {}).items():
+        lines.append(f"# HELP {name} {help_text}")
+        lines.append(f"# TYPE {name} {kind}")
+        for label_values, value in values.items():
+            labels = _labels(label_names, label_values)
+            lines.append(f"{name}{{{labels}}} {_number(value)}" if labels else f"{name} {_number(value)}")
+    return "\n".join(lines) + "\n"
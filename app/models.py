@@ -1,5 +1,7 @@
-from pydantic import BaseModel, EmailStr, field_validator, ConfigDict
-from typing import Literal
+from pydantic import BaseModel, EmailStr, Field, field_validator, ConfigDict
+from typing import List, Literal, Optional
+
+MAX_BATCH_SIZE = 10000
 
 
 class UserBase(BaseModel):
@@ -27,6 +29,7 @@ class User(UserBase):
 class CourseBase(BaseModel):
     title: str
     code: str
+    capacity: Optional[int] = Field(default=None, ge=1)  # Seat limit; None is unlimited
 
     @field_validator("title")
     @classmethod
@@ -70,9 +73,81 @@ class Enrollment(EnrollmentBase):
     model_config = ConfigDict(from_attributes=True)
 
 
+class Waitlisted(BaseModel):
+    detail: str
+    user_id: int
+    course_id: int
+    position: int  # 1-based place in the course's waitlist
+
+
+class CourseSeats(BaseModel):
+    course_id: int
+    capacity: Optional[int]
+    enrolled: int
+    available: Optional[int]  # None when the course is unlimited
+    waitlisted: int
+
+
+class CourseWaitlist(BaseModel):
+    course_id: int
+    user_ids: List[int]  # In the order they will be offered a seat
+
+
 class CourseDelete(BaseModel):
     admin_id: int  # ID of the admin deleting the course
 
 
 class EnrollmentDelete(BaseModel):
     admin_id: int  # ID of the admin forcing deregistration
+
+
+class BatchItemResult(BaseModel):
+    index: int  # Position of the item in the request payload
+    status_code: int
+    detail: Optional[str] = None
+
+
+class UserBatchCreate(BaseModel):
+    admin_id: int  # ID of the admin creating the users
+    users: List[UserCreate] = Field(min_length=1, max_length=MAX_BATCH_SIZE)
+
+
+class UserBatchItemResult(BatchItemResult):
+    user: Optional[User] = None
+
+
+class UserBatchResult(BaseModel):
+    created: int
+    results: List[UserBatchItemResult]
+
+
+class CourseBatchCreate(BaseModel):
+    admin_id: int  # ID of the admin creating the courses
+    courses: List[CourseBase] = Field(min_length=1, max_length=MAX_BATCH_SIZE)
+
+
+class CourseBatchItemResult(BatchItemResult):
+    course: Optional[Course] = None
+
+
+class CourseBatchResult(BaseModel):
+    created: int
+    results: List[CourseBatchItemResult]
+
+
+class CourseEnrollmentBatch(BaseModel):
+    admin_id: int  # ID of the admin enrolling the students
+    user_ids: List[int] = Field(min_length=1, max_length=MAX_BATCH_SIZE)
+
+
+class StudentEnrollmentBatch(BaseModel):
+    course_ids: List[int] = Field(min_length=1, max_length=MAX_BATCH_SIZE)
+
+
+class EnrollmentBatchItemResult(BatchItemResult):
+    enrollment: Optional[Enrollment] = None
+
+
+class EnrollmentBatchResult(BaseModel):
+    created: int
+    results: List[EnrollmentBatchItemResult]
@@ -0,0 +1,65 @@
+import base64
+import binascii
+from typing import List, Optional, TypeVar
+from fastapi import HTTPException, Query, Response, status
+
+T = TypeVar("T")
+
+MAX_PAGE_SIZE = 1000
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+
+
+def encode_cursor(last_id: int) -> str:
+    """Encode the id of the last row on a page as an opaque cursor"""
+    return base64.urlsafe_b64encode(f"id:{last_id}".encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: Optional[str]) -> Optional[int]:
+    """Decode a cursor back into the id to resume after"""
+    if cursor is None:
+        return None
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        prefix, _, value = base64.urlsafe_b64decode(padded).decode().partition(":")
+        if prefix != "id":
+            raise ValueError(cursor)
+        return int(value)
+    except (binascii.Error, UnicodeDecodeError, ValueError):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Invalid cursor"
+        )
+
+
+class PageParams:
+    """
+    Keyset pagination parameters shared by the list endpoints.
+
+    Pages are keyed on row id, so a cursor keeps pointing at the same place
+    while rows are inserted or deleted elsewhere. When more rows follow, the
+    cursor for the next page is returned in the X-Next-Cursor header.
+    """
+
+    def __init__(
+        self,
+        limit: Optional[int] = Query(
+            None, ge=1, le=MAX_PAGE_SIZE, description="Maximum number of rows to return"
+        ),
+        cursor: Optional[str] = Query(
+            None, description="Opaque cursor from a previous page's X-Next-Cursor header"
+        )
+    ):
+        self.limit = limit
+        self.after_id = decode_cursor(cursor)
+
+    @property
+    def fetch_limit(self) -> Optional[int]:
+        # Fetch one extra row to learn whether another page follows
+        return None if self.limit is None else self.limit + 1
+
+    def finish(self, rows: List[T], response: Response) -> List[T]:
+        """Trim the look-ahead row and advertise the next cursor"""
+        if self.limit is not None and len(rows) > self.limit:
+            rows = rows[:self.limit]
+            response.headers[NEXT_CURSOR_HEADER] = encode_cursor(rows[-1].id)
+        return rows
@@ -0,0 +1,236 @@
+"""
+On-demand profiling of individual requests.
+
+``ProfilingMiddleware`` profiles a request when it carries an
+``X-Profile`` header naming an admin user, or when it is picked by random
+sampling. The request's coroutine is run under ``StackProfiler`` one step at
+a time, so only this request's own execution is recorded: time spent
+suspended (while other requests run on the event loop) is not counted.
+Work the request hands to worker threads is not seen either; it appears
+as time in the awaiting frame's caller only if the loop blocks on it.
+
+Finished profiles are kept in a bounded ring (``ProfileStore``) and served
+as collapsed stacks (``frame;frame;frame microseconds`` per line), the input
+format of flamegraph.pl and speedscope.
+"""
+import itertools
+import random
+import sys
+import threading
+import time
+from collections import deque
+from typing import Any, Coroutine, Dict, List, Optional
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+from app.auth import get_role
+from app.config import settings
+from app.metrics import route_template
+
+PROFILE_HEADER = "x-profile"
+PROFILE_ID_HEADER = "X-Profile-Id"
+
+
+class _Node:
+    __slots__ = ("children", "self_ns")
+
+    def __init__(self):
+        self.children: Dict[str, "_Node"] = {}
+        self.self_ns = 0
+
+
+def _frame_name(frame) -> str:
+    code = frame.f_code
+    # co_qualname is new in Python 3.11; older versions only have the bare name
+    name = getattr(code, "co_qualname", code.co_name)
+    return f"{frame.f_globals.get('__name__', '?')}:{name}"
+
+
+def _builtin_name(func) -> str:
+    module = getattr(func, "__module__", None) or "builtins"
+    return f"{module}:{getattr(func, '__qualname__', repr(func))}"
+
+
+class StackProfiler:
+    """
+    Deterministic profiler that accumulates self time per call stack.
+
+    ``start`` and ``stop`` bracket each stretch of execution to record, on
+    the calling thread. Resuming a coroutine replays a call event for every
+    frame in its await chain, so the stack is rebuilt on every stretch.
+    """
+
+    def __init__(self):
+        self.root = _Node()
+        self._stack: List[_Node] = [self.root]
+        self._last = self._started = 0
+        self._previous = None
+        self.total_ns = 0
+
+    def _event(self, frame, event: str, arg: Any):
+        now = time.perf_counter_ns()
+        stack = self._stack
+        stack[-1].self_ns += now - self._last
+        if event == "call":
+            node = stack[-1].children.get(name := _frame_name(frame))
+            if node is None:
+                node = stack[-1].children[name] = _Node()
+            stack.append(node)
+        elif event == "c_call":
+            # Skip the calls that switch profiling and drive the coroutine
+            if arg is not sys.setprofile and not (
+                len(stack) == 1 and isinstance(getattr(arg, "__self__", None), Coroutine)
+            ):
+                name = _builtin_name(arg)
+                node = stack[-1].children.get(name)
+                if node is None:
+                    node = stack[-1].children[name] = _Node()
+                stack.append(node)
+        elif len(stack) > 1:
+            # return, c_return, c_exception
+            stack.pop()
+        self._last = time.perf_counter_ns()
+
+    def start(self):
+        self._previous = sys.getprofile()
+        self._stack = [self.root]
+        self._last = self._started = time.perf_counter_ns()
+        sys.setprofile(self._event)
+
+    def stop(self):
+        sys.setprofile(self._previous)
+        self.total_ns += time.perf_counter_ns() - self._started
+
+    def collapsed(self) -> str:
+        """Render as collapsed stacks, in whole microseconds"""
+        lines: List[str] = []
+
+        def walk(node: _Node, path: List[str]):
+            micros = node.self_ns // 1000
+            if path and micros:
+                lines.append(f"{';'.join(path)} {micros}")
+            for name, child in node.children.items():
+                path.append(name)
+                walk(child, path)
+                path.pop()
+
+        walk(self.root, [])
+        return "\n".join(lines) + "\n" if lines else ""
+
+
+class _Profiled:
+    """Awaitable that drives ``coro`` with the profiler on for each step"""
+
+    def __init__(self, coro: Coroutine, profiler: StackProfiler):
+        self.coro = coro
+        self.profiler = profiler
+
+    def __await__(self):
+        coro = self.coro
+        value = error = None
+        while True:
+            self.profiler.start()
+            try:
+                if error is not None:
+                    signal = coro.throw(error)
+                else:
+                    signal = coro.send(value)
+            except StopIteration as stop:
+                return stop.value
+            finally:
+                self.profiler.stop()
+            try:
+                value = yield signal
+                error = None
+            except BaseException as exc:
+                value, error = None, exc
+
+
+class ProfileStore:
+    """The most recent ``capacity`` profiles, oldest dropped first"""
+
+    def __init__(self, capacity: int):
+        self._profiles: deque = deque(maxlen=capacity)
+        self._lock = threading.Lock()
+        self._ids = itertools.count(1)
+
+    def next_id(self) -> int:
+        return next(self._ids)
+
+    def add(self, profile: Dict[str, Any]):
+        with self._lock:
+            self._profiles.append(profile)
+
+    def list(self) -> List[Dict[str, Any]]:
+        """Summaries, newest first"""
+        with self._lock:
+            profiles = list(self._profiles)
+        return [
+            {key: value for key, value in profile.items() if key != "stacks"}
+            for profile in reversed(profiles)
+        ]
+
+    def get(self, profile_id: int) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            for profile in self._profiles:
+                if profile["id"] == profile_id:
+                    return profile
+        return None
+
+    def clear(self):
+        with self._lock:
+            self._profiles.clear()
+
+
+class ProfilingMiddleware:
+    """ASGI middleware profiling requests that ask for it or are sampled"""
+
+    def __init__(self, app: ASGIApp, store: ProfileStore, sample_rate: float = 0.0):
+        self.app = app
+        self.store = store
+        self.sample_rate = sample_rate
+
+    async def _requested(self, scope: Scope) -> bool:
+        for name, value in scope["headers"]:
+            if name == PROFILE_HEADER.encode():
+                try:
+                    return await get_role(int(value)) == "admin"
+                except ValueError:
+                    return False
+        return self.sample_rate > 0 and random.random() < self.sample_rate
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http" or not await self._requested(scope):
+            await self.app(scope, receive, send)
+            return
+
+        profile_id = self.store.next_id()
+        status_code = 500
+        profiler = StackProfiler()
+        started = time.time()
+        start = time.perf_counter()
+
+        async def send_wrapper(message: Message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+                message["headers"] = list(message.get("headers", [])) + [
+                    (PROFILE_ID_HEADER.lower().encode(), str(profile_id).encode())
+                ]
+            await send(message)
+
+        try:
+            await _Profiled(self.app(scope, receive, send_wrapper), profiler)
+        finally:
+            self.store.add({
+                "id": profile_id,
+                "timestamp": started,
+                "method": scope["method"],
+                "path": scope["path"],
+                "route": route_template(scope),
+                "status": status_code,
+                "wall_ms": (time.perf_counter() - start) * 1000,
+                "profiled_ms": profiler.total_ns / 1e6,
+                "stacks": profiler.collapsed()
+            })
+
+
+profile_store = ProfileStore(capacity=settings.profile_buffer_size)
@@ -0,0 +1,86 @@
+"""
+Internal row types kept by the storage backends.
+
+The API models in app/models.py validate input and shape responses; rows
+already validated on the way in are stored as these plain ``__slots__``
+records instead, which skips validation on insert and carries no pydantic
+state per row. Response models read them through ``from_attributes``.
+"""
+from typing import Any, NamedTuple, Optional, Tuple
+
+
+class Record:
+    __slots__ = ()
+
+    def _values(self) -> Tuple[Any, ...]:
+        return tuple(getattr(self, name) for name in self.__slots__)
+
+    def __eq__(self, other) -> bool:
+        if type(other) is not type(self):
+            return NotImplemented
+        return self._values() == other._values()
+
+    __hash__ = None
+
+    def __repr__(self) -> str:
+        fields = ", ".join(f"{name}={getattr(self, name)!r}" for name in self.__slots__)
+        return f"{type(self).__name__}({fields})"
+
+    def copy(self):
+        return type(self)(*self._values())
+
+
+class UserRecord(Record):
+    __slots__ = ("id", "name", "email", "role")
+
+    def __init__(self, id: int, name: str, email: str, role: str):
+        self.id = id
+        self.name = name
+        self.email = email
+        self.role = role
+
+
+class CourseRecord(Record):
+    __slots__ = ("id", "title", "code", "capacity")
+
+    def __init__(self, id: int, title: str, code: str, capacity: Optional[int] = None):
+        self.id = id
+        self.title = title
+        self.code = code
+        # Seat limit; None means unlimited
+        self.capacity = capacity
+
+
+class EnrollmentRecord(Record):
+    __slots__ = ("id", "user_id", "course_id")
+
+    def __init__(self, id: int, user_id: int, course_id: int):
+        self.id = id
+        self.user_id = user_id
+        self.course_id = course_id
+
+
+# Outcomes of Database.try_enroll
+ENROLLED = "enrolled"
+WAITLISTED = "waitlisted"
+ALREADY_ENROLLED = "already_enrolled"
+ALREADY_WAITLISTED = "already_waitlisted"
+COURSE_NOT_FOUND = "course_not_found"
+COURSE_FULL = "course_full"
+
+
+# Course update capacity meaning "keep the stored seat limit"; None is unlimited
+UNCHANGED: Any = object()
+
+
+class EnrollOutcome(NamedTuple):
+    status: str
+    enrollment: Optional[EnrollmentRecord] = None
+    # 1-based place in the waitlist, for WAITLISTED / ALREADY_WAITLISTED
+    position: Optional[int] = None
+
+
+class SeatCount(NamedTuple):
+    capacity: Optional[int]
+    enrolled: int
+    waitlisted: int
@@ -0,0 +1,129 @@
+"""
+Bounded user id -> role cache with TinyLFU admission and LRU eviction.
+
+Every lookup, hit or miss, is counted in a small count-min sketch. When the
+cache is full, a new entry is only admitted if the sketch estimates it is
+used more often than the least recently used entry it would evict. This
+keeps a scan of one-off ids (e.g. a bulk import touching every user once)
+from flushing the handful of admin ids that guard every write.
+"""
+import threading
+from collections import OrderedDict
+from typing import Dict, Optional
+
+# Independent multipliers for the sketch rows (odd 64-bit constants)
+_SEEDS = (0x9E3779B97F4A7C15, 0xC2B2AE3D27D4EB4F, 0x165667B19E3779F9, 0xD6E8FEB86659FD93)
+_MASK = (1 << 64) - 1
+_MAX_COUNT = 15
+
+
+class FrequencySketch:
+    """
+    Count-min sketch of recent access frequency with 4-bit saturating
+    counters. After ``sample_size`` increments every counter is halved, so
+    estimates favour recent popularity.
+    """
+
+    def __init__(self, width: int, sample_size: int):
+        self.width = max(16, width)
+        self.sample_size = sample_size
+        self.rows = [bytearray(self.width) for _ in _SEEDS]
+        self.additions = 0
+
+    def _slots(self, key: int):
+        for seed, row in zip(_SEEDS, self.rows):
+            yield row, (((key * seed) & _MASK) >> 32) % self.width
+
+    def increment(self, key: int):
+        for row, slot in self._slots(key):
+            if row[slot] < _MAX_COUNT:
+                row[slot] += 1
+        self.additions += 1
+        if self.additions >= self.sample_size:
+            self._age()
+
+    def estimate(self, key: int) -> int:
+        return min(row[slot] for row, slot in self._slots(key))
+
+    def _age(self):
+        self.rows = [bytearray(count >> 1 for count in row) for row in self.rows]
+        self.additions //= 2
+
+
+class RoleCache:
+    """
+    Thread-safe cache of user roles.
+
+    Fills pass the ``generation`` read before the backing lookup; a fill is
+    dropped if an invalidation happened since, so a role read just before a
+    reset can never be stored for an id that now names a different user.
+    """
+
+    def __init__(self, capacity: int):
+        self.capacity = capacity
+        self.sketch = FrequencySketch(width=capacity * 4, sample_size=capacity * 10)
+        self._entries: "OrderedDict[int, str]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.generation = 0
+        self.hits = 0
+        self.misses = 0
+        self.rejections = 0
+        self.evictions = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, user_id: int) -> Optional[str]:
+        with self._lock:
+            self.sketch.increment(user_id)
+            role = self._entries.get(user_id)
+            if role is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(user_id)
+            self.hits += 1
+            return role
+
+    def peek(self, user_id: int) -> Optional[str]:
+        """Cached role, without counting the lookup or refreshing recency"""
+        with self._lock:
+            return self._entries.get(user_id)
+
+    def put(self, user_id: int, role: str, generation: int):
+        with self._lock:
+            if generation != self.generation or self.capacity <= 0:
+                return
+            if user_id in self._entries:
+                self._entries[user_id] = role
+                self._entries.move_to_end(user_id)
+                return
+            if len(self._entries) >= self.capacity:
+                victim = next(iter(self._entries))
+                if self.sketch.estimate(user_id) <= self.sketch.estimate(victim):
+                    self.rejections += 1
+                    return
+                del self._entries[victim]
+                self.evictions += 1
+            self._entries[user_id] = role
+
+    def invalidate(self, user_id: Optional[int] = None):
+        """Drop one user (or every user when None)"""
+        with self._lock:
+            self.generation += 1
+            if user_id is None:
+                self._entries.clear()
+            else:
+                self._entries.pop(user_id, None)
+
+    def stats(self) -> Dict[str, float]:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "size": len(self._entries),
+                "capacity": self.capacity,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_ratio": self.hits / lookups if lookups else 0.0,
+                "rejections": self.rejections,
+                "evictions": self.evictions
+            }
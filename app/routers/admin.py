@@ -0,0 +1,66 @@
+from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi.responses import PlainTextResponse
+from typing import Any, Dict, List
+from app.auth import verify_admin
+from app.profiling import profile_store
+from app.tracing import storage_stats
+
+router = APIRouter(
+    prefix="/admin",
+    tags=["admin"],
+    dependencies=[Depends(verify_admin)]
+)
+
+
+@router.get("/profiles")
+async def list_profiles() -> List[Dict[str, Any]]:
+    """
+    List the stored request profiles, newest first.
+    
+    Admin-only access (`admin_id` query parameter). Profiles are recorded
+    when profiling is enabled (`PROFILING=true`), for requests sent with an
+    `X-Profile: <admin id>` header or picked by `PROFILE_SAMPLE_RATE`.
+    """
+    return profile_store.list()
+
+
+@router.get("/profiles/{profile_id}", response_class=PlainTextResponse)
+async def get_profile(profile_id: int):
+    """
+    Retrieve one profile as collapsed stacks.
+    
+    Admin-only access (`admin_id` query parameter). Each line is a
+    semicolon-separated call stack followed by its self time in
+    microseconds, ready for flamegraph.pl or speedscope.
+    """
+    profile = profile_store.get(profile_id)
+    if profile is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Profile not found"
+        )
+    return profile["stacks"]
+
+
+@router.get("/storage")
+async def get_storage_stats() -> List[Dict[str, Any]]:
+    """
+    Storage call totals per backend method, most total time first.
+    
+    Admin-only access (`admin_id` query parameter). Each entry has the
+    call count, total/mean/max wall time, and rows examined versus rows
+    returned. Recorded when `STORAGE_TRACING` is on (the default).
+    """
+    return storage_stats.summary()
+
+
+@router.delete("/storage")
+async def reset_storage_stats():
+    """
+    Reset the storage call totals.
+    
+    Admin-only access (`admin_id` query parameter). The `/metrics`
+    counters are not reset.
+    """
+    storage_stats.reset()
+    return {"detail": "Storage statistics reset"}
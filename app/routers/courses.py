@@ -1,7 +1,16 @@
-from fastapi import APIRouter, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Request, Response, status
 from typing import List
-from app.models import Course, CourseCreate, CourseUpdate
-from app.database import db
+from app.models import (
+    Course, CourseCreate, CourseUpdate, CourseSeats,
+    CourseBatchCreate, CourseBatchItemResult, CourseBatchResult
+)
+from app.async_database import async_db
+from app.auth import verify_admin
+from app.course_cache import course_cache
+from app.etag import ETAG_HEADER, make_etag, not_modified
+from app.pagination import PageParams
+from app.records import UNCHANGED
+from app.streaming import ndjson_response, wants_ndjson
 
 router = APIRouter(
     prefix="/courses",
@@ -9,50 +18,73 @@ router = APIRouter(
 )
 
 
-def verify_admin(admin_id: int):
-    """Helper function to verify admin role"""
-    user = db.get_user(admin_id)
-    if not user:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="Admin user not found"
-        )
-    if user.role != "admin":
-        raise HTTPException(
-            status_code=status.HTTP_403_FORBIDDEN,
-            detail="Only admins can perform this action"
-        )
-    return user
-
-
 @router.get("/", response_model=List[Course])
-def get_all_courses():
+async def get_all_courses(
+    request: Request, response: Response, page: PageParams = Depends()
+):
     """
     Retrieve all courses.
     
     Public access - anyone can view courses.
+    Supports keyset pagination via `limit` and `cursor`, and streams
+    NDJSON when requested with `Accept: application/x-ndjson`.
+    The unpaginated listing is served from the course cache. JSON
+    responses carry an ETag and honour `If-None-Match`.
     """
-    return db.get_all_courses()
+    if wants_ndjson(request):
+        return ndjson_response(
+            lambda after_id, limit: async_db.get_all_courses(after_id=after_id, limit=limit),
+            Course, page
+        )
+    etag = make_etag(async_db.version_epoch, await async_db.get_table_version("courses"))
+    unchanged = not_modified(request, response, etag)
+    if unchanged:
+        return unchanged
+    if page.limit is None and page.after_id is None:
+        body = course_cache.get_listing()
+        if body is None:
+            generation = course_cache.generation
+            body = course_cache.store_listing(await async_db.get_all_courses(), generation)
+        return Response(content=body, media_type="application/json", headers={ETAG_HEADER: etag})
+    courses = await async_db.get_all_courses(after_id=page.after_id, limit=page.fetch_limit)
+    return page.finish(courses, response)
 
 
 @router.get("/{course_id}", response_model=Course)
-def get_course(course_id: int):
+async def get_course(course_id: int, request: Request, response: Response):
     """
     Retrieve a course by ID.
     
     Public access - anyone can view a course.
+    Served from the course cache, with an ETag for conditional requests.
     """
-    course = db.get_course(course_id)
-    if not course:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="Course not found"
-        )
-    return course
+    # Deleting a course bumps the table version, so a matching tag for this
+    # id implies the course still exists; `*` does not, and is only
+    # honoured once the course is found.
+    etag = make_etag(
+        async_db.version_epoch, await async_db.get_table_version("courses"), course_id
+    )
+    unchanged = not_modified(request, response, etag, wildcard=False)
+    if unchanged:
+        return unchanged
+    body = course_cache.get(course_id)
+    if body is None:
+        generation = course_cache.generation
+        course = await async_db.get_course(course_id)
+        if not course:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail="Course not found"
+            )
+        body = course_cache.store(course, generation)
+    unchanged = not_modified(request, response, etag)
+    if unchanged:
+        return unchanged
+    return Response(content=body, media_type="application/json", headers={ETAG_HEADER: etag})
 
 
 @router.post("/", response_model=Course, status_code=status.HTTP_201_CREATED)
-def create_course(course: CourseCreate):
+async def create_course(course: CourseCreate):
     """
     Create a new course.
     
@@ -61,26 +93,85 @@ def create_course(course: CourseCreate):
     Validation:
     - title must not be empty
     - code must not be empty and must be unique
+    - capacity, when given, must be at least 1 (omitted means unlimited)
     """
     # Verify admin
-    verify_admin(course.admin_id)
+    await verify_admin(course.admin_id)
     
-    # Check if course code already exists
-    if db.course_code_exists(course.code):
+    # Create unless the course code already exists (checked atomically)
+    new_course = await async_db.try_create_course(
+        title=course.title,
+        code=course.code,
+        capacity=course.capacity
+    )
+    if not new_course:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="Course code already exists"
         )
+    return new_course
+
+
+@router.post("/batch", response_model=CourseBatchResult)
+async def create_courses_batch(batch: CourseBatchCreate):
+    """
+    Create many courses in one request.
     
-    new_course = db.create_course(
-        title=course.title,
-        code=course.code
+    Admin-only access, verified once for the whole batch.
+    
+    The whole payload is validated up front; an invalid item rejects the
+    request with 422. Codes that already exist, or repeat within the
+    batch, are reported per item with status 400 while the remaining
+    courses are created.
+    """
+    # Verify admin
+    await verify_admin(batch.admin_id)
+    
+    created = await async_db.create_courses(
+        [(course.title, course.code, course.capacity) for course in batch.courses]
+    )
+    results = [
+        CourseBatchItemResult(index=i, status_code=status.HTTP_201_CREATED, course=course)
+        if course is not None else
+        CourseBatchItemResult(
+            index=i,
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Course code already exists"
+        )
+        for i, course in enumerate(created)
+    ]
+    return CourseBatchResult(
+        created=sum(course is not None for course in created),
+        results=results
+    )
+
+
+@router.get("/{course_id}/seats", response_model=CourseSeats)
+async def get_course_seats(course_id: int):
+    """
+    Retrieve a course's capacity, seats taken and waitlist length.
+    
+    Public access - anyone can check seat availability.
+    """
+    seats = await async_db.get_seats(course_id)
+    if not seats:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Course not found"
+        )
+    return CourseSeats(
+        course_id=course_id,
+        capacity=seats.capacity,
+        enrolled=seats.enrolled,
+        available=(
+            None if seats.capacity is None else max(seats.capacity - seats.enrolled, 0)
+        ),
+        waitlisted=seats.waitlisted
     )
-    return new_course
 
 
 @router.put("/{course_id}", response_model=Course)
-def update_course(course_id: int, course: CourseUpdate):
+async def update_course(course_id: int, course: CourseUpdate):
     """
     Update a course.
     
@@ -89,52 +180,62 @@ def update_course(course_id: int, course: CourseUpdate):
     Validation:
     - title must not be empty
     - code must not be empty and must be unique
+    - capacity replaces the current one when given (null removes the
+      limit, omitted keeps it); raising it promotes waitlisted students
+      into the new seats
     """
     # Verify admin
-    verify_admin(course.admin_id)
+    await verify_admin(course.admin_id)
     
     # Check if course exists
-    existing_course = db.get_course(course_id)
+    existing_course = await async_db.get_course(course_id)
     if not existing_course:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Course not found"
         )
     
-    # Check if course code already exists (excluding current course)
-    if db.course_code_exists(course.code, exclude_id=course_id):
+    # Update unless another course owns the code (checked atomically)
+    updated_course = await async_db.try_update_course(
+        course_id=course_id,
+        title=course.title,
+        code=course.code,
+        capacity=course.capacity if "capacity" in course.model_fields_set else UNCHANGED
+    )
+    if not updated_course:
+        if not await async_db.get_course(course_id):
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail="Course not found"
+            )
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="Course code already exists"
         )
-    
-    updated_course = db.update_course(
-        course_id=course_id,
-        title=course.title,
-        code=course.code
-    )
     return updated_course
 
 
-@router.delete("/{course_id}", status_code=status.HTTP_200_OK)
-def delete_course(course_id: int, admin_id: int):
+@router.delete(
+    "/{course_id}", status_code=status.HTTP_200_OK, dependencies=[Depends(verify_admin)]
+)
+async def delete_course(course_id: int):
     """
     Delete a course.
     
-    Admin-only access.
+    Admin-only access (`admin_id` query parameter).
     
     Also deletes all enrollments for this course.
     """
-    # Verify admin
-    verify_admin(admin_id)
-    
     # Check if course exists
-    course = db.get_course(course_id)
+    course = await async_db.get_course(course_id)
     if not course:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Course not found"
         )
     
-    db.delete_course(course_id)
-    return {"detail": "Course deleted successfully"}
+    removed = await async_db.delete_course(course_id)
+    return {
+        "detail": "Course deleted successfully",
+        "enrollments_removed": removed
+    }
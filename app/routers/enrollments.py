@@ -1,7 +1,20 @@
-from fastapi import APIRouter, HTTPException, status
-from typing import List
-from app.models import Enrollment, EnrollmentCreate
-from app.database import db
+from fastapi import APIRouter, Depends, HTTPException, Request, Response, status
+from fastapi.responses import JSONResponse
+from typing import List, Optional, Tuple
+from app.models import (
+    Enrollment, EnrollmentCreate, Waitlisted, CourseWaitlist,
+    CourseEnrollmentBatch, StudentEnrollmentBatch,
+    EnrollmentBatchItemResult, EnrollmentBatchResult
+)
+from app.async_database import async_db
+from app.records import (
+    ENROLLED, WAITLISTED, ALREADY_ENROLLED, ALREADY_WAITLISTED, COURSE_NOT_FOUND,
+    COURSE_FULL
+)
+from app.auth import verify_admin, verify_student
+from app.etag import make_etag, not_modified
+from app.pagination import PageParams
+from app.streaming import ndjson_response, wants_ndjson
 
 router = APIRouter(
     prefix="/enrollments",
@@ -9,77 +22,171 @@ router = APIRouter(
 )
 
 
-def verify_student(user_id: int):
-    """Helper function to verify student role"""
-    user = db.get_user(user_id)
-    if not user:
+@router.post(
+    "/",
+    response_model=Enrollment,
+    status_code=status.HTTP_201_CREATED,
+    responses={status.HTTP_202_ACCEPTED: {"model": Waitlisted}}
+)
+async def enroll_student(enrollment: EnrollmentCreate):
+    """
+    Enroll a student in a course.
+    
+    Student-only access.
+    
+    Rules:
+    - Only users with role 'student' can enroll
+    - A student cannot enroll in the same course more than once
+    - Enrollment must fail if the student or course does not exist
+    - When the course is full the student joins its waitlist instead
+      (202 with their position) and is enrolled when a seat frees up
+    """
+    # Verify student
+    await verify_student(enrollment.user_id)
+    
+    # Take a seat or join the waitlist (checked and applied atomically)
+    outcome = await async_db.try_enroll(
+        user_id=enrollment.user_id,
+        course_id=enrollment.course_id
+    )
+    if outcome.status == COURSE_NOT_FOUND:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
-            detail="User not found"
+            detail="Course not found"
         )
-    if user.role != "student":
+    if outcome.status == ALREADY_ENROLLED:
         raise HTTPException(
-            status_code=status.HTTP_403_FORBIDDEN,
-            detail="Only students can perform this action"
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Student is already enrolled in this course"
         )
-    return user
-
-
-def verify_admin(admin_id: int):
-    """Helper function to verify admin role"""
-    user = db.get_user(admin_id)
-    if not user:
+    if outcome.status == ALREADY_WAITLISTED:
         raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="Admin user not found"
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Student is already on the waitlist for this course"
         )
-    if user.role != "admin":
-        raise HTTPException(
-            status_code=status.HTTP_403_FORBIDDEN,
-            detail="Only admins can perform this action"
+    if outcome.status == WAITLISTED:
+        return JSONResponse(
+            status_code=status.HTTP_202_ACCEPTED,
+            content=Waitlisted(
+                detail="Course is full; added to the waitlist",
+                user_id=enrollment.user_id,
+                course_id=enrollment.course_id,
+                position=outcome.position
+            ).model_dump()
         )
-    return user
+    return outcome.enrollment
+
+
+def _failed_item(index: int, status_code: int, detail: str) -> EnrollmentBatchItemResult:
+    return EnrollmentBatchItemResult(index=index, status_code=status_code, detail=detail)
+
+
+# Result of a batch pair skipped by the store, by outcome status
+SKIPPED_ITEMS = {
+    ALREADY_ENROLLED: (
+        status.HTTP_400_BAD_REQUEST, "Student is already enrolled in this course"
+    ),
+    COURSE_FULL: (status.HTTP_409_CONFLICT, "Course is full"),
+    COURSE_NOT_FOUND: (status.HTTP_404_NOT_FOUND, "Course not found"),
+}
 
 
-@router.post("/", response_model=Enrollment, status_code=status.HTTP_201_CREATED)
-def enroll_student(enrollment: EnrollmentCreate):
+async def _insert_batch(
+    pairs: List[Tuple[int, int]],
+    positions: List[int],
+    results: List[Optional[EnrollmentBatchItemResult]]
+) -> EnrollmentBatchResult:
+    """Insert the pairs that passed checks and fill in their results"""
+    outcomes = await async_db.create_enrollments(pairs)
+    created = 0
+    for index, outcome in zip(positions, outcomes):
+        if outcome.status == ENROLLED:
+            created += 1
+            results[index] = EnrollmentBatchItemResult(
+                index=index,
+                status_code=status.HTTP_201_CREATED,
+                enrollment=outcome.enrollment
+            )
+        else:
+            results[index] = _failed_item(index, *SKIPPED_ITEMS[outcome.status])
+    return EnrollmentBatchResult(created=created, results=results)
+
+
+@router.post("/course/{course_id}/batch", response_model=EnrollmentBatchResult)
+async def enroll_students_batch(course_id: int, batch: CourseEnrollmentBatch):
     """
-    Enroll a student in a course.
+    Enroll many students in one course.
     
-    Student-only access.
+    Admin-only access, verified once for the whole batch.
     
-    Rules:
-    - Only users with role 'student' can enroll
-    - A student cannot enroll in the same course more than once
-    - Enrollment must fail if the student or course does not exist
+    Each user id gets its own result: 201 when enrolled, 404 when the user
+    does not exist, 403 when the user is not a student, 400 when the
+    student is already enrolled (or listed twice) and 409 when the course
+    has no seat left. Batches never join the waitlist.
     """
-    # Verify student
-    verify_student(enrollment.user_id)
+    # Verify admin
+    await verify_admin(batch.admin_id)
     
     # Check if course exists
-    course = db.get_course(enrollment.course_id)
+    course = await async_db.get_course(course_id)
     if not course:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Course not found"
         )
     
-    # Check if already enrolled
-    if db.enrollment_exists(enrollment.user_id, enrollment.course_id):
-        raise HTTPException(
-            status_code=status.HTTP_400_BAD_REQUEST,
-            detail="Student is already enrolled in this course"
-        )
+    results: List[Optional[EnrollmentBatchItemResult]] = [None] * len(batch.user_ids)
+    pairs: List[Tuple[int, int]] = []
+    positions: List[int] = []
+    users = await async_db.get_users(batch.user_ids)
+    for index, user_id in enumerate(batch.user_ids):
+        user = users.get(user_id)
+        if not user:
+            results[index] = _failed_item(
+                index, status.HTTP_404_NOT_FOUND, "User not found"
+            )
+        elif user.role != "student":
+            results[index] = _failed_item(
+                index, status.HTTP_403_FORBIDDEN, "Only students can perform this action"
+            )
+        else:
+            pairs.append((user_id, course_id))
+            positions.append(index)
+    return await _insert_batch(pairs, positions, results)
+
+
+@router.post("/student/{user_id}/batch", response_model=EnrollmentBatchResult)
+async def enroll_in_courses_batch(user_id: int, batch: StudentEnrollmentBatch):
+    """
+    Enroll one student in many courses.
     
-    new_enrollment = db.create_enrollment(
-        user_id=enrollment.user_id,
-        course_id=enrollment.course_id
-    )
-    return new_enrollment
+    Student-only access, verified once for the whole batch.
+    
+    Each course id gets its own result: 201 when enrolled, 404 when the
+    course does not exist, 400 when the student is already enrolled (or
+    the course is listed twice) and 409 when the course is full. Batches
+    never join the waitlist.
+    """
+    # Verify student
+    await verify_student(user_id)
+    
+    results: List[Optional[EnrollmentBatchItemResult]] = [None] * len(batch.course_ids)
+    pairs: List[Tuple[int, int]] = []
+    positions: List[int] = []
+    courses = await async_db.get_courses(batch.course_ids)
+    for index, course_id in enumerate(batch.course_ids):
+        if course_id not in courses:
+            results[index] = _failed_item(
+                index, status.HTTP_404_NOT_FOUND, "Course not found"
+            )
+        else:
+            pairs.append((user_id, course_id))
+            positions.append(index)
+    return await _insert_batch(pairs, positions, results)
 
 
 @router.delete("/{enrollment_id}", status_code=status.HTTP_200_OK)
-def deregister_student(enrollment_id: int, user_id: int):
+async def deregister_student(enrollment_id: int, user_id: int):
     """
     Deregister a student from a course.
     
@@ -89,9 +196,10 @@ def deregister_student(enrollment_id: int, user_id: int):
     - Only students can deregister themselves
     - Deregistration must fail if the enrollment does not exist
     - Students can only deregister their own enrollments
+    - The freed seat goes to the first student on the course's waitlist
     """
     # Get enrollment
-    enrollment = db.get_enrollment(enrollment_id)
+    enrollment = await async_db.get_enrollment(enrollment_id)
     if not enrollment:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -99,7 +207,7 @@ def deregister_student(enrollment_id: int, user_id: int):
         )
     
     # Verify student
-    verify_student(user_id)
+    await verify_student(user_id)
     
     # Verify the enrollment belongs to this student
     if enrollment.user_id != user_id:
@@ -108,83 +216,232 @@ def deregister_student(enrollment_id: int, user_id: int):
             detail="Students can only deregister their own enrollments"
         )
     
-    db.delete_enrollment(enrollment_id)
+    await async_db.delete_enrollment(enrollment_id)
     return {"detail": "Successfully deregistered from course"}
 
 
 @router.get("/student/{user_id}", response_model=List[Enrollment])
-def get_student_enrollments(user_id: int):
+async def get_student_enrollments(
+    user_id: int, request: Request, response: Response, page: PageParams = Depends()
+):
     """
     Retrieve enrollments for a specific student.
     
     Public access - anyone can view a student's enrollments.
+    Supports keyset pagination via `limit` and `cursor`, and streams
+    NDJSON when requested with `Accept: application/x-ndjson`. JSON
+    responses carry an ETag and honour `If-None-Match`.
     """
+    # Answered before any row is read. Users are never deleted, so a
+    # matching tag for this id implies the user still exists; `*` does not, and is
+    # only honoured once the user is found.
+    if not wants_ndjson(request):
+        etag = make_etag(
+            async_db.version_epoch,
+            await async_db.get_student_enrollments_version(user_id),
+            user_id
+        )
+        unchanged = not_modified(request, response, etag, wildcard=False)
+        if unchanged:
+            return unchanged
+    
     # Check if user exists
-    user = db.get_user(user_id)
+    user = await async_db.get_user(user_id)
     if not user:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="User not found"
         )
     
-    enrollments = db.get_enrollments_by_student(user_id)
-    return enrollments
+    if not wants_ndjson(request):
+        unchanged = not_modified(request, response, etag)
+        if unchanged:
+            return unchanged
+    
+    if wants_ndjson(request):
+        return ndjson_response(
+            lambda after_id, limit: async_db.get_enrollments_by_student(
+                user_id, after_id=after_id, limit=limit
+            ),
+            Enrollment, page
+        )
+    
+    enrollments = await async_db.get_enrollments_by_student(
+        user_id, after_id=page.after_id, limit=page.fetch_limit
+    )
+    return page.finish(enrollments, response)
 
 
-@router.get("/", response_model=List[Enrollment])
-def get_all_enrollments(admin_id: int):
+@router.get("/", response_model=List[Enrollment], dependencies=[Depends(verify_admin)])
+async def get_all_enrollments(
+    request: Request, response: Response, page: PageParams = Depends()
+):
     """
     Retrieve all enrollments.
     
-    Admin-only access.
+    Admin-only access (`admin_id` query parameter).
+    Supports keyset pagination via `limit` and `cursor`, and streams
+    NDJSON when requested with `Accept: application/x-ndjson`. JSON
+    responses carry an ETag and honour `If-None-Match`.
     """
-    # Verify admin
-    verify_admin(admin_id)
+    if wants_ndjson(request):
+        return ndjson_response(
+            lambda after_id, limit: async_db.get_all_enrollments(after_id=after_id, limit=limit),
+            Enrollment, page
+        )
     
-    return db.get_all_enrollments()
+    etag = make_etag(async_db.version_epoch, await async_db.get_table_version("enrollments"))
+    unchanged = not_modified(request, response, etag)
+    if unchanged:
+        return unchanged
+    
+    enrollments = await async_db.get_all_enrollments(
+        after_id=page.after_id, limit=page.fetch_limit
+    )
+    return page.finish(enrollments, response)
 
 
-@router.get("/course/{course_id}", response_model=List[Enrollment])
-def get_course_enrollments(course_id: int, admin_id: int):
+@router.get(
+    "/course/{course_id}",
+    response_model=List[Enrollment],
+    dependencies=[Depends(verify_admin)]
+)
+async def get_course_enrollments(
+    course_id: int,
+    request: Request,
+    response: Response,
+    page: PageParams = Depends()
+):
     """
     Retrieve enrollments for a specific course.
     
-    Admin-only access.
+    Admin-only access (`admin_id` query parameter).
+    Supports keyset pagination via `limit` and `cursor`, and streams
+    NDJSON when requested with `Accept: application/x-ndjson`. JSON
+    responses carry an ETag and honour `If-None-Match`.
     """
-    # Verify admin
-    verify_admin(admin_id)
+    # Deleting a course bumps its version, so a matching tag for this id
+    # implies the course still exists; `*` does not, and is only honoured once the
+    # course is found.
+    if not wants_ndjson(request):
+        etag = make_etag(
+            async_db.version_epoch,
+            await async_db.get_course_enrollments_version(course_id),
+            course_id
+        )
+        unchanged = not_modified(request, response, etag, wildcard=False)
+        if unchanged:
+            return unchanged
     
     # Check if course exists
-    course = db.get_course(course_id)
+    course = await async_db.get_course(course_id)
     if not course:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Course not found"
         )
     
-    enrollments = db.get_enrollments_by_course(course_id)
-    return enrollments
+    if not wants_ndjson(request):
+        unchanged = not_modified(request, response, etag)
+        if unchanged:
+            return unchanged
+    
+    if wants_ndjson(request):
+        return ndjson_response(
+            lambda after_id, limit: async_db.get_enrollments_by_course(
+                course_id, after_id=after_id, limit=limit
+            ),
+            Enrollment, page
+        )
+    
+    enrollments = await async_db.get_enrollments_by_course(
+        course_id, after_id=page.after_id, limit=page.fetch_limit
+    )
+    return page.finish(enrollments, response)
 
 
-@router.delete("/admin/{enrollment_id}", status_code=status.HTTP_200_OK)
-def admin_force_deregister(enrollment_id: int, admin_id: int):
+@router.delete(
+    "/admin/{enrollment_id}",
+    status_code=status.HTTP_200_OK,
+    dependencies=[Depends(verify_admin)]
+)
+async def admin_force_deregister(enrollment_id: int):
     """
     Force deregister a student from a course.
     
-    Admin-only access.
+    Admin-only access (`admin_id` query parameter).
     
-    Allows admins to remove any student enrollment.
+    Allows admins to remove any student enrollment. The freed seat goes
+    to the first student on the course's waitlist.
     """
-    # Verify admin
-    verify_admin(admin_id)
-    
     # Get enrollment
-    enrollment = db.get_enrollment(enrollment_id)
+    enrollment = await async_db.get_enrollment(enrollment_id)
     if not enrollment:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Enrollment not found"
         )
     
-    db.delete_enrollment(enrollment_id)
+    await async_db.delete_enrollment(enrollment_id)
     return {"detail": "Student successfully deregistered by admin"}
+
+
+@router.get(
+    "/waitlist/{course_id}",
+    response_model=CourseWaitlist,
+    dependencies=[Depends(verify_admin)]
+)
+async def get_course_waitlist(course_id: int):
+    """
+    Retrieve the waitlist of a course, next student to be enrolled first.
+    
+    Admin-only access (`admin_id` query parameter).
+    """
+    if not await async_db.get_course(course_id):
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Course not found"
+        )
+    return CourseWaitlist(course_id=course_id, user_ids=await async_db.get_waitlist(course_id))
+
+
+@router.get("/waitlist/{course_id}/position", response_model=Waitlisted)
+async def get_waitlist_position(course_id: int, user_id: int):
+    """
+    Retrieve a student's place in a course's waitlist.
+    
+    Student-only access.
+    """
+    # Verify student
+    await verify_student(user_id)
+    
+    position = await async_db.get_waitlist_position(user_id, course_id)
+    if not position:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Student is not on the waitlist for this course"
+        )
+    return Waitlisted(
+        detail="Waiting for a seat",
+        user_id=user_id,
+        course_id=course_id,
+        position=position
+    )
+
+
+@router.delete("/waitlist/{course_id}", status_code=status.HTTP_200_OK)
+async def leave_waitlist(course_id: int, user_id: int):
+    """
+    Leave a course's waitlist.
+    
+    Student-only access.
+    """
+    # Verify student
+    await verify_student(user_id)
+    
+    if not await async_db.leave_waitlist(user_id, course_id):
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Student is not on the waitlist for this course"
+        )
+    return {"detail": "Successfully left the waitlist"}
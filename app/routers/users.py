@@ -1,7 +1,11 @@
-from fastapi import APIRouter, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Request, Response, status
 from typing import List
-from app.models import User, UserCreate
-from app.database import db
+from app.models import User, UserCreate, UserBatchCreate, UserBatchItemResult, UserBatchResult
+from app.async_database import async_db
+from app.auth import verify_admin
+from app.etag import make_etag, not_modified
+from app.pagination import PageParams
+from app.streaming import ndjson_response, wants_ndjson
 
 router = APIRouter(
     prefix="/users",
@@ -10,7 +14,7 @@ router = APIRouter(
 
 
 @router.post("/", response_model=User, status_code=status.HTTP_201_CREATED)
-def create_user(user: UserCreate):
+async def create_user(user: UserCreate):
     """
     Create a new user.
     
@@ -19,38 +23,92 @@ def create_user(user: UserCreate):
     - email must be valid email format
     - role must be either 'student' or 'admin'
     """
-    # Check if email already exists
-    if db.email_exists(user.email):
+    # Create unless the email already exists (checked atomically)
+    new_user = await async_db.try_create_user(
+        name=user.name,
+        email=user.email,
+        role=user.role
+    )
+    if not new_user:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="Email already registered"
         )
+    return new_user
+
+
+@router.post("/batch", response_model=UserBatchResult)
+async def create_users_batch(batch: UserBatchCreate):
+    """
+    Create many users in one request (admin only).
     
-    new_user = db.create_user(
-        name=user.name,
-        email=user.email,
-        role=user.role
+    The admin is verified once for the whole batch, and the whole payload
+    is validated up front; an invalid item rejects the request with 422.
+    Emails already registered, or repeated within the batch, are reported
+    per item with status 400 while the remaining users are created.
+    """
+    await verify_admin(batch.admin_id)
+    created = await async_db.create_users(
+        [(user.name, user.email, user.role) for user in batch.users]
+    )
+    results = [
+        UserBatchItemResult(index=i, status_code=status.HTTP_201_CREATED, user=user)
+        if user is not None else
+        UserBatchItemResult(
+            index=i,
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Email already registered"
+        )
+        for i, user in enumerate(created)
+    ]
+    return UserBatchResult(
+        created=sum(user is not None for user in created),
+        results=results
     )
-    return new_user
 
 
 @router.get("/", response_model=List[User])
-def get_all_users():
+async def get_all_users(
+    request: Request, response: Response, page: PageParams = Depends()
+):
     """
     Retrieve all users.
+
+    Supports keyset pagination via `limit` and `cursor`, and streams
+    NDJSON when requested with `Accept: application/x-ndjson`. JSON
+    responses carry an ETag and honour `If-None-Match`.
     """
-    return db.get_all_users()
+    if wants_ndjson(request):
+        return ndjson_response(
+            lambda after_id, limit: async_db.get_all_users(after_id=after_id, limit=limit),
+            User, page
+        )
+    etag = make_etag(async_db.version_epoch, await async_db.get_table_version("users"))
+    unchanged = not_modified(request, response, etag)
+    if unchanged:
+        return unchanged
+    users = await async_db.get_all_users(after_id=page.after_id, limit=page.fetch_limit)
+    return page.finish(users, response)
 
 
 @router.get("/{user_id}", response_model=User)
-def get_user(user_id: int):
+async def get_user(user_id: int, request: Request, response: Response):
     """
     Retrieve a user by ID.
+
+    Responses carry an ETag and honour `If-None-Match`.
     """
-    user = db.get_user(user_id)
+    # Users are only deleted by a reset, which bumps the table version, so
+    # a matching tag for this id implies the user still exists; `*` does
+    # not, and is only honoured once the user is found.
+    etag = make_etag(async_db.version_epoch, await async_db.get_table_version("users"), user_id)
+    unchanged = not_modified(request, response, etag, wildcard=False)
+    if unchanged:
+        return unchanged
+    user = await async_db.get_user(user_id)
     if not user:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="User not found"
         )
-    return user
+    return not_modified(request, response, etag) or user
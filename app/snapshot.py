@@ -0,0 +1,458 @@
+"""
+Binary snapshot format for the in-memory Database, read through mmap.
+
+A snapshot is one file: a fixed header, a section directory and 8-byte
+aligned sections. Integer columns are little-endian int64 arrays; string
+columns are an int64 offset array (n + 1 entries) into a UTF-8 heap. The
+secondary indexes are stored pre-sorted as row-position permutations, so
+attaching a snapshot does no per-row work at all: lookups binary-search the
+mapped buffer and rows are only materialized, and cached, when accessed.
+Enrollment columns are copied into the in-memory column table as whole
+arrays.
+
+Sections (n = rows in the table):
+
+    users.id, users.role                     int64[n], int8[n]
+    users.name / users.email / users.email_key     string columns
+    users.by_email                           positions sorted by email_key
+    courses.id, courses.capacity             int64[n] (capacity -1 = unlimited)
+    courses.title / courses.code / courses.code_key string columns
+    courses.by_code                          positions sorted by code_key
+    enrollments.id / .user_id / .course_id   int64[n]
+    enrollments.by_student                   positions sorted by (user_id, id)
+    enrollments.by_course                    positions sorted by (course_id, id)
+    waitlist.course_id / waitlist.user_id    int64[w], each course's queue in order
+
+Version 1 files (no capacity or waitlist sections) are still read: their
+courses are unlimited and their waitlists empty.
+"""
+import mmap
+import os
+import struct
+from array import array
+from bisect import bisect_left
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Iterator, List, Optional, Set, Tuple
+from app.columnar import EnrollmentTable
+from app.records import UserRecord, CourseRecord
+
+MAGIC = b"CEASNAP1"
+VERSION = 2
+READABLE_VERSIONS = (1, 2)
+FLAG_NORMALIZED_KEYS = 1
+HEADER = struct.Struct("<8sIIqqqqI")
+SECTION = struct.Struct("<24sqq")
+ROLES = ("student", "admin")
+
+_MISSING = object()
+
+
+def _align(size: int) -> int:
+    return (size + 7) & ~7
+
+
+# Writing
+
+def _int_section(values) -> bytes:
+    return array("q", values).tobytes()
+
+
+def _string_sections(name: str, values: List[str]) -> List[Tuple[str, bytes]]:
+    offsets = array("q", [0])
+    chunks = []
+    position = 0
+    for value in values:
+        encoded = value.encode("utf-8")
+        chunks.append(encoded)
+        position += len(encoded)
+        offsets.append(position)
+    return [(f"{name}.offsets", offsets.tobytes()), (f"{name}.heap", b"".join(chunks))]
+
+
+def write_snapshot(
+    path: str,
+    state: Dict[str, Any],
+    segment: int = 0,
+    normalize_keys: bool = False
+):
+    """
+    Atomically write ``state`` (from Database.export_state()) to ``path``.
+    ``segment`` records which journal segment starts after this snapshot.
+    """
+    def key(value: str) -> str:
+        return value.casefold() if normalize_keys else value
+
+    users = list(state["users"].values())
+    courses = list(state["courses"])
+    sections: List[Tuple[str, bytes]] = []
+
+    email_keys = [key(u.email) for u in users]
+    sections.append(("users.id", _int_section(u.id for u in users)))
+    sections.append(("users.role", array("b", (ROLES.index(u.role) for u in users)).tobytes()))
+    sections += _string_sections("users.name", [u.name for u in users])
+    sections += _string_sections("users.email", [u.email for u in users])
+    sections += _string_sections("users.email_key", email_keys)
+    sections.append((
+        "users.by_email",
+        _int_section(sorted(range(len(users)), key=email_keys.__getitem__))
+    ))
+
+    code_keys = [key(c.code) for c in courses]
+    sections.append(("courses.id", _int_section(c.id for c in courses)))
+    sections.append((
+        "courses.capacity",
+        _int_section(-1 if c.capacity is None else c.capacity for c in courses)
+    ))
+    sections += _string_sections("courses.title", [c.title for c in courses])
+    sections += _string_sections("courses.code", [c.code for c in courses])
+    sections += _string_sections("courses.code_key", code_keys)
+    sections.append((
+        "courses.by_code",
+        _int_section(sorted(range(len(courses)), key=code_keys.__getitem__))
+    ))
+
+    enrollment_ids, user_ids, course_ids = state["enrollments"].columns()
+    sections.append(("enrollments.id", enrollment_ids.tobytes()))
+    sections.append(("enrollments.user_id", user_ids.tobytes()))
+    sections.append(("enrollments.course_id", course_ids.tobytes()))
+    # Rows are in id order and sorted() is stable, so ties stay id-ordered
+    sections.append((
+        "enrollments.by_student",
+        _int_section(sorted(range(len(user_ids)), key=user_ids.__getitem__))
+    ))
+    sections.append((
+        "enrollments.by_course",
+        _int_section(sorted(range(len(course_ids)), key=course_ids.__getitem__))
+    ))
+
+    waitlists = state["waitlists"]
+    sections.append((
+        "waitlist.course_id",
+        _int_section(course_id for course_id, user_ids in waitlists for _ in user_ids)
+    ))
+    sections.append((
+        "waitlist.user_id", _int_section(u for _, user_ids in waitlists for u in user_ids)
+    ))
+
+    counters = state["counters"]
+    header = HEADER.pack(
+        MAGIC, VERSION, FLAG_NORMALIZED_KEYS if normalize_keys else 0, segment,
+        counters["user"], counters["course"], counters["enrollment"], len(sections)
+    )
+    offset = _align(HEADER.size + SECTION.size * len(sections))
+    directory = []
+    for name, data in sections:
+        directory.append(SECTION.pack(name.encode(), offset, len(data)))
+        offset = _align(offset + len(data))
+
+    temporary = path + ".tmp"
+    with open(temporary, "wb") as snapshot:
+        snapshot.write(header)
+        snapshot.write(b"".join(directory))
+        for _, data in sections:
+            snapshot.write(b"\0" * (_align(snapshot.tell()) - snapshot.tell()))
+            snapshot.write(data)
+        snapshot.flush()
+        os.fsync(snapshot.fileno())
+    os.replace(temporary, path)
+
+
+# Reading
+
+class StringColumn:
+    """Strings stored as an offset array into a UTF-8 heap"""
+
+    def __init__(self, offsets: memoryview, heap: memoryview):
+        self.offsets = offsets
+        self.heap = heap
+
+    def __len__(self) -> int:
+        return len(self.offsets) - 1
+
+    def __getitem__(self, position: int) -> str:
+        return str(self.heap[self.offsets[position]:self.offsets[position + 1]], "utf-8")
+
+
+class MappedTable:
+    """
+    Id-keyed table over mapped columns, with the dict operations Database
+    uses. Base rows are built by ``make_row`` on first access and cached, so
+    in-place updates stick; rows created after loading live in ``added``.
+    """
+
+    def __init__(self, ids: memoryview, make_row: Callable[[int], Any]):
+        self.ids = ids
+        self.make_row = make_row
+        self.cache: Dict[int, Any] = {}
+        self.removed: Set[int] = set()
+        self.added: Dict[int, Any] = {}
+
+    def _position(self, row_id: int) -> Optional[int]:
+        position = bisect_left(self.ids, row_id)
+        if position < len(self.ids) and self.ids[position] == row_id:
+            return position
+        return None
+
+    def get(self, row_id: int, default=None):
+        row = self.added.get(row_id)
+        if row is not None:
+            return row
+        row = self.cache.get(row_id)
+        if row is not None:
+            return row
+        if row_id in self.removed:
+            return default
+        position = self._position(row_id)
+        if position is None:
+            return default
+        row = self.cache[row_id] = self.make_row(position)
+        return row
+
+    def __getitem__(self, row_id: int):
+        row = self.get(row_id)
+        if row is None:
+            raise KeyError(row_id)
+        return row
+
+    def __contains__(self, row_id: int) -> bool:
+        # Answered from the id column, without building the row
+        if row_id in self.added or row_id in self.cache:
+            return True
+        return row_id not in self.removed and self._position(row_id) is not None
+
+    def __setitem__(self, row_id: int, row):
+        if self._position(row_id) is not None:
+            self.cache[row_id] = row
+            self.removed.discard(row_id)
+        else:
+            self.added[row_id] = row
+
+    def pop(self, row_id: int, default=_MISSING):
+        row = self.get(row_id)
+        if row is None:
+            if default is _MISSING:
+                raise KeyError(row_id)
+            return default
+        if row_id in self.added:
+            del self.added[row_id]
+        else:
+            self.cache.pop(row_id, None)
+            self.removed.add(row_id)
+        return row
+
+    def __len__(self) -> int:
+        return len(self.ids) - len(self.removed) + len(self.added)
+
+    def __iter__(self) -> Iterator[int]:
+        for row_id in self.ids:
+            if row_id not in self.removed:
+                yield row_id
+        yield from self.added
+
+    def values(self) -> Iterator[Any]:
+        """Yield rows in id order; base rows are built but not cached"""
+        cache = self.cache
+        removed = self.removed
+        for position, row_id in enumerate(self.ids):
+            if row_id in removed:
+                continue
+            row = cache.get(row_id)
+            yield row if row is not None else self.make_row(position)
+        yield from self.added.values()
+
+    def copy(self) -> "MappedTable":
+        """Cheap copy sharing the mapped base (for export_state)"""
+        clone = MappedTable(self.ids, self.make_row)
+        clone.cache = dict(self.cache)
+        clone.removed = set(self.removed)
+        clone.added = dict(self.added)
+        return clone
+
+
+class MappedUniqueIndex:
+    """key -> id index over a sorted permutation of a mapped string column"""
+
+    def __init__(self, keys: StringColumn, order: memoryview, ids: memoryview):
+        self.keys = keys
+        self.order = order
+        self.ids = ids
+        # Changes since loading; _MISSING marks a deleted base key
+        self.overlay: Dict[str, Any] = {}
+
+    def _base_get(self, key: str) -> Optional[int]:
+        keys, order = self.keys, self.order
+        low, high = 0, len(order)
+        while low < high:
+            middle = (low + high) // 2
+            if keys[order[middle]] < key:
+                low = middle + 1
+            else:
+                high = middle
+        if low < len(order) and keys[order[low]] == key:
+            return self.ids[order[low]]
+        return None
+
+    def get(self, key: str, default=None):
+        value = self.overlay.get(key, None)
+        if value is None:
+            value = self._base_get(key)
+        elif value is _MISSING:
+            value = None
+        return default if value is None else value
+
+    def __contains__(self, key: str) -> bool:
+        return self.get(key) is not None
+
+    def __setitem__(self, key: str, row_id: int):
+        self.overlay[key] = row_id
+
+    def __delitem__(self, key: str):
+        if self.get(key) is None:
+            raise KeyError(key)
+        self.overlay[key] = _MISSING
+
+
+class MappedGroupIndex:
+    """
+    group -> ascending row ids index (e.g. enrollments by student), over a
+    permutation of rows sorted by (group, id). A group's id array is
+    materialized from the mapped range the first time it is touched.
+    """
+
+    def __init__(self, groups: memoryview, order: memoryview, ids: memoryview):
+        self.groups = groups
+        self.order = order
+        self.ids = ids
+        self.overlay: Dict[int, array] = {}
+        self.dropped: Set[int] = set()
+
+    def base_range(self, group: int) -> Tuple[int, int]:
+        groups, order = self.groups, self.order
+        low, high = 0, len(order)
+        while low < high:
+            middle = (low + high) // 2
+            if groups[order[middle]] < group:
+                low = middle + 1
+            else:
+                high = middle
+        start = low
+        high = len(order)
+        while low < high:
+            middle = (low + high) // 2
+            if groups[order[middle]] <= group:
+                low = middle + 1
+            else:
+                high = middle
+        return start, low
+
+    def _load(self, group: int) -> Optional[array]:
+        members = self.overlay.get(group)
+        if members is not None or group in self.dropped:
+            return members
+        start, end = self.base_range(group)
+        if start == end:
+            return None
+        ids, order = self.ids, self.order
+        members = self.overlay[group] = array("q", (ids[order[p]] for p in range(start, end)))
+        return members
+
+    def get(self, group: int, default=None):
+        members = self._load(group)
+        return default if members is None else members
+
+    def __setitem__(self, group: int, members: array):
+        self.overlay[group] = members
+        self.dropped.discard(group)
+
+    def pop(self, group: int, default=_MISSING):
+        members = self._load(group)
+        if members is None:
+            if default is _MISSING:
+                raise KeyError(group)
+            return default
+        del self.overlay[group]
+        self.dropped.add(group)
+        return members
+
+    def __delitem__(self, group: int):
+        self.pop(group)
+
+
+class MappedSnapshot:
+    """A snapshot file opened with mmap, exposing lazy tables and indexes"""
+
+    def __init__(self, path: str):
+        with open(path, "rb") as snapshot:
+            self._map = mmap.mmap(snapshot.fileno(), 0, access=mmap.ACCESS_READ)
+        buffer = memoryview(self._map)
+        (magic, version, flags, self.segment, user_counter, course_counter,
+         enrollment_counter, section_count) = HEADER.unpack_from(buffer, 0)
+        if magic != MAGIC or version not in READABLE_VERSIONS:
+            raise ValueError(f"Not a snapshot file: {path}")
+        self.normalize_keys = bool(flags & FLAG_NORMALIZED_KEYS)
+        self.counters = {
+            "user": user_counter,
+            "course": course_counter,
+            "enrollment": enrollment_counter
+        }
+        self._sections: Dict[str, memoryview] = {}
+        for index in range(section_count):
+            name, offset, length = SECTION.unpack_from(buffer, HEADER.size + index * SECTION.size)
+            self._sections[name.rstrip(b"\0").decode()] = buffer[offset:offset + length]
+
+    def ints(self, name: str) -> memoryview:
+        return self._sections[name].cast("q")
+
+    def strings(self, name: str) -> StringColumn:
+        return StringColumn(
+            self._sections[f"{name}.offsets"].cast("q"), self._sections[f"{name}.heap"]
+        )
+
+    def users(self) -> Tuple[MappedTable, MappedUniqueIndex]:
+        ids = self.ints("users.id")
+        roles = self._sections["users.role"].cast("b")
+        names = self.strings("users.name")
+        emails = self.strings("users.email")
+
+        def make_row(p: int) -> UserRecord:
+            return UserRecord(ids[p], names[p], emails[p], ROLES[roles[p]])
+
+        table = MappedTable(ids, make_row)
+        index = MappedUniqueIndex(self.strings("users.email_key"), self.ints("users.by_email"), ids)
+        return table, index
+
+    def courses(self) -> Tuple[MappedTable, MappedUniqueIndex]:
+        ids = self.ints("courses.id")
+        titles = self.strings("courses.title")
+        codes = self.strings("courses.code")
+        capacities = self.ints("courses.capacity") if "courses.capacity" in self._sections else None
+
+        def make_row(p: int) -> CourseRecord:
+            capacity = capacities[p] if capacities is not None else -1
+            return CourseRecord(ids[p], titles[p], codes[p], None if capacity < 0 else capacity)
+
+        table = MappedTable(ids, make_row)
+        index = MappedUniqueIndex(self.strings("courses.code_key"), self.ints("courses.by_code"), ids)
+        return table, index
+
+    def enrollments(self) -> Tuple[EnrollmentTable, MappedGroupIndex, MappedGroupIndex]:
+        ids = self.ints("enrollments.id")
+        user_ids = self.ints("enrollments.user_id")
+        course_ids = self.ints("enrollments.course_id")
+        # The table needs writable columns; copying them is a flat memcpy
+        columns = []
+        for name in ("enrollments.id", "enrollments.user_id", "enrollments.course_id"):
+            columns.append(array("q"))
+            columns[-1].frombytes(self._sections[name])
+        table = EnrollmentTable(*columns)
+        by_student = MappedGroupIndex(user_ids, self.ints("enrollments.by_student"), ids)
+        by_course = MappedGroupIndex(course_ids, self.ints("enrollments.by_course"), ids)
+        return table, by_student, by_course
+
+    def waitlists(self) -> Dict[int, "OrderedDict[int, None]"]:
+        waitlists: Dict[int, "OrderedDict[int, None]"] = {}
+        if "waitlist.course_id" not in self._sections:
+            return waitlists
+        for course_id, user_id in zip(self.ints("waitlist.course_id"), self.ints("waitlist.user_id")):
+            waitlists.setdefault(course_id, OrderedDict())[user_id] = None
+        return waitlists
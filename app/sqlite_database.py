@@ -0,0 +1,714 @@
+import sqlite3
+import threading
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+from app.records import (
+    UserRecord, CourseRecord, EnrollmentRecord, EnrollOutcome, SeatCount,
+    ENROLLED, WAITLISTED, ALREADY_ENROLLED, ALREADY_WAITLISTED, COURSE_NOT_FOUND,
+    COURSE_FULL, UNCHANGED
+)
+from app.tracing import examined
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS users (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    name TEXT NOT NULL,
+    email TEXT NOT NULL,
+    email_key TEXT NOT NULL UNIQUE,
+    role TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS courses (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    title TEXT NOT NULL,
+    code TEXT NOT NULL,
+    code_key TEXT NOT NULL UNIQUE,
+    capacity INTEGER,
+    -- Seats taken, kept by the enrollment triggers below so the capacity
+    -- check is a single row read
+    enrolled INTEGER NOT NULL DEFAULT 0
+);
+CREATE TABLE IF NOT EXISTS enrollments (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    user_id INTEGER NOT NULL,
+    course_id INTEGER NOT NULL REFERENCES courses(id) ON DELETE CASCADE,
+    UNIQUE (user_id, course_id)
+);
+CREATE INDEX IF NOT EXISTS enrollments_by_student ON enrollments (user_id, id);
+CREATE INDEX IF NOT EXISTS enrollments_by_course ON enrollments (course_id, id);
+-- Students waiting for a seat in a full course, served in seq order
+CREATE TABLE IF NOT EXISTS waitlist (
+    seq INTEGER PRIMARY KEY AUTOINCREMENT,
+    user_id INTEGER NOT NULL,
+    course_id INTEGER NOT NULL REFERENCES courses(id) ON DELETE CASCADE,
+    UNIQUE (course_id, user_id)
+);
+CREATE INDEX IF NOT EXISTS waitlist_by_course ON waitlist (course_id, seq);
+CREATE TRIGGER IF NOT EXISTS enrollments_insert_seats AFTER INSERT ON enrollments BEGIN
+    UPDATE courses SET enrolled = enrolled + 1 WHERE id = NEW.course_id;
+END;
+CREATE TRIGGER IF NOT EXISTS enrollments_delete_seats AFTER DELETE ON enrollments BEGIN
+    UPDATE courses SET enrolled = enrolled - 1 WHERE id = OLD.course_id;
+END;
+
+-- Change counters for conditional GETs: whole tables use key 0, and the
+-- "student" and "course" scopes count changes to one enrollment set. Rows
+-- are never deleted, so counters keep increasing across resets.
+CREATE TABLE IF NOT EXISTS versions (
+    scope TEXT NOT NULL,
+    key INTEGER NOT NULL,
+    version INTEGER NOT NULL,
+    PRIMARY KEY (scope, key)
+) WITHOUT ROWID;
+INSERT OR IGNORE INTO versions VALUES ('epoch', 0, abs(random() % 1000000000000));
+CREATE TRIGGER IF NOT EXISTS users_version AFTER INSERT ON users BEGIN
+    INSERT INTO versions VALUES ('users', 0, 1)
+        ON CONFLICT DO UPDATE SET version = version + 1;
+END;
+CREATE TRIGGER IF NOT EXISTS users_delete_version AFTER DELETE ON users BEGIN
+    INSERT INTO versions VALUES ('users', 0, 1)
+        ON CONFLICT DO UPDATE SET version = version + 1;
+END;
+CREATE TRIGGER IF NOT EXISTS courses_insert_version AFTER INSERT ON courses BEGIN
+    INSERT INTO versions VALUES ('courses', 0, 1)
+        ON CONFLICT DO UPDATE SET version = version + 1;
+END;
+CREATE TRIGGER IF NOT EXISTS courses_update_version
+AFTER UPDATE OF title, code, capacity ON courses BEGIN
+    INSERT INTO versions VALUES ('courses', 0, 1)
+        ON CONFLICT DO UPDATE SET version = version + 1;
+END;
+CREATE TRIGGER IF NOT EXISTS courses_delete_version AFTER DELETE ON courses BEGIN
+    INSERT INTO versions VALUES ('courses', 0, 1)
+        ON CONFLICT DO UPDATE SET version = version + 1;
+    INSERT INTO versions VALUES ('course', OLD.id, 1)
+        ON CONFLICT DO UPDATE SET version = version + 1;
+END;
+CREATE TRIGGER IF NOT EXISTS enrollments_insert_version AFTER INSERT ON enrollments BEGIN
+    INSERT INTO versions VALUES ('enrollments', 0, 1), ('student', NEW.user_id, 1),
+        ('course', NEW.course_id, 1)
+        ON CONFLICT DO UPDATE SET version = version + 1;
+END;
+CREATE TRIGGER IF NOT EXISTS enrollments_delete_version AFTER DELETE ON enrollments BEGIN
+    INSERT INTO versions VALUES ('enrollments', 0, 1), ('student', OLD.user_id, 1),
+        ('course', OLD.course_id, 1)
+        ON CONFLICT DO UPDATE SET version = version + 1;
+END;
+"""
+
+# Statements are kept as module constants so every call reuses the same SQL
+# text and hits the per-connection prepared statement cache.
+INSERT_USER = "INSERT INTO users (name, email, email_key, role) VALUES (?, ?, ?, ?)"
+INSERT_USER_IF_ABSENT = (
+    "INSERT OR IGNORE INTO users (name, email, email_key, role) VALUES (?, ?, ?, ?)"
+)
+SELECT_USER = "SELECT id, name, email, role FROM users WHERE id = ?"
+PAGE_USERS = "SELECT id, name, email, role FROM users WHERE id > ? ORDER BY id LIMIT ?"
+EMAIL_EXISTS = "SELECT 1 FROM users WHERE email_key = ?"
+
+INSERT_COURSE = "INSERT INTO courses (title, code, code_key, capacity) VALUES (?, ?, ?, ?)"
+INSERT_COURSE_IF_ABSENT = (
+    "INSERT OR IGNORE INTO courses (title, code, code_key, capacity) VALUES (?, ?, ?, ?)"
+)
+SELECT_COURSE = "SELECT id, title, code, capacity FROM courses WHERE id = ?"
+PAGE_COURSES = "SELECT id, title, code, capacity FROM courses WHERE id > ? ORDER BY id LIMIT ?"
+CODE_OWNER = "SELECT id FROM courses WHERE code_key = ?"
+UPDATE_COURSE = (
+    "UPDATE courses SET title = ?, code = ?, code_key = ?, capacity = ? WHERE id = ?"
+)
+UPDATE_COURSE_KEEP_CAPACITY = (
+    "UPDATE courses SET title = ?, code = ?, code_key = ? WHERE id = ?"
+)
+COUNT_COURSE_ENROLLMENTS = "SELECT COUNT(*) FROM enrollments WHERE course_id = ?"
+DELETE_COURSE = "DELETE FROM courses WHERE id = ?"
+
+INSERT_ENROLLMENT = "INSERT INTO enrollments (user_id, course_id) VALUES (?, ?)"
+INSERT_ENROLLMENT_IF_ABSENT = (
+    "INSERT OR IGNORE INTO enrollments (user_id, course_id) "
+    "SELECT ?, id FROM courses WHERE id = ? AND (capacity IS NULL OR enrolled < capacity)"
+)
+INSERT_PROMOTED = "INSERT OR IGNORE INTO enrollments (user_id, course_id) VALUES (?, ?)"
+SELECT_ENROLLMENT = "SELECT id, user_id, course_id FROM enrollments WHERE id = ?"
+PAGE_ENROLLMENTS = (
+    "SELECT id, user_id, course_id FROM enrollments WHERE id > ? ORDER BY id LIMIT ?"
+)
+PAGE_ENROLLMENTS_BY_STUDENT = (
+    "SELECT id, user_id, course_id FROM enrollments "
+    "WHERE user_id = ? AND id > ? ORDER BY id LIMIT ?"
+)
+PAGE_ENROLLMENTS_BY_COURSE = (
+    "SELECT id, user_id, course_id FROM enrollments "
+    "WHERE course_id = ? AND id > ? ORDER BY id LIMIT ?"
+)
+ENROLLMENT_EXISTS = "SELECT 1 FROM enrollments WHERE user_id = ? AND course_id = ?"
+ENROLLMENT_COURSE = "SELECT course_id FROM enrollments WHERE id = ?"
+DELETE_ENROLLMENT = "DELETE FROM enrollments WHERE id = ?"
+
+SELECT_SEATS = (
+    "SELECT capacity, enrolled, (SELECT COUNT(*) FROM waitlist WHERE course_id = courses.id) "
+    "FROM courses WHERE id = ?"
+)
+SEAT_STATE = (
+    "SELECT capacity, enrolled, EXISTS (SELECT 1 FROM waitlist WHERE course_id = courses.id) "
+    "FROM courses WHERE id = ?"
+)
+JOIN_WAITLIST = "INSERT INTO waitlist (user_id, course_id) VALUES (?, ?)"
+WAITLIST_POSITION = (
+    "SELECT COUNT(*) FROM waitlist WHERE course_id = ? AND seq <= "
+    "(SELECT seq FROM waitlist WHERE course_id = ? AND user_id = ?)"
+)
+NEXT_PROMOTION = (
+    "SELECT w.seq, w.user_id FROM waitlist w JOIN courses c ON c.id = w.course_id "
+    "WHERE w.course_id = ? AND (c.capacity IS NULL OR c.enrolled < c.capacity) "
+    "ORDER BY w.seq LIMIT 1"
+)
+LEAVE_WAITLIST_SEQ = "DELETE FROM waitlist WHERE seq = ?"
+LEAVE_WAITLIST = "DELETE FROM waitlist WHERE user_id = ? AND course_id = ?"
+SELECT_WAITLIST = "SELECT user_id FROM waitlist WHERE course_id = ? ORDER BY seq"
+
+SELECT_VERSION = "SELECT version FROM versions WHERE scope = ? AND key = ?"
+
+# Stay well below SQLite's bound-parameter limit for IN (...) lookups
+IN_CHUNK_SIZE = 500
+
+# VM instructions reported as one examined row when tracing. SQLite has no
+# per-statement row counter; a table scan runs about 3 instructions per row
+# and an indexed read about 8 per row returned, so this keeps indexed reads
+# near 1:1 and lets scans show up as examining many times what they return.
+STEPS_PER_EXAMINED_ROW = 8
+
+
+def _count_steps() -> int:
+    examined(1)
+    return 0  # non-zero would abort the statement
+
+
+def _limit(limit: Optional[int]) -> int:
+    # LIMIT -1 means "no limit" in SQLite
+    return -1 if limit is None else limit
+
+
+def _after(after_id: Optional[int]) -> int:
+    return 0 if after_id is None else after_id
+
+
+def _user(row) -> UserRecord:
+    return UserRecord(id=row[0], name=row[1], email=row[2], role=row[3])
+
+
+def _course(row) -> CourseRecord:
+    return CourseRecord(id=row[0], title=row[1], code=row[2], capacity=row[3])
+
+
+def _enrollment(row) -> EnrollmentRecord:
+    return EnrollmentRecord(id=row[0], user_id=row[1], course_id=row[2])
+
+
+class ConnectionPool:
+    """
+    One SQLite connection per thread, created on first use and reused for
+    the life of the thread. FastAPI's worker threads are long-lived, so in
+    practice every worker keeps a warm connection with its own prepared
+    statement cache.
+
+    With ``trace_steps`` each connection reports the VM instructions its
+    statements run to ``app.tracing.examined`` as an estimate of rows
+    examined.
+    """
+
+    def __init__(self, path: str, statement_cache_size: int = 256, trace_steps: bool = False):
+        self.path = path
+        self.statement_cache_size = statement_cache_size
+        self.trace_steps = trace_steps
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._connections: List[sqlite3.Connection] = []
+
+    def _connect(self) -> sqlite3.Connection:
+        connection = sqlite3.connect(
+            self.path,
+            isolation_level=None,  # explicit transactions only
+            check_same_thread=False,  # so close_all() can run anywhere
+            cached_statements=self.statement_cache_size,
+            timeout=30.0
+        )
+        connection.execute("PRAGMA journal_mode = WAL")
+        connection.execute("PRAGMA synchronous = NORMAL")
+        connection.execute("PRAGMA foreign_keys = ON")
+        if self.trace_steps:
+            connection.set_progress_handler(_count_steps, STEPS_PER_EXAMINED_ROW)
+        return connection
+
+    def get(self) -> sqlite3.Connection:
+        connection = getattr(self._local, "connection", None)
+        if connection is None:
+            connection = self._connect()
+            self._local.connection = connection
+            with self._lock:
+                self._connections.append(connection)
+        return connection
+
+    def close_all(self):
+        with self._lock:
+            for connection in self._connections:
+                connection.close()
+            self._connections = []
+        self._local = threading.local()
+
+
+class SQLiteDatabase:
+    """
+    SQLite-backed store with the same interface as ``Database``.
+
+    Uniqueness of emails, course codes and (user_id, course_id) pairs, and
+    the course -> enrollments cascade, are enforced by the schema. The
+    try_* methods rely on those constraints instead of a separate check, so
+    they are atomic across threads and processes sharing the file. Seat
+    checks, waitlist changes and promotions run inside one BEGIN IMMEDIATE
+    transaction with the enrollment they guard, which serialises them
+    across processes too.
+
+    With ``trace_steps`` rows examined are estimated from the SQLite VM
+    instructions each call runs (see ``STEPS_PER_EXAMINED_ROW``).
+    """
+
+    # Calls wait on disk I/O, so async callers run them on worker threads
+    blocking = True
+
+    def __init__(self, path: str, normalize_keys: bool = False, trace_steps: bool = False):
+        self.path = path
+        self.normalize_keys = normalize_keys
+        self.pool = ConnectionPool(path, trace_steps=trace_steps)
+        self._migrate(self.pool.get())
+        self.pool.get().executescript(SCHEMA)
+        # Called with a row id (or None for every row) after this process
+        # commits a change to the users or courses table; other processes
+        # sharing the file are not seen
+        self.user_listeners: List[Callable[[Optional[int]], None]] = []
+        self.course_listeners: List[Callable[[Optional[int]], None]] = []
+        # Part of every ETag; chosen when the file was created, so versions
+        # from a different database file never match
+        self.version_epoch = self._version("epoch", 0)
+
+    def close(self):
+        self.pool.close_all()
+
+    @staticmethod
+    def _migrate(connection: sqlite3.Connection):
+        """Add the capacity columns to files created before they existed"""
+        columns = {row[1] for row in connection.execute("PRAGMA table_info(courses)")}
+        if not columns or "capacity" in columns:
+            return
+        connection.executescript("""
+            BEGIN IMMEDIATE;
+            ALTER TABLE courses ADD COLUMN capacity INTEGER;
+            ALTER TABLE courses ADD COLUMN enrolled INTEGER NOT NULL DEFAULT 0;
+            UPDATE courses SET enrolled =
+                (SELECT COUNT(*) FROM enrollments WHERE course_id = courses.id);
+            -- Recreated by SCHEMA so seat counts do not bump the version
+            DROP TRIGGER IF EXISTS courses_update_version;
+            COMMIT;
+        """)
+
+    def reset(self):
+        """Reset all data - useful for testing"""
+        with self._write() as connection:
+            connection.execute("DELETE FROM waitlist")
+            connection.execute("DELETE FROM enrollments")
+            connection.execute("DELETE FROM courses")
+            connection.execute("DELETE FROM users")
+            # Restart AUTOINCREMENT ids at 1, like the in-memory counters
+            connection.execute("DELETE FROM sqlite_sequence")
+        self._user_changed(None)
+        self._course_changed(None)
+
+    def _user_changed(self, user_id: Optional[int]):
+        for listener in self.user_listeners:
+            listener(user_id)
+
+    def _course_changed(self, course_id: Optional[int]):
+        for listener in self.course_listeners:
+            listener(course_id)
+
+    def _index_key(self, value: str) -> str:
+        return value.casefold() if self.normalize_keys else value
+
+    @contextmanager
+    def _write(self) -> Iterator[sqlite3.Connection]:
+        # BEGIN IMMEDIATE takes the write lock up front, so a transaction
+        # never has to upgrade from a read lock and deadlock with another
+        connection = self.pool.get()
+        connection.execute("BEGIN IMMEDIATE")
+        try:
+            yield connection
+        except BaseException:
+            connection.execute("ROLLBACK")
+            raise
+        connection.execute("COMMIT")
+
+    def _query(self, sql: str, params: tuple) -> list:
+        return self.pool.get().execute(sql, params).fetchall()
+
+    def _query_one(self, sql: str, params: tuple):
+        return self.pool.get().execute(sql, params).fetchone()
+
+    def _query_in(self, sql: str, ids: Iterable[int]) -> list:
+        ids = list(dict.fromkeys(ids))
+        rows = []
+        for start in range(0, len(ids), IN_CHUNK_SIZE):
+            chunk = ids[start:start + IN_CHUNK_SIZE]
+            placeholders = ", ".join("?" * len(chunk))
+            rows.extend(self._query(sql.format(placeholders), tuple(chunk)))
+        return rows
+
+    # User operations
+    def create_user(self, name: str, email: str, role: str) -> UserRecord:
+        with self._write() as connection:
+            cursor = connection.execute(INSERT_USER, (name, email, self._index_key(email), role))
+        self._user_changed(cursor.lastrowid)
+        return UserRecord(id=cursor.lastrowid, name=name, email=email, role=role)
+
+    def try_create_user(self, name: str, email: str, role: str) -> Optional[UserRecord]:
+        """Atomically create a user unless the email is taken (returns None)"""
+        with self._write() as connection:
+            cursor = connection.execute(
+                INSERT_USER_IF_ABSENT, (name, email, self._index_key(email), role)
+            )
+        if not cursor.rowcount:
+            return None
+        self._user_changed(cursor.lastrowid)
+        return UserRecord(id=cursor.lastrowid, name=name, email=email, role=role)
+
+    def create_users(self, rows: List[Tuple[str, str, str]]) -> List[Optional[UserRecord]]:
+        """
+        Insert many (name, email, role) rows in one transaction.
+
+        Rows whose email is already stored, or repeats an earlier row in the
+        batch, are skipped and reported as None at their position.
+        """
+        created: List[Optional[UserRecord]] = []
+        with self._write() as connection:
+            for name, email, role in rows:
+                cursor = connection.execute(
+                    INSERT_USER_IF_ABSENT, (name, email, self._index_key(email), role)
+                )
+                created.append(
+                    UserRecord(id=cursor.lastrowid, name=name, email=email, role=role)
+                    if cursor.rowcount else None
+                )
+        for user in created:
+            if user is not None:
+                self._user_changed(user.id)
+        return created
+
+    def get_user(self, user_id: int) -> Optional[UserRecord]:
+        row = self._query_one(SELECT_USER, (user_id,))
+        return _user(row) if row else None
+
+    def get_users(self, user_ids: Iterable[int]) -> Dict[int, UserRecord]:
+        """Look up many users at once; missing ids are left out"""
+        rows = self._query_in(
+            "SELECT id, name, email, role FROM users WHERE id IN ({})", user_ids
+        )
+        return {row[0]: _user(row) for row in rows}
+
+    def get_all_users(
+        self, after_id: Optional[int] = None, limit: Optional[int] = None
+    ) -> List[UserRecord]:
+        return [_user(row) for row in self._query(PAGE_USERS, (_after(after_id), _limit(limit)))]
+
+    def email_exists(self, email: str) -> bool:
+        return self._query_one(EMAIL_EXISTS, (self._index_key(email),)) is not None
+
+    # Course operations
+    def create_course(self, title: str, code: str, capacity: Optional[int] = None) -> CourseRecord:
+        with self._write() as connection:
+            cursor = connection.execute(
+                INSERT_COURSE, (title, code, self._index_key(code), capacity)
+            )
+        self._course_changed(cursor.lastrowid)
+        return CourseRecord(id=cursor.lastrowid, title=title, code=code, capacity=capacity)
+
+    def try_create_course(
+        self, title: str, code: str, capacity: Optional[int] = None
+    ) -> Optional[CourseRecord]:
+        """Atomically create a course unless the code is taken (returns None)"""
+        with self._write() as connection:
+            cursor = connection.execute(
+                INSERT_COURSE_IF_ABSENT, (title, code, self._index_key(code), capacity)
+            )
+        if not cursor.rowcount:
+            return None
+        self._course_changed(cursor.lastrowid)
+        return CourseRecord(id=cursor.lastrowid, title=title, code=code, capacity=capacity)
+
+    def create_courses(
+        self, rows: List[Tuple[str, str, Optional[int]]]
+    ) -> List[Optional[CourseRecord]]:
+        """
+        Insert many (title, code, capacity) rows in one transaction.
+
+        Rows whose code is already stored, or repeats an earlier row in the
+        batch, are skipped and reported as None at their position.
+        """
+        created: List[Optional[CourseRecord]] = []
+        with self._write() as connection:
+            for title, code, capacity in rows:
+                cursor = connection.execute(
+                    INSERT_COURSE_IF_ABSENT, (title, code, self._index_key(code), capacity)
+                )
+                created.append(
+                    CourseRecord(id=cursor.lastrowid, title=title, code=code, capacity=capacity)
+                    if cursor.rowcount else None
+                )
+        for course in created:
+            if course is not None:
+                self._course_changed(course.id)
+        return created
+
+    def get_course(self, course_id: int) -> Optional[CourseRecord]:
+        row = self._query_one(SELECT_COURSE, (course_id,))
+        return _course(row) if row else None
+
+    def get_courses(self, course_ids: Iterable[int]) -> Dict[int, CourseRecord]:
+        """Look up many courses at once; missing ids are left out"""
+        rows = self._query_in(
+            "SELECT id, title, code, capacity FROM courses WHERE id IN ({})", course_ids
+        )
+        return {row[0]: _course(row) for row in rows}
+
+    def get_all_courses(
+        self, after_id: Optional[int] = None, limit: Optional[int] = None
+    ) -> List[CourseRecord]:
+        return [
+            _course(row)
+            for row in self._query(PAGE_COURSES, (_after(after_id), _limit(limit)))
+        ]
+
+    def course_code_exists(self, code: str, exclude_id: Optional[int] = None) -> bool:
+        row = self._query_one(CODE_OWNER, (self._index_key(code),))
+        return row is not None and row[0] != exclude_id
+
+    def update_course(
+        self, course_id: int, title: str, code: str, capacity: Optional[int] = UNCHANGED
+    ) -> Optional[CourseRecord]:
+        with self._write() as connection:
+            if capacity is UNCHANGED:
+                cursor = connection.execute(
+                    UPDATE_COURSE_KEEP_CAPACITY, (title, code, self._index_key(code), course_id)
+                )
+                if cursor.rowcount:
+                    capacity = connection.execute(SELECT_COURSE, (course_id,)).fetchone()[3]
+            else:
+                cursor = connection.execute(
+                    UPDATE_COURSE, (title, code, self._index_key(code), capacity, course_id)
+                )
+            if cursor.rowcount:
+                self._promote(connection, course_id)
+        if not cursor.rowcount:
+            return None
+        self._course_changed(course_id)
+        return CourseRecord(id=course_id, title=title, code=code, capacity=capacity)
+
+    def try_update_course(
+        self, course_id: int, title: str, code: str, capacity: Optional[int] = UNCHANGED
+    ) -> Optional[CourseRecord]:
+        """
+        Atomically update a course unless its new code belongs to another
+        course. Returns None if the course is missing or the code is taken.
+        The seat limit is kept unless ``capacity`` is given (None removes
+        it). Raising the capacity promotes waitlisted students into the new
+        seats; lowering it below the current enrollment only stops new
+        enrollments.
+        """
+        try:
+            return self.update_course(course_id, title, code, capacity)
+        except sqlite3.IntegrityError:
+            return None
+
+    def delete_course(self, course_id: int) -> Optional[int]:
+        """
+        Delete a course and cascade to its enrollments.
+
+        Returns the number of enrollments removed, or None if the course
+        does not exist.
+        """
+        with self._write() as connection:
+            removed = connection.execute(COUNT_COURSE_ENROLLMENTS, (course_id,)).fetchone()[0]
+            # ON DELETE CASCADE removes the enrollments via their course index
+            cursor = connection.execute(DELETE_COURSE, (course_id,))
+        if not cursor.rowcount:
+            return None
+        self._course_changed(course_id)
+        return removed
+
+    # Enrollment operations
+    def create_enrollment(self, user_id: int, course_id: int) -> EnrollmentRecord:
+        with self._write() as connection:
+            cursor = connection.execute(INSERT_ENROLLMENT, (user_id, course_id))
+        return EnrollmentRecord(id=cursor.lastrowid, user_id=user_id, course_id=course_id)
+
+    def try_create_enrollment(self, user_id: int, course_id: int) -> Optional[EnrollmentRecord]:
+        """
+        Atomically enroll a student unless already enrolled. Returns None if
+        the pair exists, the course is full or the course has been deleted
+        in the meantime.
+        """
+        with self._write() as connection:
+            cursor = connection.execute(INSERT_ENROLLMENT_IF_ABSENT, (user_id, course_id))
+        if not cursor.rowcount:
+            return None
+        return EnrollmentRecord(id=cursor.lastrowid, user_id=user_id, course_id=course_id)
+
+    def try_enroll(self, user_id: int, course_id: int) -> EnrollOutcome:
+        """
+        Atomically take a seat in a course, or join its waitlist when it is
+        full. A student is never enrolled ahead of earlier waitlisted ones.
+        """
+        with self._write() as connection:
+            seats = connection.execute(SEAT_STATE, (course_id,)).fetchone()
+            if seats is None:
+                return EnrollOutcome(COURSE_NOT_FOUND)
+            if connection.execute(ENROLLMENT_EXISTS, (user_id, course_id)).fetchone():
+                return EnrollOutcome(ALREADY_ENROLLED)
+            capacity, enrolled, waiting = seats
+            if waiting:
+                position = self._position(connection, user_id, course_id)
+                if position:
+                    return EnrollOutcome(ALREADY_WAITLISTED, position=position)
+            elif capacity is None or enrolled < capacity:
+                cursor = connection.execute(INSERT_ENROLLMENT, (user_id, course_id))
+                return EnrollOutcome(ENROLLED, enrollment=EnrollmentRecord(
+                    id=cursor.lastrowid, user_id=user_id, course_id=course_id
+                ))
+            connection.execute(JOIN_WAITLIST, (user_id, course_id))
+            return EnrollOutcome(
+                WAITLISTED, position=self._position(connection, user_id, course_id)
+            )
+
+    @staticmethod
+    def _position(connection: sqlite3.Connection, user_id: int, course_id: int) -> int:
+        return connection.execute(
+            WAITLIST_POSITION, (course_id, course_id, user_id)
+        ).fetchone()[0]
+
+    @staticmethod
+    def _promote(connection: sqlite3.Connection, course_id: int):
+        """Give free seats to waitlisted students, first come first served"""
+        while True:
+            row = connection.execute(NEXT_PROMOTION, (course_id,)).fetchone()
+            if row is None:
+                return
+            connection.execute(LEAVE_WAITLIST_SEQ, (row[0],))
+            # Ignored if an admin already enrolled the student directly
+            connection.execute(INSERT_PROMOTED, (row[1], course_id))
+
+    def leave_waitlist(self, user_id: int, course_id: int) -> bool:
+        """Take a student off a course's waitlist; False if they were not on it"""
+        with self._write() as connection:
+            cursor = connection.execute(LEAVE_WAITLIST, (user_id, course_id))
+        return cursor.rowcount > 0
+
+    def get_waitlist(self, course_id: int) -> List[int]:
+        """User ids waiting for a seat, next to be promoted first"""
+        return [row[0] for row in self._query(SELECT_WAITLIST, (course_id,))]
+
+    def get_waitlist_position(self, user_id: int, course_id: int) -> Optional[int]:
+        return self._position(self.pool.get(), user_id, course_id) or None
+
+    def get_seats(self, course_id: int) -> Optional[SeatCount]:
+        """Capacity, seats taken and waitlist length; None if the course is missing"""
+        row = self._query_one(SELECT_SEATS, (course_id,))
+        return SeatCount(*row) if row else None
+
+    def create_enrollments(self, pairs: List[Tuple[int, int]]) -> List[EnrollOutcome]:
+        """
+        Insert many (user_id, course_id) pairs in one transaction.
+
+        Each pair gets an outcome at its position: ENROLLED, or the reason it
+        was skipped (ALREADY_ENROLLED, also for a pair repeated within the
+        batch, COURSE_FULL or COURSE_NOT_FOUND), looked up in the same
+        transaction as the insert.
+        """
+        outcomes: List[EnrollOutcome] = []
+        with self._write() as connection:
+            for user_id, course_id in pairs:
+                cursor = connection.execute(INSERT_ENROLLMENT_IF_ABSENT, (user_id, course_id))
+                if cursor.rowcount:
+                    outcomes.append(EnrollOutcome(ENROLLED, enrollment=EnrollmentRecord(
+                        id=cursor.lastrowid, user_id=user_id, course_id=course_id
+                    )))
+                elif connection.execute(SEAT_STATE, (course_id,)).fetchone() is None:
+                    outcomes.append(EnrollOutcome(COURSE_NOT_FOUND))
+                elif connection.execute(ENROLLMENT_EXISTS, (user_id, course_id)).fetchone():
+                    outcomes.append(EnrollOutcome(ALREADY_ENROLLED))
+                else:
+                    outcomes.append(EnrollOutcome(COURSE_FULL))
+        return outcomes
+
+    def get_enrollment(self, enrollment_id: int) -> Optional[EnrollmentRecord]:
+        row = self._query_one(SELECT_ENROLLMENT, (enrollment_id,))
+        return _enrollment(row) if row else None
+
+    def get_all_enrollments(
+        self, after_id: Optional[int] = None, limit: Optional[int] = None
+    ) -> List[EnrollmentRecord]:
+        return [
+            _enrollment(row)
+            for row in self._query(PAGE_ENROLLMENTS, (_after(after_id), _limit(limit)))
+        ]
+
+    def get_enrollments_by_student(
+        self, user_id: int, after_id: Optional[int] = None, limit: Optional[int] = None
+    ) -> List[EnrollmentRecord]:
+        return [
+            _enrollment(row)
+            for row in self._query(
+                PAGE_ENROLLMENTS_BY_STUDENT, (user_id, _after(after_id), _limit(limit))
+            )
+        ]
+
+    def get_enrollments_by_course(
+        self, course_id: int, after_id: Optional[int] = None, limit: Optional[int] = None
+    ) -> List[EnrollmentRecord]:
+        return [
+            _enrollment(row)
+            for row in self._query(
+                PAGE_ENROLLMENTS_BY_COURSE, (course_id, _after(after_id), _limit(limit))
+            )
+        ]
+
+    def enrollment_exists(self, user_id: int, course_id: int) -> bool:
+        return self._query_one(ENROLLMENT_EXISTS, (user_id, course_id)) is not None
+
+    def delete_enrollment(self, enrollment_id: int) -> bool:
+        """Delete an enrollment and hand its seat to the course's waitlist"""
+        with self._write() as connection:
+            row = connection.execute(ENROLLMENT_COURSE, (enrollment_id,)).fetchone()
+            if row is None:
+                return False
+            connection.execute(DELETE_ENROLLMENT, (enrollment_id,))
+            self._promote(connection, row[0])
+        return True
+
+    # Change counters (maintained by triggers, see SCHEMA)
+    def _version(self, scope: str, key: int) -> int:
+        row = self._query_one(SELECT_VERSION, (scope, key))
+        return row[0] if row else 0
+
+    def get_table_version(self, table: str) -> int:
+        if table not in ("users", "courses", "enrollments"):
+            raise ValueError(f"Unknown table: {table}")
+        return self._version(table, 0)
+
+    def get_student_enrollments_version(self, user_id: int) -> int:
+        return self._version("student", user_id)
+
+    def get_course_enrollments_version(self, course_id: int) -> int:
+        return self._version("course", course_id)
+
+    def table_sizes(self) -> Dict[str, int]:
+        """Row count per table (for monitoring)"""
+        return {
+            table: self._query_one(f"SELECT COUNT(*) FROM {table}", ())[0]
+            for table in ("users", "courses", "enrollments")
+        }
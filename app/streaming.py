@@ -0,0 +1,60 @@
+from typing import AsyncIterator, Awaitable, Callable, List, Optional, Type
+from fastapi import Request
+from fastapi.responses import StreamingResponse
+from pydantic import BaseModel
+from app.pagination import PageParams
+
+NDJSON_MEDIA_TYPE = "application/x-ndjson"
+STREAM_CHUNK_SIZE = 500
+
+# Fetches up to `limit` rows with id greater than `after_id`
+PageFetcher = Callable[[Optional[int], int], Awaitable[List]]
+
+
+def wants_ndjson(request: Request) -> bool:
+    """Check whether the client asked for newline-delimited JSON"""
+    accept = request.headers.get("accept", "")
+    return any(
+        part.split(";")[0].strip() == NDJSON_MEDIA_TYPE
+        for part in accept.split(",")
+    )
+
+
+async def iter_ndjson(
+    fetch_page: PageFetcher,
+    model: Type[BaseModel],
+    after_id: Optional[int] = None,
+    limit: Optional[int] = None
+) -> AsyncIterator[bytes]:
+    """
+    Yield rows as NDJSON, one keyset chunk at a time.
+
+    Only one chunk is held in memory at once, and each chunk is fetched
+    with a fresh keyset query, so the walk is unaffected by concurrent
+    inserts and deletes.
+    """
+    remaining = limit
+    while remaining is None or remaining > 0:
+        size = STREAM_CHUNK_SIZE if remaining is None else min(remaining, STREAM_CHUNK_SIZE)
+        rows = await fetch_page(after_id, size)
+        if not rows:
+            return
+        yield b"".join(
+            model.model_validate(row).model_dump_json().encode() + b"\n"
+            for row in rows
+        )
+        after_id = rows[-1].id
+        if remaining is not None:
+            remaining -= len(rows)
+        if len(rows) < size:
+            return
+
+
+def ndjson_response(
+    fetch_page: PageFetcher, model: Type[BaseModel], page: PageParams
+) -> StreamingResponse:
+    """Stream a collection as NDJSON, honouring the page's cursor and limit"""
+    return StreamingResponse(
+        iter_ndjson(fetch_page, model, page.after_id, page.limit),
+        media_type=NDJSON_MEDIA_TYPE
+    )
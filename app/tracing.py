@@ -0,0 +1,212 @@
+"""
+Storage-operation tracing.
+
+Every storage call made through ``AsyncDatabase`` is counted in a
+``StorageStats`` table: calls, wall time, and rows examined versus rows
+returned per backend method. A method that examines far more rows than it
+returns (a scan creeping into a hot path) stands out in
+``GET /admin/storage``.
+
+Rows returned are counted from the result (a list's length less skipped
+batch items, 1 for a record, True or an outcome carrying an enrollment).
+Rows examined are reported by the backend through ``examined()``: the
+in-memory store counts the slots it walks, and SQLite estimates them from
+the VM instructions its statements run. A call is never recorded as
+examining fewer rows than it returned.
+
+``TracingMiddleware`` additionally sums storage time per request and sends
+it in a ``Server-Timing`` header. Storage calls made after the response has
+started (NDJSON streams) are counted in the totals but not in the header.
+"""
+import time
+from contextvars import ContextVar
+from typing import Any, Dict, List, Optional
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+from app.records import EnrollOutcome, Record
+
+SERVER_TIMING_HEADER = "Server-Timing"
+
+
+class OperationStats:
+    __slots__ = ("calls", "total_ns", "max_ns", "rows_examined", "rows_returned")
+
+    def __init__(self):
+        self.calls = 0
+        self.total_ns = 0
+        self.max_ns = 0
+        self.rows_examined = 0
+        self.rows_returned = 0
+
+    def add(self, elapsed_ns: int, examined: int, returned: int):
+        self.calls += 1
+        self.total_ns += elapsed_ns
+        if elapsed_ns > self.max_ns:
+            self.max_ns = elapsed_ns
+        self.rows_examined += examined
+        self.rows_returned += returned
+
+
+class StorageStats:
+    """
+    Totals per storage method. Updated from the event loop thread only
+    (after the call returns), so no lock is needed.
+
+    ``operations`` counts since the last ``reset()``; ``lifetime`` counts
+    since start and is never reset, so the Prometheus counters exported
+    from it never go backwards.
+    """
+
+    def __init__(self):
+        self.operations: Dict[str, OperationStats] = {}
+        self.lifetime: Dict[str, OperationStats] = {}
+
+    def record(self, method: str, elapsed_ns: int, examined: int, returned: int):
+        for table in (self.operations, self.lifetime):
+            stats = table.get(method)
+            if stats is None:
+                stats = table[method] = OperationStats()
+            stats.add(elapsed_ns, examined, returned)
+
+    def summary(self, lifetime: bool = False) -> List[Dict[str, Any]]:
+        """Per-method totals since the last reset (or since start), most total time first"""
+        table = self.lifetime if lifetime else self.operations
+        return [
+            {
+                "method": method,
+                "calls": stats.calls,
+                "total_ms": stats.total_ns / 1e6,
+                "mean_us": stats.total_ns / stats.calls / 1e3,
+                "max_us": stats.max_ns / 1e3,
+                "rows_examined": stats.rows_examined,
+                "rows_returned": stats.rows_returned,
+                # None when nothing was returned (e.g. exists checks that miss)
+                "examined_per_returned": (
+                    stats.rows_examined / stats.rows_returned if stats.rows_returned else None
+                )
+            }
+            for method, stats in sorted(
+                table.items(), key=lambda item: item[1].total_ns, reverse=True
+            )
+        ]
+
+    def reset(self):
+        """Clear the totals behind ``GET /admin/storage``; lifetime totals are kept"""
+        self.operations.clear()
+
+
+def _calls(count: int) -> str:
+    return f"{count} call" if count == 1 else f"{count} calls"
+
+
+class RequestTrace:
+    """Storage time spent by one request, per method"""
+
+    __slots__ = ("storage_ns", "calls", "methods")
+
+    def __init__(self):
+        self.storage_ns = 0
+        self.calls = 0
+        # method -> [calls, nanoseconds]
+        self.methods: Dict[str, List[int]] = {}
+
+    def add(self, method: str, elapsed_ns: int):
+        self.storage_ns += elapsed_ns
+        self.calls += 1
+        entry = self.methods.get(method)
+        if entry is None:
+            self.methods[method] = [1, elapsed_ns]
+        else:
+            entry[0] += 1
+            entry[1] += elapsed_ns
+
+    def server_timing(self, total_ns: int) -> str:
+        """``Server-Timing`` value: storage total, then each method, then the total"""
+        parts = [f'storage;dur={self.storage_ns / 1e6:.3f};desc="{_calls(self.calls)}"']
+        for method, (calls, elapsed_ns) in self.methods.items():
+            parts.append(f'storage.{method};dur={elapsed_ns / 1e6:.3f};desc="{_calls(calls)}"')
+        parts.append(f"total;dur={total_ns / 1e6:.3f}")
+        return ", ".join(parts)
+
+
+# The trace of the request being handled, if it is traced
+current_request: ContextVar[Optional[RequestTrace]] = ContextVar("current_request", default=None)
+# Rows examined by the storage call in progress ([count], or None outside one)
+_examined: ContextVar[Optional[List[int]]] = ContextVar("storage_examined", default=None)
+
+
+def examined(rows: int):
+    """Report rows examined by the storage call in progress (backends call this)"""
+    counter = _examined.get()
+    if counter is not None:
+        counter[0] += rows
+
+
+def returned_rows(result: Any) -> int:
+    if isinstance(result, EnrollOutcome):
+        # Only an outcome carrying an enrollment returns a row
+        return 0 if result.enrollment is None else 1
+    if isinstance(result, tuple) and hasattr(result, "_fields"):
+        # Other named results (seat counts) describe one row
+        return 1
+    if isinstance(result, list):
+        if result and isinstance(result[0], EnrollOutcome):
+            return sum(outcome.enrollment is not None for outcome in result)
+        # Batch inserts report skipped items as None
+        return len(result) - result.count(None)
+    if isinstance(result, (tuple, dict)):
+        return len(result)
+    if isinstance(result, Record) or result is True:
+        return 1
+    # None, False, counts and versions
+    return 0
+
+
+async def traced_call(stats: StorageStats, method: str, call, *args, **kwargs):
+    """Await ``call(*args, **kwargs)`` and record it in ``stats`` and the request trace"""
+    counter = [0]
+    token = _examined.set(counter)
+    result = None
+    start = time.perf_counter_ns()
+    try:
+        result = await call(*args, **kwargs)
+        return result
+    finally:
+        elapsed_ns = time.perf_counter_ns() - start
+        _examined.reset(token)
+        returned = returned_rows(result)
+        stats.record(method, elapsed_ns, max(counter[0], returned), returned)
+        trace = current_request.get()
+        if trace is not None:
+            trace.add(method, elapsed_ns)
+
+
+class TracingMiddleware:
+    """ASGI middleware adding a ``Server-Timing`` header with storage time"""
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        trace = RequestTrace()
+        token = current_request.set(trace)
+        start = time.perf_counter_ns()
+
+        async def send_wrapper(message: Message):
+            if message["type"] == "http.response.start":
+                value = trace.server_timing(time.perf_counter_ns() - start)
+                message["headers"] = list(message.get("headers", [])) + [
+                    (SERVER_TIMING_HEADER.lower().encode(), value.encode())
+                ]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            current_request.reset(token)
+
+
+storage_stats = StorageStats()
@@ -0,0 +1,315 @@
+"""
+Microbenchmarks for the storage backends.
+
+Seeds a store with N enrollments (N / 10 students, N / 100 courses) and
+times every ``Database`` operation the routers use, then reports ops/sec
+and memory per size. Results can be saved as JSON and compared against a
+previously saved run to flag regressions.
+
+    python -m benchmarks.bench_database                        # 10k and 100k
+    python -m benchmarks.bench_database --sizes 1000000        # 1M rows
+    python -m benchmarks.bench_database --output baseline.json
+    python -m benchmarks.bench_database --baseline baseline.json --threshold 0.2
+
+The exit status is 1 when any operation is slower than the baseline by more
+than ``--threshold`` (a fraction), so the comparison can gate CI.
+"""
+import argparse
+import gc
+import json
+import os
+import platform
+import random
+import resource
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime, timezone
+from typing import Callable, Dict, List, Optional
+
+from app.database import Database
+
+DEFAULT_SIZES = [10_000, 100_000]
+# Operations are repeated until this much time has passed (or ``max_calls``)
+TIME_BUDGET = 0.5
+PAGE_SIZE = 100
+
+
+def open_backend(backend: str, directory: str, filename: str):
+    if backend == "memory":
+        return Database()
+    if backend == "sqlite":
+        from app.sqlite_database import SQLiteDatabase
+        return SQLiteDatabase(os.path.join(directory, filename))
+    raise ValueError(f"Unknown database backend: {backend}")
+
+
+def measure(func: Callable[[int], object], max_calls: int) -> float:
+    """Call ``func(i)`` for i = 0, 1, ... and return calls per second"""
+    calls = 0
+    elapsed = 0.0
+    start = time.perf_counter()
+    while calls < max_calls and elapsed < TIME_BUDGET:
+        # Check the clock every few calls so it does not dominate fast ops
+        for _ in range(min(64, max_calls - calls)):
+            func(calls)
+            calls += 1
+        elapsed = time.perf_counter() - start
+    return calls / elapsed if elapsed else float("inf")
+
+
+class Workload:
+    """Deterministic rows for one benchmark size"""
+
+    def __init__(self, size: int, rng: random.Random):
+        self.students = max(10, size // 10)
+        self.courses = max(10, size // 100)
+        self.users_rows = [
+            (f"Student {i}", f"student{i}@example.com", "student") for i in range(self.students)
+        ]
+        self.course_rows = [(f"Course {i}", f"C{i:07d}", None) for i in range(self.courses)]
+        # Each student takes ``size / students`` distinct courses
+        per_student = min(self.courses, size // self.students)
+        self.pairs = [
+            (user_id, course_id)
+            for user_id in range(1, self.students + 1)
+            for course_id in rng.sample(range(1, self.courses + 1), per_student)
+        ]
+        self.enrollments = len(self.pairs)
+
+
+def seed(database, workload: Workload) -> Dict[str, float]:
+    """Fill ``database`` one row at a time, timing each create method"""
+    results = {}
+    start = time.perf_counter()
+    for row in workload.users_rows:
+        database.create_user(*row)
+    results["create_user"] = workload.students / (time.perf_counter() - start)
+
+    start = time.perf_counter()
+    for row in workload.course_rows:
+        database.create_course(*row)
+    results["create_course"] = workload.courses / (time.perf_counter() - start)
+
+    start = time.perf_counter()
+    for pair in workload.pairs:
+        database.create_enrollment(*pair)
+    results["create_enrollment"] = workload.enrollments / (time.perf_counter() - start)
+    return results
+
+
+def measure_memory(backend: str, workload: Workload, directory: str) -> Dict[str, float]:
+    """
+    Bulk-load a separate store and report what it holds. The memory backend
+    is traced with tracemalloc (kept out of the timed runs, since tracing
+    slows every allocation); the sqlite backend reports its file size.
+    """
+    gc.collect()
+    if backend == "memory":
+        tracemalloc.start()
+    database = open_backend(backend, directory, "memory.db")
+    database.create_users(workload.users_rows)
+    database.create_courses(workload.course_rows)
+    database.create_enrollments(workload.pairs)
+    if backend == "memory":
+        stored_bytes, peak_bytes = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+    else:
+        path = os.path.join(directory, "memory.db")
+        stored_bytes = sum(
+            os.path.getsize(path + suffix) for suffix in ("", "-wal") if os.path.exists(path + suffix)
+        )
+        peak_bytes = stored_bytes
+    database.close()
+    del database
+    gc.collect()
+    return {
+        "stored_bytes": stored_bytes,
+        "peak_bytes": peak_bytes,
+        "bytes_per_enrollment": stored_bytes / max(1, workload.enrollments)
+    }
+
+
+def run_size(backend: str, size: int, seed_value: int, repeat: int) -> Dict[str, object]:
+    rng = random.Random(seed_value)
+    workload = Workload(size, rng)
+    with tempfile.TemporaryDirectory() as directory:
+        memory = measure_memory(backend, workload, directory)
+        database = open_backend(backend, directory, "bench.db")
+        ops = seed(database, workload)
+
+        students, courses, enrollments = workload.students, workload.courses, workload.enrollments
+        user_ids = [rng.randint(1, students) for _ in range(4096)]
+        course_ids = [rng.randint(1, courses) for _ in range(4096)]
+        enrollment_ids = [rng.randint(1, enrollments) for _ in range(4096)]
+
+        def user(i):
+            return user_ids[i & 4095]
+
+        def course(i):
+            return course_ids[i & 4095]
+
+        def enrollment(i):
+            return enrollment_ids[i & 4095]
+
+        point_ops = {
+            "get_user": lambda i: database.get_user(user(i)),
+            "get_course": lambda i: database.get_course(course(i)),
+            "get_enrollment": lambda i: database.get_enrollment(enrollment(i)),
+            "email_exists": lambda i: database.email_exists(f"student{user(i) - 1}@example.com"),
+            "course_code_exists": lambda i: database.course_code_exists(f"C{course(i) - 1:07d}"),
+            "enrollment_exists": lambda i: database.enrollment_exists(user(i), course(i)),
+            "get_enrollments_by_student": lambda i: database.get_enrollments_by_student(user(i)),
+            "get_enrollments_by_course": lambda i: database.get_enrollments_by_course(course(i)),
+            "get_all_users_page": lambda i: database.get_all_users(
+                after_id=user(i), limit=PAGE_SIZE
+            ),
+            "get_all_enrollments_page": lambda i: database.get_all_enrollments(
+                after_id=enrollment(i), limit=PAGE_SIZE
+            ),
+            "update_course": lambda i: database.update_course(
+                course(i), f"Course {course(i) - 1}", f"C{course(i) - 1:07d}"
+            ),
+        }
+        # Read-only operations keep the best of ``repeat`` runs to damp noise
+        for name, func in point_ops.items():
+            ops[name] = max(measure(func, max_calls=100_000) for _ in range(repeat))
+
+        # Full copies scale with the table, so they get far fewer calls
+        for name, func in {
+            "get_all_users": lambda i: database.get_all_users(),
+            "get_all_courses": lambda i: database.get_all_courses(),
+            "get_all_enrollments": lambda i: database.get_all_enrollments(),
+        }.items():
+            ops[name] = max(measure(func, max_calls=50) for _ in range(repeat))
+
+        # Destructive operations run last, each on rows not touched before
+        doomed_enrollments = rng.sample(range(1, enrollments + 1), min(enrollments, 2000))
+        ops["delete_enrollment"] = measure(
+            lambda i: database.delete_enrollment(doomed_enrollments[i]),
+            max_calls=len(doomed_enrollments)
+        )
+        doomed_courses = rng.sample(range(1, courses + 1), courses // 2)
+        ops["delete_course"] = measure(
+            lambda i: database.delete_course(doomed_courses[i]), max_calls=len(doomed_courses)
+        )
+        database.close()
+
+    return {
+        "rows": {"users": students, "courses": courses, "enrollments": enrollments},
+        "ops_per_sec": ops,
+        "memory": memory
+    }
+
+
+def comparable(size: str, result: Dict, baseline: Optional[Dict]) -> Optional[Dict]:
+    """The baseline result for ``size``, or None if it seeded different rows"""
+    previous = (baseline or {}).get("sizes", {}).get(size)
+    if previous is None or previous.get("rows") != result["rows"]:
+        return None
+    return previous
+
+
+def compare(results: Dict, baseline: Dict, threshold: float) -> List[str]:
+    """
+    Return a line per operation that got slower than ``threshold`` allows.
+
+    Raises ValueError when the baseline ran on another backend. Sizes whose
+    baseline seeded different row counts are skipped with a warning.
+    """
+    if baseline.get("backend") != results["backend"]:
+        raise ValueError(
+            f"baseline was run on the {baseline.get('backend')} backend, "
+            f"not {results['backend']}"
+        )
+    regressions = []
+    for size, current in results["sizes"].items():
+        previous = comparable(size, current, baseline)
+        if previous is None:
+            if size in baseline.get("sizes", {}):
+                print(f"warning: baseline rows differ @ {size}, not compared", file=sys.stderr)
+            continue
+        for name, rate in current["ops_per_sec"].items():
+            before = previous["ops_per_sec"].get(name)
+            if before and rate < before * (1 - threshold):
+                regressions.append(
+                    f"{name} @ {size}: {rate:,.0f} ops/s vs {before:,.0f} baseline "
+                    f"({rate / before - 1:+.0%})"
+                )
+    return regressions
+
+
+def print_report(size: str, result: Dict, baseline: Optional[Dict]):
+    memory = result["memory"]
+    print(f"\n== {size} enrollments {result['rows']}")
+    print(
+        f"   memory: {memory['stored_bytes'] / 2**20:,.1f} MiB stored, "
+        f"{memory['peak_bytes'] / 2**20:,.1f} MiB peak, "
+        f"{memory['bytes_per_enrollment']:,.0f} B/enrollment"
+    )
+    previous = (comparable(size, result, baseline) or {}).get("ops_per_sec", {})
+    for name, rate in result["ops_per_sec"].items():
+        line = f"   {name:<28} {rate:>14,.0f} ops/s"
+        if name in previous and previous[name]:
+            line += f"   ({rate / previous[name] - 1:+.1%})"
+        print(line)
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0].strip())
+    parser.add_argument("--backend", choices=["memory", "sqlite"], default="memory")
+    parser.add_argument("--sizes", type=int, nargs="+", default=DEFAULT_SIZES,
+                        help="enrollment counts to seed (default: 10000 100000)")
+    parser.add_argument("--seed", type=int, default=0, help="random seed")
+    parser.add_argument("--repeat", type=int, default=3,
+                        help="runs per read-only operation, best kept (default: 3)")
+    parser.add_argument("--output", help="write results to this JSON file")
+    parser.add_argument("--baseline", help="compare against a JSON file from --output")
+    parser.add_argument("--threshold", type=float, default=0.2,
+                        help="allowed slowdown as a fraction (default: 0.2)")
+    args = parser.parse_args(argv)
+
+    baseline = None
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        # Refuse before seeding: timings across backends are not comparable
+        if baseline.get("backend") != args.backend:
+            parser.error(
+                f"baseline was run on the {baseline.get('backend')} backend, not {args.backend}"
+            )
+
+    results = {
+        "backend": args.backend,
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "timestamp": datetime.now(timezone.utc).isoformat(),
+        "sizes": {}
+    }
+    for size in args.sizes:
+        result = run_size(args.backend, size, args.seed, args.repeat)
+        results["sizes"][str(size)] = result
+        print_report(str(size), result, baseline)
+    # ru_maxrss is KiB on Linux
+    results["max_rss_bytes"] = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+    print(f"\nmax RSS: {results['max_rss_bytes'] / 2**20:,.1f} MiB")
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+        print(f"results written to {args.output}")
+
+    if baseline is not None:
+        regressions = compare(results, baseline, args.threshold)
+        if regressions:
+            print(f"\n{len(regressions)} regression(s) beyond {args.threshold:.0%}:")
+            for line in regressions:
+                print(f"   {line}")
+            return 1
+        print(f"\nno regressions beyond {args.threshold:.0%}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
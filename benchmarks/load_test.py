@@ -0,0 +1,426 @@
+"""
+HTTP load generator for the API.
+
+Starts ``uvicorn app.main:app`` locally (or targets ``--url``), seeds it with
+students, courses and an admin through the public endpoints, then sends an
+open-loop stream of requests at ``--rps`` drawn from a weighted scenario mix:
+
+    python -m benchmarks.load_test --rps 500 --duration 30
+    python -m benchmarks.load_test --mix catalog=70,enroll=20,roster=10
+    python -m benchmarks.load_test --mix hot_enroll=100 --hot-capacity 200
+    python -m benchmarks.load_test --backend sqlite --workers 4 --output w4.json
+    python -m benchmarks.load_test --backend sqlite --workers 8 --baseline w4.json
+
+Requests are sent on a fixed schedule whether or not earlier ones have
+finished, and latency is measured from each request's scheduled time, so a
+server that falls behind shows it in the tail percentiles instead of
+silently slowing the generator down. Traffic is drawn from ``--seed``, so
+runs with the same arguments send the same requests.
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import random
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from collections import Counter
+from datetime import datetime, timezone
+from typing import Callable, Dict, List, Optional, Tuple
+
+import httpx
+
+DEFAULT_MIX = "catalog=70,enroll=20,roster=10"
+SEED_BATCH = 1000
+
+
+class Population:
+    """Ids created by seeding, and the enrollment pairs handed out so far"""
+
+    def __init__(
+        self, admin_id: int, student_ids: List[int], course_ids: List[int], hot_course_id: int
+    ):
+        self.admin_id = admin_id
+        self.student_ids = student_ids
+        self.course_ids = course_ids
+        self.enrolled = 0
+        # A capped course every hot_enroll request competes for
+        self.hot_course_id = hot_course_id
+        self.hot_enrolled = 0
+
+    def next_pair(self) -> Tuple[int, int]:
+        # Walk students fastest so every pair is new until all are used up
+        n = self.enrolled
+        self.enrolled += 1
+        students = len(self.student_ids)
+        return (
+            self.student_ids[n % students],
+            self.course_ids[(n // students) % len(self.course_ids)]
+        )
+
+
+# A scenario returns (route label, method, path, JSON body)
+Request = Tuple[str, str, str, Optional[dict]]
+
+
+def catalog(rng: random.Random, population: Population) -> Request:
+    course_id = rng.choice(population.course_ids)
+    return "GET /courses/{id}", "GET", f"/courses/{course_id}", None
+
+
+def catalog_list(rng: random.Random, population: Population) -> Request:
+    return "GET /courses/", "GET", "/courses/?limit=50", None
+
+
+def enroll(rng: random.Random, population: Population) -> Request:
+    user_id, course_id = population.next_pair()
+    return "POST /enrollments/", "POST", "/enrollments/", {
+        "user_id": user_id, "course_id": course_id
+    }
+
+
+def hot_enroll(rng: random.Random, population: Population) -> Request:
+    # Each student once, so requests past the capacity join the waitlist (202)
+    user_id = population.student_ids[population.hot_enrolled % len(population.student_ids)]
+    population.hot_enrolled += 1
+    return "POST /enrollments/ (hot)", "POST", "/enrollments/", {
+        "user_id": user_id, "course_id": population.hot_course_id
+    }
+
+
+def roster(rng: random.Random, population: Population) -> Request:
+    course_id = rng.choice(population.course_ids)
+    path = f"/enrollments/course/{course_id}?admin_id={population.admin_id}&limit=100"
+    return "GET /enrollments/course/{id}", "GET", path, None
+
+
+def schedule(rng: random.Random, population: Population) -> Request:
+    user_id = rng.choice(population.student_ids)
+    return "GET /enrollments/student/{id}", "GET", f"/enrollments/student/{user_id}", None
+
+
+def profile(rng: random.Random, population: Population) -> Request:
+    user_id = rng.choice(population.student_ids)
+    return "GET /users/{id}", "GET", f"/users/{user_id}", None
+
+
+SCENARIOS: Dict[str, Callable[[random.Random, Population], Request]] = {
+    "catalog": catalog,
+    "catalog_list": catalog_list,
+    "enroll": enroll,
+    "hot_enroll": hot_enroll,
+    "roster": roster,
+    "schedule": schedule,
+    "profile": profile
+}
+
+
+def parse_mix(text: str) -> Dict[str, float]:
+    """Parse ``name=weight,...`` into scenario weights"""
+    mix = {}
+    for part in text.split(","):
+        name, _, weight = part.partition("=")
+        name = name.strip()
+        if name not in SCENARIOS:
+            raise ValueError(f"Unknown scenario {name!r}; choose from {', '.join(SCENARIOS)}")
+        mix[name] = float(weight or 1)
+    if sum(mix.values()) <= 0:
+        raise ValueError("Scenario weights must add up to more than zero")
+    return mix
+
+
+class RouteStats:
+    def __init__(self):
+        self.latencies: List[float] = []
+        self.statuses: Counter = Counter()
+        self.errors = 0
+
+    def record(self, latency: float, status: Optional[int]):
+        self.latencies.append(latency)
+        if status is None:
+            self.statuses["transport_error"] += 1
+            self.errors += 1
+        else:
+            self.statuses[str(status)] += 1
+            if status >= 400:
+                self.errors += 1
+
+    def summary(self, elapsed: float) -> Dict[str, object]:
+        latencies = sorted(self.latencies)
+        count = len(latencies)
+
+        def percentile(p: float) -> float:
+            # Nearest-rank percentile, in milliseconds
+            if not latencies:
+                return 0.0
+            return latencies[min(count - 1, max(0, int(p / 100 * count + 0.5) - 1))] * 1000
+
+        return {
+            "requests": count,
+            "throughput": count / elapsed if elapsed else 0.0,
+            "error_rate": self.errors / count if count else 0.0,
+            "statuses": dict(self.statuses),
+            "p50_ms": percentile(50),
+            "p95_ms": percentile(95),
+            "p99_ms": percentile(99),
+            "max_ms": latencies[-1] * 1000 if latencies else 0.0
+        }
+
+
+async def seed(
+    client: httpx.AsyncClient, students: int, courses: int, hot_capacity: int
+) -> Population:
+    """Create an admin, ``students`` students, ``courses`` courses and the hot course"""
+    tag = f"{time.time_ns():x}"
+    response = await client.post("/users/", json={
+        "name": "Load Admin", "email": f"admin-{tag}@example.com", "role": "admin"
+    })
+    response.raise_for_status()
+    admin_id = response.json()["id"]
+
+    student_ids: List[int] = []
+    for start in range(0, students, SEED_BATCH):
+        users = [
+            {"name": f"Student {i}", "email": f"student{i}-{tag}@example.com", "role": "student"}
+            for i in range(start, min(students, start + SEED_BATCH))
+        ]
+        response = await client.post("/users/batch", json={"admin_id": admin_id, "users": users})
+        response.raise_for_status()
+        student_ids += [item["user"]["id"] for item in response.json()["results"]]
+
+    course_ids: List[int] = []
+    for start in range(0, courses, SEED_BATCH):
+        batch = [
+            {"title": f"Course {i}", "code": f"L{tag}-{i}"}
+            for i in range(start, min(courses, start + SEED_BATCH))
+        ]
+        response = await client.post(
+            "/courses/batch", json={"admin_id": admin_id, "courses": batch}
+        )
+        response.raise_for_status()
+        course_ids += [item["course"]["id"] for item in response.json()["results"]]
+
+    response = await client.post("/courses/", json={
+        "title": "Hot Course", "code": f"H{tag}", "capacity": hot_capacity, "admin_id": admin_id
+    })
+    response.raise_for_status()
+    return Population(admin_id, student_ids, course_ids, response.json()["id"])
+
+
+async def drive(
+    client: httpx.AsyncClient,
+    population: Population,
+    mix: Dict[str, float],
+    rps: float,
+    duration: float,
+    warmup: float,
+    concurrency: int,
+    rng: random.Random
+) -> Tuple[Dict[str, RouteStats], float]:
+    """Send requests on an open-loop schedule; return stats and measured seconds"""
+    names = list(mix)
+    weights = [mix[name] for name in names]
+    stats: Dict[str, RouteStats] = {}
+    slots = asyncio.Semaphore(concurrency)
+    loop = asyncio.get_running_loop()
+    start = loop.time()
+    measure_from = start + warmup
+    total = int(rps * (warmup + duration))
+    tasks = set()
+
+    async def send(scheduled: float, request: Request):
+        label, method, path, body = request
+        async with slots:
+            try:
+                response = await client.request(method, path, json=body)
+                status = response.status_code
+            except httpx.HTTPError:
+                status = None
+        if scheduled >= measure_from:
+            stats.setdefault(label, RouteStats()).record(loop.time() - scheduled, status)
+
+    for i in range(total):
+        scheduled = start + i / rps
+        delay = scheduled - loop.time()
+        if delay > 0:
+            await asyncio.sleep(delay)
+        request = SCENARIOS[rng.choices(names, weights)[0]](rng, population)
+        task = asyncio.create_task(send(scheduled, request))
+        tasks.add(task)
+        task.add_done_callback(tasks.discard)
+    await asyncio.gather(*tasks)
+    return stats, loop.time() - measure_from
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def start_server(port: int, workers: int, backend: str, directory: str) -> subprocess.Popen:
+    env = dict(os.environ, DATABASE_BACKEND=backend)
+    if backend == "sqlite":
+        env["SQLITE_PATH"] = os.path.join(directory, "load.db")
+    return subprocess.Popen(
+        [
+            sys.executable, "-m", "uvicorn", "app.main:app",
+            "--host", "127.0.0.1", "--port", str(port),
+            "--workers", str(workers), "--log-level", "warning", "--no-access-log"
+        ],
+        env=env
+    )
+
+
+async def wait_until_ready(client: httpx.AsyncClient, server: subprocess.Popen, timeout: float):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if server.poll() is not None:
+            raise RuntimeError(f"uvicorn exited with status {server.returncode}")
+        try:
+            if (await client.get("/health")).status_code == 200:
+                return
+        except httpx.TransportError:
+            pass
+        await asyncio.sleep(0.1)
+    raise RuntimeError(f"uvicorn did not become ready within {timeout:.0f}s")
+
+
+async def run(args, base_url: str, server: Optional[subprocess.Popen]) -> Dict[str, object]:
+    rng = random.Random(args.seed)
+    mix = parse_mix(args.mix)
+    limits = httpx.Limits(max_connections=args.concurrency, max_keepalive_connections=args.concurrency)
+    async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=args.timeout) as client:
+        if server is not None:
+            await wait_until_ready(client, server, timeout=30)
+        population = await seed(client, args.students, args.courses, args.hot_capacity)
+        stats, elapsed = await drive(
+            client, population, mix, args.rps, args.duration, args.warmup, args.concurrency, rng
+        )
+
+    combined = RouteStats()
+    for route in stats.values():
+        combined.latencies += route.latencies
+        combined.statuses.update(route.statuses)
+        combined.errors += route.errors
+    return {
+        "config": {
+            "url": base_url if server is None else None,
+            "backend": args.backend if server is not None else None,
+            "workers": args.workers if server is not None else None,
+            "mix": mix,
+            "rps": args.rps,
+            "duration": args.duration,
+            "warmup": args.warmup,
+            "concurrency": args.concurrency,
+            "students": args.students,
+            "courses": args.courses,
+            "hot_capacity": args.hot_capacity,
+            "seed": args.seed
+        },
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        # The generator shares the machine with the server, so compare runs
+        # across worker counts only on hosts with spare cores
+        "cpu_count": os.cpu_count(),
+        "timestamp": datetime.now(timezone.utc).isoformat(),
+        "elapsed": elapsed,
+        "routes": {label: route.summary(elapsed) for label, route in sorted(stats.items())},
+        "total": combined.summary(elapsed)
+    }
+
+
+def print_report(results: Dict, baseline: Optional[Dict]):
+    config = results["config"]
+    print(
+        f"\n{config['rps']:g} rps target for {config['duration']:g}s, "
+        f"mix {config['mix']}, workers={config['workers']}, backend={config['backend']}"
+    )
+    header = f"{'route':<32} {'reqs':>7} {'req/s':>8} {'err%':>6} {'p50ms':>8} {'p95ms':>8} {'p99ms':>8}"
+    print(header)
+    print("-" * len(header))
+    previous_routes = dict((baseline or {}).get("routes", {}), total=(baseline or {}).get("total"))
+    for label, summary in list(results["routes"].items()) + [("total", results["total"])]:
+        print(
+            f"{label:<32} {summary['requests']:>7} {summary['throughput']:>8.1f} "
+            f"{summary['error_rate'] * 100:>6.2f} {summary['p50_ms']:>8.2f} "
+            f"{summary['p95_ms']:>8.2f} {summary['p99_ms']:>8.2f}"
+        )
+        previous = previous_routes.get(label)
+        if previous:
+            print(
+                f"{'  vs baseline':<32} {'':>7} "
+                f"{summary['throughput'] - previous['throughput']:>+8.1f} "
+                f"{(summary['error_rate'] - previous['error_rate']) * 100:>+6.2f} "
+                f"{summary['p50_ms'] - previous['p50_ms']:>+8.2f} "
+                f"{summary['p95_ms'] - previous['p95_ms']:>+8.2f} "
+                f"{summary['p99_ms'] - previous['p99_ms']:>+8.2f}"
+            )
+    for label, summary in results["routes"].items():
+        failures = {code: n for code, n in summary["statuses"].items() if not code.startswith(("1", "2", "3"))}
+        if failures:
+            print(f"  {label}: {failures}")
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0].strip())
+    parser.add_argument("--url", help="target a running server instead of starting uvicorn")
+    parser.add_argument("--backend", choices=["memory", "sqlite"], default="memory")
+    parser.add_argument("--workers", type=int, default=1, help="uvicorn worker processes")
+    parser.add_argument("--mix", default=DEFAULT_MIX,
+                        help=f"weighted scenarios, from: {', '.join(SCENARIOS)} (default: {DEFAULT_MIX})")
+    parser.add_argument("--rps", type=float, default=200, help="target requests per second")
+    parser.add_argument("--duration", type=float, default=10, help="measured seconds")
+    parser.add_argument("--warmup", type=float, default=2, help="unmeasured seconds first")
+    parser.add_argument("--concurrency", type=int, default=100, help="max requests in flight")
+    parser.add_argument("--timeout", type=float, default=10, help="per-request timeout")
+    parser.add_argument("--students", type=int, default=1000)
+    parser.add_argument("--courses", type=int, default=100)
+    parser.add_argument("--hot-capacity", type=int, default=100,
+                        help="seats in the course hot_enroll targets")
+    parser.add_argument("--seed", type=int, default=0, help="random seed for the traffic")
+    parser.add_argument("--output", help="write results to this JSON file")
+    parser.add_argument("--baseline", help="show deltas against a JSON file from --output")
+    args = parser.parse_args(argv)
+
+    if args.url is None and args.workers > 1 and args.backend == "memory":
+        # Each worker process would hold its own copy of the data
+        parser.error("--workers > 1 needs --backend sqlite")
+    try:
+        parse_mix(args.mix)
+    except ValueError as exc:
+        parser.error(str(exc))
+
+    baseline = None
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+
+    with tempfile.TemporaryDirectory() as directory:
+        server = None
+        base_url = args.url
+        if base_url is None:
+            port = free_port()
+            base_url = f"http://127.0.0.1:{port}"
+            server = start_server(port, args.workers, args.backend, directory)
+        try:
+            results = asyncio.run(run(args, base_url, server))
+        finally:
+            if server is not None:
+                server.terminate()
+                server.wait(timeout=30)
+
+    print_report(results, baseline)
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+        print(f"\nresults written to {args.output}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
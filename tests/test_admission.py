@@ -0,0 +1,163 @@
+import asyncio
+import anyio
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from app.admission import (
+    HIGH, NORMAL, LOW, AdmissionController, AdmissionMiddleware, classify
+)
+from app.database import db
+from app.main import app
+
+client = TestClient(app)
+
+
+@pytest.fixture(autouse=True)
+def reset_database():
+    """Reset database before each test"""
+    db.reset()
+    yield
+    db.reset()
+
+
+def scope(method: str, path: str, query: str = "") -> dict:
+    return {"type": "http", "method": method, "path": path, "query_string": query.encode()}
+
+
+class TestClassification:
+    """Test request priorities"""
+
+    def test_reads_writes_and_exempt_paths(self):
+        """Test the priority of anonymous requests"""
+        assert classify(scope("GET", "/courses/1")) == LOW
+        assert classify(scope("POST", "/enrollments/")) == NORMAL
+        assert classify(scope("GET", "/health")) is None
+        assert classify(scope("GET", "/metrics")) is None
+
+    def test_known_admins_are_high_priority(self):
+        """Test that only cached admin roles raise the priority"""
+        admin = client.post(
+            "/users/", json={"name": "Admin", "email": "admin@example.com", "role": "admin"}
+        ).json()
+        student = client.post(
+            "/users/", json={"name": "Student", "email": "student@example.com", "role": "student"}
+        ).json()
+        client.get("/enrollments/", params={"admin_id": admin["id"]})
+        client.get("/enrollments/", params={"admin_id": student["id"]})
+        roster = scope("GET", "/enrollments/course/1", f"admin_id={admin['id']}&limit=10")
+        assert classify(roster) == HIGH
+        assert classify(scope("GET", "/enrollments/", f"admin_id={student['id']}")) == LOW
+        assert classify(scope("DELETE", "/enrollments/admin/1", "admin_id=x")) == NORMAL
+
+    def test_admin_id_only_counts_on_admin_routes(self):
+        """Test that an admin_id on a route that ignores it raises nothing"""
+        admin = client.post(
+            "/users/", json={"name": "Admin", "email": "admin@example.com", "role": "admin"}
+        ).json()
+        client.get("/enrollments/", params={"admin_id": admin["id"]})
+        admin_id = f"admin_id={admin['id']}"
+        assert classify(scope("GET", "/courses/", admin_id)) == LOW
+        assert classify(scope("GET", "/courses/1", admin_id)) == LOW
+        assert classify(scope("POST", "/enrollments/", admin_id)) == NORMAL
+        assert classify(scope("GET", "/enrollments/waitlist/1/position", admin_id)) == LOW
+        assert classify(scope("DELETE", "/courses/1", admin_id)) == HIGH
+        assert classify(scope("GET", "/enrollments/waitlist/1", admin_id)) == HIGH
+        assert classify(scope("GET", "/admin/storage", admin_id)) == HIGH
+
+
+class TestAdmissionController:
+    """Test the concurrency limit and priority queues"""
+
+    def test_freed_slot_goes_to_highest_priority(self):
+        """Test that waiters are admitted by priority, then arrival"""
+        controller = AdmissionController(limit=1, queue_size=10, queue_timeout=5)
+        order = []
+
+        async def request(name: str, priority: int):
+            assert await controller.acquire(priority)
+            order.append(name)
+            controller.release()
+
+        async def main():
+            assert await controller.acquire(NORMAL)
+            async with anyio.create_task_group() as group:
+                for name, priority in (("low", LOW), ("high1", HIGH), ("normal", NORMAL), ("high2", HIGH)):
+                    group.start_soon(request, name, priority)
+                    await asyncio.sleep(0)
+                assert controller.queued == 4
+                controller.release()
+
+        anyio.run(main)
+        assert order == ["high1", "high2", "normal", "low"]
+        assert controller.active == 0
+
+    def test_full_queue_sheds_lower_priority(self):
+        """Test that a full queue pushes out lower priorities, then rejects"""
+        controller = AdmissionController(limit=1, queue_size=1, queue_timeout=5)
+        results = {}
+
+        async def request(name: str, priority: int):
+            results[name] = await controller.acquire(priority)
+            if results[name]:
+                controller.release()
+
+        async def main():
+            assert await controller.acquire(HIGH)
+            async with anyio.create_task_group() as group:
+                group.start_soon(request, "low", LOW)
+                await asyncio.sleep(0)
+                group.start_soon(request, "normal", NORMAL)
+                await asyncio.sleep(0)
+                group.start_soon(request, "another low", LOW)
+                await asyncio.sleep(0)
+                controller.release()
+
+        anyio.run(main)
+        assert results == {"low": False, "normal": True, "another low": False}
+        assert controller.rejected[LOW] == 2
+
+    def test_queue_timeout_rejects(self):
+        """Test that a request waiting too long gives up its place"""
+        controller = AdmissionController(limit=1, queue_size=10, queue_timeout=0.01)
+
+        async def main():
+            assert await controller.acquire(LOW)
+            assert not await controller.acquire(LOW)
+            assert controller.queued == 0
+            controller.release()
+            assert await controller.acquire(LOW)
+
+        anyio.run(main)
+
+
+class TestAdmissionMiddleware:
+    """Test the 503 response when load is shed"""
+
+    def test_rejects_with_retry_after(self):
+        """Test that requests beyond the limit and queue fail fast"""
+        inner = FastAPI()
+
+        @inner.get("/courses/")
+        async def courses():
+            return []
+
+        @inner.get("/health")
+        async def health():
+            return {"status": "healthy"}
+
+        controller = AdmissionController(limit=1, queue_size=0, queue_timeout=5)
+        shedding = TestClient(AdmissionMiddleware(inner, controller=controller, retry_after=3))
+        assert shedding.get("/courses/").status_code == 200
+
+        controller.active = 1  # the only slot is taken
+        response = shedding.get("/courses/")
+        assert response.status_code == 503
+        assert response.headers["retry-after"] == "3"
+        assert shedding.get("/health").status_code == 200
+
+    def test_metrics_export_admission_counters(self):
+        """Test that admission gauges and counters are scraped"""
+        client.get("/courses/")
+        text = client.get("/metrics").text
+        assert 'app_admission_admitted_total{priority="low"}' in text
+        assert 'app_admission_queued{priority="high"} 0' in text
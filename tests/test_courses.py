@@ -1,7 +1,9 @@
 import pytest
 from fastapi.testclient import TestClient
 from app.main import app
+from app.course_cache import CourseCache, course_cache
 from app.database import db
+from app.records import CourseRecord
 
 client = TestClient(app)
 
@@ -203,6 +205,41 @@ class TestCourseCreation:
         assert "already exists" in response.json()["detail"].lower()
 
 
+class TestCourseBatchCreation:
+    """Test bulk course creation (admin only)"""
+    
+    def test_create_courses_batch(self, admin_user, sample_course):
+        """Test creating several courses with per-item results"""
+        response = client.post(
+            "/courses/batch",
+            json={
+                "admin_id": admin_user["id"],
+                "courses": [
+                    {"title": "Algorithms", "code": "CS301"},
+                    {"title": "Duplicate", "code": sample_course["code"]},
+                    {"title": "Algorithms Again", "code": "CS301"}
+                ]
+            }
+        )
+        assert response.status_code == 200
+        data = response.json()
+        assert data["created"] == 1
+        assert [r["status_code"] for r in data["results"]] == [201, 400, 400]
+        assert data["results"][0]["course"]["code"] == "CS301"
+    
+    def test_create_courses_batch_as_student_fails(self, student_user):
+        """Test that students cannot bulk create courses"""
+        response = client.post(
+            "/courses/batch",
+            json={
+                "admin_id": student_user["id"],
+                "courses": [{"title": "Course", "code": "CS999"}]
+            }
+        )
+        assert response.status_code == 403
+        assert client.get("/courses/").json() == []
+
+
 class TestCourseUpdate:
     """Test course update (admin only)"""
     
@@ -343,9 +380,10 @@ class TestCourseDelete:
         assert len(enrollments_before) == 1
         
         # Delete course
-        client.delete(
+        response = client.delete(
             f"/courses/{sample_course['id']}?admin_id={admin_user['id']}"
         )
+        assert response.json()["enrollments_removed"] == 1
         
         # Verify enrollments are deleted
         enrollments_after = client.get(
@@ -379,3 +417,191 @@ class TestCourseValidation:
             }
         )
         assert response.status_code == 201
+
+    def test_capacity_must_be_positive(self, admin_user):
+        """Test that a zero capacity is rejected"""
+        response = client.post(
+            "/courses/",
+            json={
+                "title": "Course",
+                "code": "CS101",
+                "capacity": 0,
+                "admin_id": admin_user["id"]
+            }
+        )
+        assert response.status_code == 422
+
+
+class TestCourseSeats:
+    """Test course capacity and seat availability"""
+
+    def test_seats_of_limited_course(self, admin_user, student_user):
+        """Test that seats count enrollments against the capacity"""
+        course = client.post(
+            "/courses/",
+            json={
+                "title": "Seminar",
+                "code": "SEM1",
+                "capacity": 2,
+                "admin_id": admin_user["id"]
+            }
+        ).json()
+        assert course["capacity"] == 2
+        client.post(
+            "/enrollments/", json={"user_id": student_user["id"], "course_id": course["id"]}
+        )
+        response = client.get(f"/courses/{course['id']}/seats")
+        assert response.status_code == 200
+        assert response.json() == {
+            "course_id": course["id"],
+            "capacity": 2,
+            "enrolled": 1,
+            "available": 1,
+            "waitlisted": 0
+        }
+
+    def test_seats_of_unlimited_course(self, sample_course):
+        """Test that courses without a capacity have no seat limit"""
+        assert sample_course["capacity"] is None
+        seats = client.get(f"/courses/{sample_course['id']}/seats").json()
+        assert seats["available"] is None
+
+    def test_seats_of_missing_course(self):
+        """Test seats for a non-existent course"""
+        response = client.get("/courses/999/seats")
+        assert response.status_code == 404
+
+    def test_update_without_capacity_keeps_limit(self, admin_user):
+        """Test that renaming a full course keeps its seats and waitlist"""
+        course = client.post(
+            "/courses/",
+            json={"title": "Seminar", "code": "SEM1", "capacity": 1, "admin_id": admin_user["id"]}
+        ).json()
+        for i in range(3):
+            student = client.post(
+                "/users/",
+                json={"name": f"Student {i}", "email": f"s{i}@example.com", "role": "student"}
+            ).json()
+            client.post("/enrollments/", json={"user_id": student["id"], "course_id": course["id"]})
+        seats = client.get(f"/courses/{course['id']}/seats").json()
+        waitlist = client.get(
+            f"/enrollments/waitlist/{course['id']}", params={"admin_id": admin_user["id"]}
+        ).json()
+
+        response = client.put(
+            f"/courses/{course['id']}",
+            json={"title": "Research Seminar", "code": "SEM1", "admin_id": admin_user["id"]}
+        )
+        assert response.status_code == 200
+        assert response.json()["capacity"] == 1
+        assert client.get(f"/courses/{course['id']}/seats").json() == seats
+        assert seats["enrolled"] == 1 and seats["waitlisted"] == 2
+        assert client.get(
+            f"/enrollments/waitlist/{course['id']}", params={"admin_id": admin_user["id"]}
+        ).json() == waitlist
+
+    def test_update_with_null_capacity_removes_limit(self, admin_user):
+        """Test that an explicit null capacity makes the course unlimited"""
+        course = client.post(
+            "/courses/",
+            json={"title": "Seminar", "code": "SEM1", "capacity": 1, "admin_id": admin_user["id"]}
+        ).json()
+        response = client.put(
+            f"/courses/{course['id']}",
+            json={"title": "Seminar", "code": "SEM1", "capacity": None, "admin_id": admin_user["id"]}
+        )
+        assert response.json()["capacity"] is None
+
+
+class TestCourseCache:
+    """Test the encoded course response cache"""
+
+    def test_reads_are_cached(self, sample_course):
+        """Test that catalog reads fill the cache when it is enabled"""
+        first = client.get(f"/courses/{sample_course['id']}")
+        second = client.get(f"/courses/{sample_course['id']}")
+        assert first.content == second.content
+        assert first.json() == sample_course
+        assert client.get("/courses/").json() == [sample_course]
+        if course_cache.enabled:
+            assert course_cache.get(sample_course["id"]) == first.content
+            assert course_cache.get_listing() is not None
+
+    def test_update_invalidates(self, admin_user, sample_course):
+        """Test that updates are visible to cached reads"""
+        client.get(f"/courses/{sample_course['id']}")
+        client.get("/courses/")
+        client.put(
+            f"/courses/{sample_course['id']}",
+            json={"title": "Advanced Python", "code": "CS201", "admin_id": admin_user["id"]}
+        )
+        assert client.get(f"/courses/{sample_course['id']}").json()["code"] == "CS201"
+        assert [c["code"] for c in client.get("/courses/").json()] == ["CS201"]
+
+    def test_create_and_delete_invalidate(self, admin_user, sample_course):
+        """Test that creates and deletes are visible to cached reads"""
+        client.get(f"/courses/{sample_course['id']}")
+        client.get("/courses/")
+        client.post(
+            "/courses/",
+            json={"title": "Databases", "code": "DB200", "admin_id": admin_user["id"]}
+        )
+        assert [c["code"] for c in client.get("/courses/").json()] == ["CS101", "DB200"]
+        client.delete(f"/courses/{sample_course['id']}?admin_id={admin_user['id']}")
+        assert client.get(f"/courses/{sample_course['id']}").status_code == 404
+        assert [c["code"] for c in client.get("/courses/").json()] == ["DB200"]
+
+    def test_stale_fill_is_discarded(self):
+        """Test that a fill started before an invalidation is not kept"""
+        cache = CourseCache()
+        generation = cache.generation
+        cache.invalidate(1)
+        cache.store(CourseRecord(1, "Python", "CS101"), generation)
+        assert cache.get(1) is None
+        cache.store(CourseRecord(1, "Python", "CS101"), cache.generation)
+        assert cache.get(1) is not None
+
+
+class TestConditionalGet:
+    """Test ETag / If-None-Match on course reads"""
+
+    def test_unchanged_catalog_returns_304(self, sample_course):
+        """Test that a matching If-None-Match gets 304 with no body"""
+        for url in ["/courses/", f"/courses/{sample_course['id']}"]:
+            etag = client.get(url).headers["etag"]
+            response = client.get(url, headers={"If-None-Match": etag})
+            assert response.status_code == 304
+            assert response.content == b""
+            assert response.headers["etag"] == etag
+            weak = client.get(url, headers={"If-None-Match": f'"other", W/{etag}'})
+            assert weak.status_code == 304
+
+    def test_wildcard_requires_existing_course(self, sample_course):
+        """Test that If-None-Match: * only matches a course that exists"""
+        url = f"/courses/{sample_course['id']}"
+        assert client.get(url, headers={"If-None-Match": "*"}).status_code == 304
+        assert client.get("/courses/999", headers={"If-None-Match": "*"}).status_code == 404
+
+    def test_other_course_etag_does_not_match(self, sample_course):
+        """Test that one course's ETag never answers for another id"""
+        etag = client.get(f"/courses/{sample_course['id']}").headers["etag"]
+        response = client.get("/courses/999", headers={"If-None-Match": etag})
+        assert response.status_code == 404
+
+    def test_update_changes_etag(self, admin_user, sample_course):
+        """Test that a course change invalidates earlier tags"""
+        etag = client.get("/courses/").headers["etag"]
+        client.put(
+            f"/courses/{sample_course['id']}",
+            json={"title": "Advanced Python", "code": "CS201", "admin_id": admin_user["id"]}
+        )
+        response = client.get("/courses/", headers={"If-None-Match": etag})
+        assert response.status_code == 200
+        assert response.headers["etag"] != etag
+        assert response.json()[0]["code"] == "CS201"
+
+    def test_reset_changes_etag(self, sample_course):
+        """Test that tags from before a reset never match again"""
+        etag = client.get("/courses/").headers["etag"]
+        db.reset()
+        assert client.get("/courses/", headers={"If-None-Match": etag}).status_code == 200
@@ -0,0 +1,401 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+import anyio
+import pytest
+from app.async_database import AsyncDatabase
+from app.columnar import EnrollmentTable
+from app.database import Database
+from app.locks import RWLock
+from app.models import User
+from app.records import (
+    UserRecord, ENROLLED, WAITLISTED, ALREADY_ENROLLED, ALREADY_WAITLISTED, COURSE_NOT_FOUND,
+    COURSE_FULL
+)
+
+
+@pytest.fixture
+def database():
+    """Provide a fresh, isolated database"""
+    return Database()
+
+
+class TestPrimaryKeyLookups:
+    """Test id-keyed table lookups"""
+
+    def test_get_user_by_id(self, database):
+        """Test that users are found by id"""
+        database.create_user(name="A", email="a@example.com", role="student")
+        user = database.create_user(name="B", email="b@example.com", role="admin")
+        assert database.get_user(user.id) is user
+        assert database.get_user(999) is None
+
+    def test_get_all_preserves_creation_order(self, database):
+        """Test that listing tables yields rows in creation order"""
+        for code in ["CS103", "CS101", "CS102"]:
+            database.create_course(title=code, code=code)
+        assert [c.code for c in database.get_all_courses()] == ["CS103", "CS101", "CS102"]
+
+    def test_rows_are_plain_records(self, database):
+        """Test that rows are stored as records and convert to API models"""
+        user = database.create_user(name="A", email="a@example.com", role="student")
+        assert isinstance(user, UserRecord)
+        assert User.model_validate(user) == User(id=user.id, name="A", email="a@example.com", role="student")
+        assert user == user.copy()
+
+    def test_update_course_uses_index(self, database):
+        """Test that updates apply to the indexed row"""
+        course = database.create_course(title="Old", code="OLD")
+        database.update_course(course.id, title="New", code="NEW")
+        assert database.get_course(course.id).code == "NEW"
+        assert database.update_course(999, title="X", code="X") is None
+
+    def test_delete_enrollment(self, database):
+        """Test that deleted enrollments are no longer retrievable"""
+        enrollment = database.create_enrollment(user_id=1, course_id=1)
+        assert database.delete_enrollment(enrollment.id) is True
+        assert database.get_enrollment(enrollment.id) is None
+        assert database.delete_enrollment(enrollment.id) is False
+
+
+class TestUniqueIndexes:
+    """Test email and course code uniqueness indexes"""
+
+    def test_email_index_tracks_created_users(self, database):
+        """Test that created emails are reported as taken"""
+        database.create_user(name="A", email="a@example.com", role="student")
+        assert database.email_exists("a@example.com")
+        assert not database.email_exists("b@example.com")
+
+    def test_course_code_index_follows_updates(self, database):
+        """Test that renaming a code frees the old one"""
+        course = database.create_course(title="Course", code="CS101")
+        database.update_course(course.id, title="Course", code="CS102")
+        assert not database.course_code_exists("CS101")
+        assert database.course_code_exists("CS102")
+        assert not database.course_code_exists("CS102", exclude_id=course.id)
+
+    def test_course_code_index_follows_deletes(self, database):
+        """Test that deleting a course frees its code"""
+        course = database.create_course(title="Course", code="CS101")
+        database.delete_course(course.id)
+        assert not database.course_code_exists("CS101")
+
+    def test_normalized_matching(self):
+        """Test that normalized mode matches keys case-insensitively"""
+        database = Database(normalize_keys=True)
+        database.create_user(name="A", email="Ann@example.com", role="student")
+        database.create_course(title="Course", code="cs101")
+        assert database.email_exists("ann@EXAMPLE.com")
+        assert database.course_code_exists("CS101")
+        database.reset()
+        assert database.normalize_keys
+        assert not database.course_code_exists("CS101")
+
+
+class TestEnrollmentIndexes:
+    """Test per-student and per-course enrollment indexes and pair lookups"""
+
+    def test_lookups_by_student_and_course(self, database):
+        """Test that adjacency lookups return only matching rows in order"""
+        e1 = database.create_enrollment(user_id=1, course_id=10)
+        database.create_enrollment(user_id=2, course_id=10)
+        e3 = database.create_enrollment(user_id=1, course_id=11)
+        assert database.get_enrollments_by_student(1) == [e1, e3]
+        assert [e.user_id for e in database.get_enrollments_by_course(10)] == [1, 2]
+        assert database.get_enrollments_by_student(3) == []
+
+    def test_pair_index(self, database):
+        """Test that the pair index follows creates and deletes"""
+        enrollment = database.create_enrollment(user_id=1, course_id=10)
+        assert database.enrollment_exists(1, 10)
+        assert not database.enrollment_exists(10, 1)
+        database.delete_enrollment(enrollment.id)
+        assert not database.enrollment_exists(1, 10)
+        assert database.get_enrollments_by_course(10) == []
+        assert database.enrollment_pairs == set()
+
+    def test_delete_course_clears_indexes(self, database):
+        """Test that cascading course deletes keep indexes in sync"""
+        course = database.create_course(title="Course", code="CS101")
+        database.create_enrollment(user_id=1, course_id=course.id)
+        kept = database.create_enrollment(user_id=1, course_id=course.id + 1)
+        assert database.delete_course(course.id) == 1
+        assert database.delete_course(course.id) is None
+        assert not database.enrollment_exists(1, course.id)
+        assert database.get_enrollments_by_student(1) == [kept]
+
+
+class TestKeysetPagination:
+    """Test keyset paging of tables and enrollment indexes"""
+
+    def test_page_skips_deleted_rows(self, database):
+        """Test that pages resume after the given id and skip deleted rows"""
+        ids = [database.create_enrollment(user_id=1, course_id=c).id for c in range(6)]
+        database.delete_enrollment(ids[2])
+        page = database.get_all_enrollments(after_id=ids[0], limit=3)
+        assert [e.id for e in page] == [ids[1], ids[3], ids[4]]
+
+    def test_page_by_student(self, database):
+        """Test paging within one student's enrollments"""
+        ids = [database.create_enrollment(user_id=1, course_id=c).id for c in range(4)]
+        database.create_enrollment(user_id=2, course_id=0)
+        page = database.get_enrollments_by_student(1, after_id=ids[1], limit=5)
+        assert [e.id for e in page] == ids[2:]
+
+    def test_order_compacts_after_many_deletes(self, database):
+        """Test that the id order drops tombstones once they dominate"""
+        ids = [database.create_course(title=str(c), code=str(c)).id for c in range(10)]
+        for course_id in ids[:8]:
+            database.delete_course(course_id)
+        assert len(database.course_order.ids) < 10
+        assert [c.id for c in database.get_all_courses()] == ids[8:]
+
+
+class TestColumnarEnrollments:
+    """Test the array-backed enrollment table"""
+
+    def test_rows_are_built_on_read(self, database):
+        """Test that enrollments are stored as columns and built per call"""
+        created = database.create_enrollment(user_id=1, course_id=10)
+        assert list(database.enrollments.user_ids) == [1]
+        fetched = database.get_enrollment(created.id)
+        assert fetched == created
+        assert fetched is not database.get_enrollment(created.id)
+
+    def test_deleted_slots_are_compacted(self, database):
+        """Test that tombstoned slots are reclaimed once they dominate"""
+        ids = [database.create_enrollment(user_id=u, course_id=1).id for u in range(10)]
+        for enrollment_id in ids[:6]:
+            database.delete_enrollment(enrollment_id)
+        assert database.enrollments.dead == 0
+        assert list(database.enrollments.ids) == ids[6:]
+        assert [e.user_id for e in database.get_all_enrollments()] == [6, 7, 8, 9]
+        assert database.get_enrollment(ids[0]) is None
+        assert database.enrollment_exists(7, 1)
+
+    def test_ids_must_increase(self):
+        """Test that the id column stays sorted"""
+        table = EnrollmentTable()
+        table.append(5, 1, 1)
+        with pytest.raises(ValueError):
+            table.append(5, 2, 2)
+
+
+class TestVersions:
+    """Test the change counters behind conditional GETs"""
+
+    def test_versions_follow_changes(self, database):
+        """Test that each mutation bumps only the affected counters"""
+        course = database.create_course(title="A", code="A")
+        users_version = database.get_table_version("users")
+        enrollment = database.create_enrollment(user_id=1, course_id=course.id)
+        student_version = database.get_student_enrollments_version(1)
+        assert database.get_student_enrollments_version(2) < student_version
+        assert database.get_table_version("users") == users_version
+        database.delete_enrollment(enrollment.id)
+        assert database.get_student_enrollments_version(1) > student_version
+        with pytest.raises(ValueError):
+            database.get_table_version("grades")
+
+    def test_versions_never_repeat_after_reset(self, database):
+        """Test that a reset moves every counter past earlier values"""
+        database.create_enrollment(user_id=1, course_id=1)
+        before = database.get_student_enrollments_version(1)
+        database.reset()
+        assert database.get_student_enrollments_version(1) > before
+        assert database.get_course_enrollments_version(1) > before
+
+
+class TestConcurrency:
+    """Test that the store stays consistent under concurrent use"""
+
+    def test_concurrent_creates_get_unique_ids(self, database):
+        """Test that id counters are not raced"""
+        with ThreadPoolExecutor(max_workers=16) as pool:
+            users = list(pool.map(
+                lambda i: database.create_user(name=str(i), email=f"u{i}@example.com", role="student"),
+                range(500)
+            ))
+        assert len({u.id for u in users}) == 500
+        assert len(database.get_all_users()) == 500
+
+    def test_concurrent_enrollment_is_not_duplicated(self, database):
+        """Test that check-and-insert admits exactly one duplicate request"""
+        course = database.create_course(title="Course", code="CS101")
+        with ThreadPoolExecutor(max_workers=16) as pool:
+            results = list(pool.map(
+                lambda _: database.try_create_enrollment(1, course.id), range(200)
+            ))
+        assert sum(r is not None for r in results) == 1
+        assert len(database.get_enrollments_by_course(course.id)) == 1
+
+    def test_try_create_enrollment_rejects_missing_course(self, database):
+        """Test that enrollments are not created for deleted courses"""
+        assert database.try_create_enrollment(1, 999) is None
+
+    def test_try_update_course_rejects_taken_code(self, database):
+        """Test atomic code uniqueness on update"""
+        database.create_course(title="A", code="A")
+        course = database.create_course(title="B", code="B")
+        assert database.try_update_course(course.id, title="B", code="A") is None
+        assert database.try_update_course(course.id, title="B2", code="B").title == "B2"
+
+    def test_readers_share_writer_excludes(self):
+        """Test reader/writer lock semantics"""
+        lock = RWLock()
+        lock.acquire_read()
+        lock.acquire_read()
+        acquired = threading.Event()
+
+        def writer():
+            with lock.write:
+                acquired.set()
+
+        thread = threading.Thread(target=writer)
+        thread.start()
+        assert not acquired.wait(0.05)
+        lock.release_read()
+        lock.release_read()
+        assert acquired.wait(1)
+        thread.join()
+
+
+class TestCourseCapacity:
+    """Test seat limits and waitlists"""
+
+    def test_full_course_waitlists_in_order(self, database):
+        """Test that students past the capacity are queued with their position"""
+        course = database.create_course(title="Course", code="CS101", capacity=2)
+        outcomes = [database.try_enroll(user_id, course.id) for user_id in range(1, 5)]
+        assert [o.status for o in outcomes] == [ENROLLED, ENROLLED, WAITLISTED, WAITLISTED]
+        assert [o.position for o in outcomes[2:]] == [1, 2]
+        assert database.try_enroll(4, course.id).status == ALREADY_WAITLISTED
+        assert database.try_enroll(1, 999).status == COURSE_NOT_FOUND
+        assert database.get_waitlist(course.id) == [3, 4]
+        assert database.get_seats(course.id) == (2, 2, 2)
+        # Direct inserts respect the capacity too
+        assert database.try_create_enrollment(5, course.id) is None
+        assert database.create_enrollments([(5, course.id)])[0].status == COURSE_FULL
+
+    def test_batch_reports_skip_reasons(self, database):
+        """Test that batch inserts report why each skipped pair failed"""
+        course = database.create_course(title="Course", code="CS101", capacity=2)
+        database.try_enroll(1, course.id)
+        outcomes = database.create_enrollments(
+            [(1, course.id), (2, course.id), (2, course.id), (3, course.id), (3, 999)]
+        )
+        assert [o.status for o in outcomes] == [
+            ALREADY_ENROLLED, ENROLLED, ALREADY_ENROLLED, COURSE_FULL, COURSE_NOT_FOUND
+        ]
+        assert outcomes[1].enrollment.user_id == 2
+
+    def test_freed_seat_promotes_first_waiting(self, database):
+        """Test FIFO promotion when an enrollment is deleted"""
+        course = database.create_course(title="Course", code="CS101", capacity=1)
+        first = database.try_enroll(1, course.id).enrollment
+        database.try_enroll(2, course.id)
+        database.try_enroll(3, course.id)
+        assert database.delete_enrollment(first.id)
+        assert [e.user_id for e in database.get_enrollments_by_course(course.id)] == [2]
+        assert database.get_waitlist(course.id) == [3]
+        assert database.get_waitlist_position(3, course.id) == 1
+
+    def test_raising_capacity_promotes(self, database):
+        """Test that new seats go to the waitlist before anyone else"""
+        course = database.create_course(title="Course", code="CS101", capacity=1)
+        for user_id in range(1, 4):
+            database.try_enroll(user_id, course.id)
+        database.update_course(course.id, title="Course", code="CS101", capacity=None)
+        assert database.get_waitlist(course.id) == []
+        assert database.get_seats(course.id) == (None, 3, 0)
+
+    def test_update_keeps_capacity_unless_given(self, database):
+        """Test that an update without a capacity keeps the seat limit"""
+        course = database.create_course(title="Course", code="CS101", capacity=1)
+        for user_id in range(1, 4):
+            database.try_enroll(user_id, course.id)
+        assert database.try_update_course(course.id, title="Renamed", code="CS101").capacity == 1
+        assert database.get_seats(course.id) == (1, 1, 2)
+
+    def test_leave_waitlist(self, database):
+        """Test that leaving keeps the others' order"""
+        course = database.create_course(title="Course", code="CS101", capacity=1)
+        for user_id in range(1, 5):
+            database.try_enroll(user_id, course.id)
+        assert database.leave_waitlist(3, course.id)
+        assert not database.leave_waitlist(3, course.id)
+        assert database.get_waitlist(course.id) == [2, 4]
+        assert database.get_waitlist_position(4, course.id) == 2
+
+    def test_delete_course_drops_waitlist(self, database):
+        """Test that a deleted course leaves no queue behind"""
+        course = database.create_course(title="Course", code="CS101", capacity=1)
+        database.try_enroll(1, course.id)
+        database.try_enroll(2, course.id)
+        database.delete_course(course.id)
+        assert database.get_waitlist(course.id) == []
+        assert database.get_seats(course.id) is None
+
+    def test_concurrent_enrollment_never_oversells(self, database):
+        """Test that racing requests fill exactly the capacity"""
+        course = database.create_course(title="Course", code="CS101", capacity=10)
+        with ThreadPoolExecutor(max_workers=16) as pool:
+            outcomes = list(pool.map(lambda i: database.try_enroll(i, course.id), range(200)))
+        assert sum(o.status == ENROLLED for o in outcomes) == 10
+        assert sorted(o.position for o in outcomes if o.status == WAITLISTED) == list(range(1, 191))
+        assert len(database.get_enrollments_by_course(course.id)) == 10
+
+
+class TestAsyncDatabase:
+    """Test the async storage interface"""
+
+    def test_in_memory_calls_run_inline(self, database):
+        """Test that non-blocking backends are called on the event loop thread"""
+        async_database = AsyncDatabase(database, max_blocking_calls=4)
+
+        async def main():
+            user = await async_database.create_user(name="A", email="a@example.com", role="student")
+            assert await async_database.get_user(user.id) is user
+            return threading.get_ident()
+
+        calling_thread = threading.get_ident()
+        assert anyio.run(main) == calling_thread
+
+    def test_wrappers_are_cached_until_backend_changes(self, database):
+        """Test that method wrappers are built once per backend"""
+        async_database = AsyncDatabase(database, max_blocking_calls=4)
+        assert async_database.get_user is async_database.get_user
+        other = Database()
+        user = other.create_user(name="A", email="a@example.com", role="student")
+        async_database.backend = other
+        assert anyio.run(async_database.get_user, user.id) is user
+
+    def test_blocking_calls_are_limited(self):
+        """Test that blocking backends run on threads under the configured limit"""
+        class SlowBackend:
+            blocking = True
+
+            def __init__(self):
+                self.lock = threading.Lock()
+                self.running = 0
+                self.peak = 0
+
+            def work(self):
+                with self.lock:
+                    self.running += 1
+                    self.peak = max(self.peak, self.running)
+                time.sleep(0.02)
+                with self.lock:
+                    self.running -= 1
+
+        backend = SlowBackend()
+        async_database = AsyncDatabase(backend, max_blocking_calls=2)
+
+        async def main():
+            async with anyio.create_task_group() as group:
+                for _ in range(6):
+                    group.start_soon(async_database.work)
+
+        anyio.run(main)
+        assert backend.peak == 2
@@ -1,3 +1,4 @@
+import json
 import pytest
 from fastapi.testclient import TestClient
 from app.main import app
@@ -485,6 +486,104 @@ class TestAdminEnrollmentOversight:
         assert "not found" in response.json()["detail"].lower()
 
 
+@pytest.fixture
+def limited_course(admin_user):
+    """Create a course with a single seat"""
+    response = client.post(
+        "/courses/",
+        json={
+            "title": "Seminar",
+            "code": "SEM1",
+            "capacity": 1,
+            "admin_id": admin_user["id"]
+        }
+    )
+    return response.json()
+
+
+def create_student(n: int) -> dict:
+    return client.post(
+        "/users/",
+        json={"name": f"Student {n}", "email": f"waiting{n}@example.com", "role": "student"}
+    ).json()
+
+
+def enroll(user: dict, course: dict):
+    return client.post("/enrollments/", json={"user_id": user["id"], "course_id": course["id"]})
+
+
+class TestWaitlist:
+    """Test course capacity and the waitlist"""
+
+    def test_full_course_waitlists_student(self, student_user, student_user2, limited_course):
+        """Test that a full course answers 202 with the waitlist position"""
+        assert enroll(student_user, limited_course).status_code == 201
+        response = enroll(student_user2, limited_course)
+        assert response.status_code == 202
+        assert response.json()["position"] == 1
+        roster = client.get(f"/enrollments/student/{student_user2['id']}").json()
+        assert roster == []
+
+    def test_cannot_join_waitlist_twice(self, student_user, student_user2, limited_course):
+        """Test that a waitlisted student cannot queue again"""
+        enroll(student_user, limited_course)
+        enroll(student_user2, limited_course)
+        response = enroll(student_user2, limited_course)
+        assert response.status_code == 400
+        assert "waitlist" in response.json()["detail"].lower()
+
+    def test_deregister_promotes_next_student(self, student_user, limited_course):
+        """Test that a freed seat goes to the first student waiting"""
+        enrollment = enroll(student_user, limited_course).json()
+        waiting = [create_student(n) for n in range(3)]
+        for user in waiting:
+            enroll(user, limited_course)
+        client.delete(f"/enrollments/{enrollment['id']}?user_id={student_user['id']}")
+        promoted = client.get(f"/enrollments/student/{waiting[0]['id']}").json()
+        assert [e["course_id"] for e in promoted] == [limited_course["id"]]
+        position = client.get(
+            f"/enrollments/waitlist/{limited_course['id']}/position",
+            params={"user_id": waiting[2]["id"]}
+        )
+        assert position.json()["position"] == 2
+
+    def test_admin_force_deregister_promotes(self, admin_user, student_user, student_user2, limited_course):
+        """Test that admin removal also hands the seat on"""
+        enrollment = enroll(student_user, limited_course).json()
+        enroll(student_user2, limited_course)
+        client.delete(f"/enrollments/admin/{enrollment['id']}?admin_id={admin_user['id']}")
+        waitlist = client.get(
+            f"/enrollments/waitlist/{limited_course['id']}", params={"admin_id": admin_user["id"]}
+        ).json()
+        assert waitlist == {"course_id": limited_course["id"], "user_ids": []}
+        assert client.get(f"/enrollments/student/{student_user2['id']}").json() != []
+
+    def test_leave_waitlist(self, admin_user, student_user, student_user2, limited_course):
+        """Test that a student can give up their place"""
+        enroll(student_user, limited_course)
+        enroll(student_user2, limited_course)
+        path = f"/enrollments/waitlist/{limited_course['id']}?user_id={student_user2['id']}"
+        assert client.delete(path).status_code == 200
+        assert client.delete(path).status_code == 404
+        seats = client.get(f"/courses/{limited_course['id']}/seats").json()
+        assert seats["waitlisted"] == 0
+
+    def test_waitlist_requires_admin(self, student_user, limited_course):
+        """Test that only admins can list a waitlist"""
+        response = client.get(
+            f"/enrollments/waitlist/{limited_course['id']}", params={"admin_id": student_user["id"]}
+        )
+        assert response.status_code == 403
+
+    def test_batch_reports_full_course(self, admin_user, student_user, student_user2, limited_course):
+        """Test that batches stop at the capacity instead of queueing"""
+        response = client.post(
+            f"/enrollments/course/{limited_course['id']}/batch",
+            json={"admin_id": admin_user["id"], "user_ids": [student_user["id"], student_user2["id"]]}
+        )
+        assert [r["status_code"] for r in response.json()["results"]] == [201, 409]
+
+
 class TestEnrollmentEdgeCases:
     """Test enrollment edge cases and complex scenarios"""
     
@@ -553,3 +652,164 @@ class TestEnrollmentEdgeCases:
         # Verify all enrollments
         enrollments = client.get(f"/enrollments/student/{student_user['id']}").json()
         assert len(enrollments) == 5
+
+
+class TestEnrollmentStreaming:
+    """Test NDJSON streaming of enrollment collections"""
+    
+    def test_stream_all_enrollments(self, admin_user, student_user, monkeypatch):
+        """Test that all rows are streamed across several chunks"""
+        monkeypatch.setattr("app.streaming.STREAM_CHUNK_SIZE", 2)
+        for i in range(5):
+            course = db.create_course(title=f"Course {i}", code=f"CS{100 + i}")
+            db.create_enrollment(user_id=student_user["id"], course_id=course.id)
+        
+        response = client.get(
+            "/enrollments/",
+            params={"admin_id": admin_user["id"]},
+            headers={"Accept": "application/x-ndjson"}
+        )
+        assert response.status_code == 200
+        assert response.headers["content-type"].startswith("application/x-ndjson")
+        rows = [json.loads(line) for line in response.text.splitlines()]
+        assert [r["course_id"] for r in rows] == [c.id for c in db.get_all_courses()]
+    
+    def test_stream_respects_limit(self, student_user, admin_user, monkeypatch):
+        """Test that streaming stops at the requested limit"""
+        monkeypatch.setattr("app.streaming.STREAM_CHUNK_SIZE", 2)
+        for i in range(5):
+            course = db.create_course(title=f"Course {i}", code=f"CS{100 + i}")
+            db.create_enrollment(user_id=student_user["id"], course_id=course.id)
+        
+        response = client.get(
+            f"/enrollments/student/{student_user['id']}",
+            params={"limit": 3},
+            headers={"Accept": "application/x-ndjson"}
+        )
+        assert len(response.text.splitlines()) == 3
+    
+    def test_stream_still_requires_admin(self, student_user):
+        """Test that streaming does not bypass role checks"""
+        response = client.get(
+            "/enrollments/",
+            params={"admin_id": student_user["id"]},
+            headers={"Accept": "application/x-ndjson"}
+        )
+        assert response.status_code == 403
+
+
+class TestBulkEnrollment:
+    """Test bulk enrollment endpoints"""
+    
+    def test_admin_enrolls_cohort(self, admin_user, student_user, student_user2, sample_course):
+        """Test enrolling many students in a course with per-item results"""
+        client.post(
+            "/enrollments/",
+            json={"user_id": student_user2["id"], "course_id": sample_course["id"]}
+        )
+        response = client.post(
+            f"/enrollments/course/{sample_course['id']}/batch",
+            json={
+                "admin_id": admin_user["id"],
+                "user_ids": [student_user["id"], student_user2["id"], admin_user["id"], 999,
+                             student_user["id"]]
+            }
+        )
+        assert response.status_code == 200
+        data = response.json()
+        assert data["created"] == 1
+        assert [r["status_code"] for r in data["results"]] == [201, 400, 403, 404, 400]
+        assert data["results"][0]["enrollment"]["user_id"] == student_user["id"]
+        
+        roster = client.get(
+            f"/enrollments/course/{sample_course['id']}",
+            params={"admin_id": admin_user["id"]}
+        ).json()
+        assert len(roster) == 2
+    
+    def test_cohort_enrollment_requires_admin(self, student_user, sample_course):
+        """Test that students cannot bulk enroll others"""
+        response = client.post(
+            f"/enrollments/course/{sample_course['id']}/batch",
+            json={"admin_id": student_user["id"], "user_ids": [student_user["id"]]}
+        )
+        assert response.status_code == 403
+    
+    def test_cohort_enrollment_nonexistent_course(self, admin_user, student_user):
+        """Test bulk enrolling into a missing course"""
+        response = client.post(
+            "/enrollments/course/999/batch",
+            json={"admin_id": admin_user["id"], "user_ids": [student_user["id"]]}
+        )
+        assert response.status_code == 404
+    
+    def test_student_enrolls_in_many_courses(self, student_user, sample_course, sample_course2):
+        """Test a student enrolling in several courses at once"""
+        response = client.post(
+            f"/enrollments/student/{student_user['id']}/batch",
+            json={"course_ids": [sample_course["id"], 999, sample_course2["id"],
+                                 sample_course["id"]]}
+        )
+        assert response.status_code == 200
+        data = response.json()
+        assert data["created"] == 2
+        assert [r["status_code"] for r in data["results"]] == [201, 404, 201, 400]
+        assert len(client.get(f"/enrollments/student/{student_user['id']}").json()) == 2
+    
+    def test_admin_cannot_self_enroll_in_batch(self, admin_user, sample_course):
+        """Test that the student batch route enforces the student role"""
+        response = client.post(
+            f"/enrollments/student/{admin_user['id']}/batch",
+            json={"course_ids": [sample_course["id"]]}
+        )
+        assert response.status_code == 403
+
+
+class TestEnrollmentConditionalGet:
+    """Test ETag / If-None-Match on enrollment listings"""
+
+    def test_student_enrollments_304_until_changed(self, student_user, sample_course, sample_course2):
+        """Test that a student's tag only changes with their enrollments"""
+        url = f"/enrollments/student/{student_user['id']}"
+        client.post("/enrollments/", json={"user_id": student_user["id"], "course_id": sample_course["id"]})
+        etag = client.get(url).headers["etag"]
+        assert client.get(url, headers={"If-None-Match": etag}).status_code == 304
+
+        client.post("/enrollments/", json={"user_id": student_user["id"], "course_id": sample_course2["id"]})
+        response = client.get(url, headers={"If-None-Match": etag})
+        assert response.status_code == 200
+        assert len(response.json()) == 2
+
+    def test_wildcard_requires_existing_row(self, admin_user, student_user, sample_course):
+        """Test that If-None-Match: * does not hide a missing student or course"""
+        wildcard = {"If-None-Match": "*"}
+        url = f"/enrollments/student/{student_user['id']}"
+        assert client.get(url, headers=wildcard).status_code == 304
+        assert client.get("/enrollments/student/999", headers=wildcard).status_code == 404
+        course_url = f"/enrollments/course/{{}}?admin_id={admin_user['id']}"
+        assert client.get(course_url.format(sample_course["id"]), headers=wildcard).status_code == 304
+        assert client.get(course_url.format(999), headers=wildcard).status_code == 404
+
+    def test_other_student_etag_does_not_match(self, student_user):
+        """Test that a student's tag never answers for another id"""
+        etag = client.get(f"/enrollments/student/{student_user['id']}").headers["etag"]
+        response = client.get("/enrollments/student/999", headers={"If-None-Match": etag})
+        assert response.status_code == 404
+
+    def test_other_students_do_not_change_tag(self, student_user, student_user2, sample_course):
+        """Test that per-student versions are independent"""
+        url = f"/enrollments/student/{student_user['id']}"
+        etag = client.get(url).headers["etag"]
+        client.post("/enrollments/", json={"user_id": student_user2["id"], "course_id": sample_course["id"]})
+        assert client.get(url, headers={"If-None-Match": etag}).status_code == 304
+
+    def test_course_delete_changes_tags(self, admin_user, student_user, sample_course):
+        """Test that cascading deletes change student and course tags"""
+        client.post("/enrollments/", json={"user_id": student_user["id"], "course_id": sample_course["id"]})
+        student_url = f"/enrollments/student/{student_user['id']}"
+        course_url = f"/enrollments/course/{sample_course['id']}?admin_id={admin_user['id']}"
+        student_etag = client.get(student_url).headers["etag"]
+        course_etag = client.get(course_url).headers["etag"]
+        client.delete(f"/courses/{sample_course['id']}?admin_id={admin_user['id']}")
+        assert client.get(student_url, headers={"If-None-Match": student_etag}).json() == []
+        assert client.get(course_url, headers={"If-None-Match": course_etag}).status_code == 404
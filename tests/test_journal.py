@@ -0,0 +1,127 @@
+import os
+import time
+import pytest
+from app.database import Database
+from app.journal import enable_durability, list_segments, segment_path
+
+
+@pytest.fixture
+def journal_dir(tmp_path):
+    """Provide an empty journal directory"""
+    return str(tmp_path / "journal")
+
+
+def open_database(directory, **options):
+    database = Database()
+    enable_durability(database, directory, snapshot_interval=3600, **options)
+    return database
+
+
+def populate(database):
+    admin = database.create_user(name="Admin", email="admin@example.com", role="admin")
+    student = database.create_user(name="Student", email="student@example.com", role="student")
+    course = database.create_course(title="Python", code="CS101")
+    doomed = database.create_course(title="Doomed", code="CS999")
+    database.update_course(course.id, title="Advanced Python", code="CS102")
+    database.create_enrollment(user_id=student.id, course_id=course.id)
+    database.create_enrollment(user_id=student.id, course_id=doomed.id)
+    dropped = database.create_enrollment(user_id=admin.id, course_id=course.id)
+    database.delete_enrollment(dropped.id)
+    database.delete_course(doomed.id)
+
+
+def assert_populated(database):
+    assert [u.email for u in database.get_all_users()] == ["admin@example.com", "student@example.com"]
+    assert [(c.title, c.code) for c in database.get_all_courses()] == [("Advanced Python", "CS102")]
+    assert [(e.user_id, e.course_id) for e in database.get_all_enrollments()] == [(2, 1)]
+    assert database.course_code_exists("CS102")
+    assert not database.course_code_exists("CS101")
+
+
+class TestJournalRecovery:
+    """Test journaling and recovery of the in-memory store"""
+
+    def test_recover_from_journal(self, journal_dir):
+        """Test that replaying the journal rebuilds all tables"""
+        database = open_database(journal_dir)
+        populate(database)
+        database.close()
+
+        recovered = open_database(journal_dir)
+        assert_populated(recovered)
+        # Id counters continue where they left off
+        assert recovered.create_course(title="New", code="NEW").id == 3
+        assert recovered.create_enrollment(user_id=2, course_id=3).id == 4
+        recovered.close()
+
+    def test_recover_from_snapshot_and_tail(self, journal_dir):
+        """Test that compaction snapshots state and drops covered segments"""
+        database = open_database(journal_dir)
+        populate(database)
+        database.durability.compact()
+        database.create_user(name="Late", email="late@example.com", role="student")
+        database.close()
+        assert min(list_segments(journal_dir)) > 0
+
+        recovered = open_database(journal_dir)
+        assert len(recovered.get_all_users()) == 3
+        assert [(c.title, c.code) for c in recovered.get_all_courses()] == [("Advanced Python", "CS102")]
+        assert recovered.create_user(name="X", email="x@example.com", role="student").id == 4
+        recovered.close()
+
+    def test_torn_tail_is_ignored(self, journal_dir):
+        """Test that a partially written final record is discarded"""
+        database = open_database(journal_dir)
+        database.create_user(name="A", email="a@example.com", role="student")
+        segment = database.durability.journal.segment
+        database.close()
+        with open(segment_path(journal_dir, segment), "a") as journal:
+            journal.write('{"op":"create_user","id":2,"na')
+
+        recovered = open_database(journal_dir)
+        assert [u.email for u in recovered.get_all_users()] == ["a@example.com"]
+        recovered.close()
+
+    def test_journal_size_triggers_snapshot(self, journal_dir):
+        """Test that a full journal segment wakes the compactor"""
+        database = open_database(journal_dir, max_journal_records=5)
+        for i in range(5):
+            database.create_user(name=str(i), email=f"u{i}@example.com", role="student")
+        snapshot = os.path.join(journal_dir, "snapshot.bin")
+        deadline = time.monotonic() + 5
+        while not os.path.exists(snapshot) and time.monotonic() < deadline:
+            time.sleep(0.01)
+        database.close()
+        assert os.path.exists(snapshot)
+
+        recovered = open_database(journal_dir)
+        assert len(recovered.get_all_users()) == 5
+        recovered.close()
+
+    def test_reset_is_journaled(self, journal_dir):
+        """Test that reset survives a restart"""
+        database = open_database(journal_dir)
+        populate(database)
+        database.reset()
+        database.close()
+
+        recovered = open_database(journal_dir)
+        assert recovered.get_all_users() == []
+        recovered.close()
+
+    def test_waitlist_is_journaled(self, journal_dir):
+        """Test that capacity, queue order and promotions are replayed"""
+        database = open_database(journal_dir)
+        course = database.create_course(title="Python", code="CS101", capacity=1)
+        first = database.try_enroll(1, course.id).enrollment
+        for user_id in (2, 3, 4):
+            database.try_enroll(user_id, course.id)
+        database.leave_waitlist(3, course.id)
+        database.delete_enrollment(first.id)
+        database.close()
+
+        recovered = open_database(journal_dir)
+        assert recovered.get_course(course.id).capacity == 1
+        assert [e.user_id for e in recovered.get_enrollments_by_course(course.id)] == [2]
+        assert recovered.get_waitlist(course.id) == [4]
+        recovered.close()
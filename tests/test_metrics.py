@@ -0,0 +1,100 @@
+import pytest
+from fastapi.testclient import TestClient
+from app.database import db
+from app.main import app, request_metrics
+from app.metrics import CONTENT_TYPE, Histogram, LATENCY_BUCKETS
+
+client = TestClient(app)
+
+
+@pytest.fixture(autouse=True)
+def reset_database():
+    """Reset database and metrics before each test"""
+    db.reset()
+    request_metrics.reset()
+    yield
+    db.reset()
+
+
+def scrape() -> dict:
+    """Parse /metrics into {series: value}, skipping comments"""
+    response = client.get("/metrics")
+    assert response.status_code == 200
+    assert response.headers["content-type"] == CONTENT_TYPE
+    series = {}
+    for line in response.text.splitlines():
+        if line and not line.startswith("#"):
+            name, _, value = line.rpartition(" ")
+            series[name] = float(value)
+    return series
+
+
+class TestRequestMetrics:
+    """Test per-route request counters and histograms"""
+
+    def test_counts_by_route_template_and_status(self):
+        """Test that requests are labelled with the route template"""
+        client.get("/courses/1")
+        client.get("/courses/2")
+        client.get("/courses/")
+        series = scrape()
+        assert series['http_requests_total{method="GET",route="/courses/{course_id}",status="404"}'] == 2
+        assert series['http_requests_total{method="GET",route="/courses/",status="200"}'] == 1
+
+    def test_unknown_paths_share_one_label(self):
+        """Test that unmatched paths cannot create new series"""
+        client.get("/no/such/path")
+        client.get("/another/missing/path")
+        series = scrape()
+        assert series['http_requests_total{method="GET",route="<unmatched>",status="404"}'] == 2
+
+    def test_histogram_buckets_are_cumulative(self):
+        """Test the histogram series for one route"""
+        client.get("/health")
+        series = scrape()
+        labels = 'method="GET",route="/health",status="200"'
+        assert series[f'http_request_duration_seconds_bucket{{{labels},le="+Inf"}}'] == 1
+        assert series[f"http_request_duration_seconds_count{{{labels}}}"] == 1
+        buckets = [
+            series[f'http_request_duration_seconds_bucket{{{labels},le="{bound!r}"}}']
+            for bound in LATENCY_BUCKETS
+        ]
+        assert buckets == sorted(buckets)
+
+    def test_scrape_counts_itself_in_flight(self):
+        """Test that the in-flight gauge sees the running scrape"""
+        series = scrape()
+        assert series['http_requests_in_flight{method="GET",route="/metrics"}'] == 1
+
+    def test_histogram_observe(self):
+        """Test bucket placement at and beyond the bounds"""
+        histogram = Histogram()
+        histogram.observe(LATENCY_BUCKETS[0])
+        histogram.observe(60.0)
+        assert histogram.buckets[0] == 1
+        assert histogram.buckets[-1] == 1
+        assert histogram.count == 2
+
+
+class TestStorageMetrics:
+    """Test storage and cache gauges"""
+
+    def test_table_sizes(self):
+        """Test that table gauges follow the stored rows"""
+        admin = client.post(
+            "/users/", json={"name": "Admin", "email": "admin@example.com", "role": "admin"}
+        ).json()
+        client.post(
+            "/courses/",
+            json={"title": "Algorithms", "code": "CS201", "admin_id": admin["id"]}
+        )
+        series = scrape()
+        assert series['app_table_rows{table="users"}'] == 1
+        assert series['app_table_rows{table="courses"}'] == 1
+        assert series['app_table_rows{table="enrollments"}'] == 0
+
+    def test_role_cache_counters(self):
+        """Test that role cache stats are exported"""
+        series = scrape()
+        assert "app_role_cache_hits_total" in series
+        assert "app_role_cache_entries" in series
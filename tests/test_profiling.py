@@ -0,0 +1,145 @@
+import asyncio
+from types import SimpleNamespace
+import pytest
+from fastapi.testclient import TestClient
+from app.database import db
+from app.main import app
+from app.profiling import (
+    ProfileStore, ProfilingMiddleware, StackProfiler, _Profiled, _frame_name, profile_store
+)
+
+client = TestClient(app)
+profiled_client = TestClient(ProfilingMiddleware(app, store=profile_store))
+
+
+@pytest.fixture(autouse=True)
+def reset_database():
+    """Reset database and stored profiles before each test"""
+    db.reset()
+    profile_store.clear()
+    yield
+    db.reset()
+
+
+@pytest.fixture
+def admin_user():
+    return client.post(
+        "/users/", json={"name": "Admin", "email": "admin@example.com", "role": "admin"}
+    ).json()
+
+
+@pytest.fixture
+def student_user():
+    return client.post(
+        "/users/", json={"name": "Student", "email": "student@example.com", "role": "student"}
+    ).json()
+
+
+class TestStackProfiler:
+    """Test the per-coroutine stack profiler"""
+
+    def test_only_profiled_coroutine_is_recorded(self):
+        """Test that stacks come from the driven coroutine, across awaits"""
+        async def leaf():
+            await asyncio.sleep(0)
+            return sum(range(1000))
+
+        async def handler():
+            return await leaf()
+
+        async def bystander():
+            for _ in range(3):
+                await asyncio.sleep(0)
+
+        async def main(profiler):
+            result, _ = await asyncio.gather(_Profiled(handler(), profiler), bystander())
+            return result
+
+        profiler = StackProfiler()
+        assert asyncio.run(main(profiler)) == sum(range(1000))
+        stacks = profiler.collapsed() + "".join(profiler.root.children)
+        assert "handler" in stacks
+        assert "bystander" not in stacks
+
+    def test_collapsed_format(self):
+        """Test one line per stack with integer microseconds"""
+        profiler = StackProfiler()
+        profiler.start()
+        sorted(range(100000), key=lambda value: -value)
+        profiler.stop()
+        for line in profiler.collapsed().splitlines():
+            stack, _, micros = line.rpartition(" ")
+            assert stack and int(micros) > 0
+        assert profiler.total_ns > 0
+
+    def test_frame_name_without_qualname(self):
+        """Test that code objects from before Python 3.11 fall back to co_name"""
+        frame = SimpleNamespace(f_globals={"__name__": "app.x"}, f_code=SimpleNamespace(co_name="f"))
+        assert _frame_name(frame) == "app.x:f"
+
+
+class TestProfileStore:
+    """Test the bounded profile ring"""
+
+    def test_oldest_profiles_are_dropped(self):
+        """Test that only the latest profiles are kept"""
+        store = ProfileStore(capacity=2)
+        for _ in range(3):
+            store.add({"id": store.next_id(), "stacks": ""})
+        assert [profile["id"] for profile in store.list()] == [3, 2]
+        assert store.get(1) is None
+        assert "stacks" not in store.list()[0]
+
+
+class TestProfilingMiddleware:
+    """Test profiling triggered per request"""
+
+    def test_admin_header_profiles_request(self, admin_user, student_user):
+        """Test that an admin's X-Profile header records a profile"""
+        course = client.post(
+            "/courses/", json={"title": "Algorithms", "code": "CS201", "admin_id": admin_user["id"]}
+        ).json()
+        response = profiled_client.post(
+            "/enrollments/",
+            json={"user_id": student_user["id"], "course_id": course["id"]},
+            headers={"X-Profile": str(admin_user["id"])}
+        )
+        assert response.status_code == 201
+        profile_id = int(response.headers["X-Profile-Id"])
+
+        profiles = client.get(f"/admin/profiles?admin_id={admin_user['id']}").json()
+        assert profiles[0]["id"] == profile_id
+        assert profiles[0]["route"] == "/enrollments/"
+        assert profiles[0]["status"] == 201
+
+        stacks = client.get(f"/admin/profiles/{profile_id}?admin_id={admin_user['id']}")
+        assert stacks.status_code == 200
+        assert "app.routers.enrollments:enroll_student" in stacks.text
+
+    def test_student_header_is_ignored(self, student_user):
+        """Test that non-admins cannot trigger profiling"""
+        response = profiled_client.get("/courses/", headers={"X-Profile": str(student_user["id"])})
+        assert response.status_code == 200
+        assert "X-Profile-Id" not in response.headers
+        assert profile_store.list() == []
+
+    def test_sampling(self):
+        """Test that a sample rate of 1 profiles every request"""
+        sampled_client = TestClient(ProfilingMiddleware(app, store=profile_store, sample_rate=1.0))
+        sampled_client.get("/health")
+        assert profile_store.list()[0]["route"] == "/health"
+
+
+class TestProfileEndpoints:
+    """Test admin access to stored profiles"""
+
+    def test_requires_admin(self, student_user):
+        """Test that students cannot list profiles"""
+        response = client.get(f"/admin/profiles?admin_id={student_user['id']}")
+        assert response.status_code == 403
+
+    def test_unknown_profile(self, admin_user):
+        """Test that a missing profile returns 404"""
+        response = client.get(f"/admin/profiles/999?admin_id={admin_user['id']}")
+        assert response.status_code == 404
+        assert response.json()["detail"] == "Profile not found"
@@ -0,0 +1,109 @@
+import pytest
+from fastapi.testclient import TestClient
+from app.auth import role_cache
+from app.database import db
+from app.main import app
+from app.role_cache import FrequencySketch, RoleCache
+
+client = TestClient(app)
+
+
+@pytest.fixture(autouse=True)
+def reset_database():
+    """Reset database before each test"""
+    db.reset()
+    yield
+    db.reset()
+
+
+class TestRoleCache:
+    """Test the TinyLFU / LRU role cache"""
+
+    def test_hits_and_misses(self):
+        """Test that stats count lookups"""
+        cache = RoleCache(capacity=4)
+        assert cache.get(1) is None
+        cache.put(1, "admin", cache.generation)
+        assert cache.get(1) == "admin"
+        stats = cache.stats()
+        assert (stats["hits"], stats["misses"], stats["size"]) == (1, 1, 1)
+        assert stats["hit_ratio"] == 0.5
+
+    def test_lru_eviction_of_equally_popular_entries(self):
+        """Test that a more frequent newcomer evicts the least recent entry"""
+        cache = RoleCache(capacity=2)
+        for user_id in (1, 2):
+            cache.get(user_id)
+            cache.put(user_id, "student", cache.generation)
+        cache.get(1)
+        for _ in range(3):
+            cache.get(3)
+        cache.put(3, "student", cache.generation)
+        assert cache.get(2) is None
+        assert cache.get(1) == "student"
+        assert cache.stats()["evictions"] == 1
+
+    def test_one_off_ids_are_not_admitted(self):
+        """Test that a scan of cold ids cannot flush a hot entry"""
+        cache = RoleCache(capacity=1)
+        cache.get(1)
+        cache.put(1, "admin", cache.generation)
+        for user_id in range(100, 200):
+            assert cache.get(1) == "admin"
+            cache.get(user_id)
+            cache.put(user_id, "student", cache.generation)
+        assert cache.get(1) == "admin"
+        assert cache.stats()["rejections"] == 100
+
+    def test_stale_fill_is_discarded(self):
+        """Test that fills racing an invalidation are dropped"""
+        cache = RoleCache(capacity=4)
+        generation = cache.generation
+        cache.invalidate()
+        cache.put(1, "admin", generation)
+        assert cache.get(1) is None
+
+    def test_sketch_ages_counts(self):
+        """Test that frequency estimates decay after the sample period"""
+        sketch = FrequencySketch(width=64, sample_size=10)
+        for _ in range(8):
+            sketch.increment(7)
+        assert sketch.estimate(7) == 8
+        sketch.increment(8)
+        sketch.increment(8)
+        assert sketch.estimate(7) == 4
+
+
+class TestRoleChecks:
+    """Test the shared role checks used by the routers"""
+
+    def test_admin_checks_are_cached(self):
+        """Test that repeated admin checks skip the user lookup"""
+        admin = client.post(
+            "/users/", json={"name": "Admin", "email": "admin@example.com", "role": "admin"}
+        ).json()
+        client.get(f"/enrollments/?admin_id={admin['id']}")
+        hits = role_cache.stats()["hits"]
+        assert client.get(f"/enrollments/?admin_id={admin['id']}").status_code == 200
+        assert role_cache.stats()["hits"] == hits + 1
+
+    def test_reset_invalidates_roles(self):
+        """Test that an id reused after a reset gets its new role"""
+        admin = client.post(
+            "/users/", json={"name": "Admin", "email": "admin@example.com", "role": "admin"}
+        ).json()
+        assert client.get(f"/enrollments/?admin_id={admin['id']}").status_code == 200
+        db.reset()
+        student = client.post(
+            "/users/", json={"name": "Student", "email": "student@example.com", "role": "student"}
+        ).json()
+        assert student["id"] == admin["id"]
+        assert client.get(f"/enrollments/?admin_id={student['id']}").status_code == 403
+
+    def test_unknown_user_is_not_cached(self):
+        """Test that a missing user is looked up again once created"""
+        assert client.get("/enrollments/?admin_id=1").status_code == 404
+        client.post(
+            "/users/", json={"name": "Admin", "email": "admin@example.com", "role": "admin"}
+        )
+        assert client.get("/enrollments/?admin_id=1").status_code == 200
@@ -0,0 +1,147 @@
+import pytest
+from app.database import Database
+from app.snapshot import MappedSnapshot, write_snapshot
+
+
+@pytest.fixture
+def snapshot_path(tmp_path):
+    """Write a snapshot of a small populated database and return its path"""
+    database = Database()
+    database.create_user(name="Admin", email="admin@example.com", role="admin")
+    database.create_user(name="Zoë", email="zoe@example.com", role="student")
+    database.create_user(name="Bob", email="bob@example.com", role="student")
+    database.create_course(title="Python", code="CS101")
+    database.create_course(title="Databases", code="DB200")
+    database.create_enrollment(user_id=2, course_id=1)
+    database.create_enrollment(user_id=3, course_id=1)
+    database.create_enrollment(user_id=2, course_id=2)
+    path = str(tmp_path / "snapshot.bin")
+    write_snapshot(path, database.export_state(), segment=7)
+    return path
+
+
+def attached(path, **options):
+    database = Database(**options)
+    database.attach_snapshot(MappedSnapshot(path))
+    return database
+
+
+class TestSnapshotReads:
+    """Test lookups served from a mapped snapshot"""
+
+    def test_header(self, snapshot_path):
+        """Test that the segment and id counters round-trip"""
+        snapshot = MappedSnapshot(snapshot_path)
+        assert snapshot.segment == 7
+        assert snapshot.counters == {"user": 4, "course": 3, "enrollment": 4}
+        assert not snapshot.normalize_keys
+
+    def test_rows_materialize_on_access(self, snapshot_path):
+        """Test that rows are only built when looked up"""
+        database = attached(snapshot_path)
+        assert database.users.cache == {}
+        user = database.get_user(2)
+        assert (user.name, user.email, user.role) == ("Zoë", "zoe@example.com", "student")
+        assert database.get_user(2) is user
+        assert database.get_user(99) is None
+        assert list(database.users.cache) == [2]
+
+    def test_indexes(self, snapshot_path):
+        """Test the unique, per-student, per-course and pair indexes"""
+        database = attached(snapshot_path)
+        assert database.email_exists("bob@example.com")
+        assert not database.email_exists("carol@example.com")
+        assert database.course_code_exists("DB200")
+        assert not database.course_code_exists("DB200", exclude_id=2)
+        assert [e.course_id for e in database.get_enrollments_by_student(2)] == [1, 2]
+        assert [e.user_id for e in database.get_enrollments_by_course(1)] == [2, 3]
+        assert database.enrollment_exists(3, 1)
+        assert not database.enrollment_exists(3, 2)
+
+    def test_pagination(self, snapshot_path):
+        """Test keyset pagination over mapped rows"""
+        database = attached(snapshot_path)
+        assert [u.id for u in database.get_all_users(after_id=1, limit=1)] == [2]
+        assert [c.code for c in database.get_all_courses()] == ["CS101", "DB200"]
+
+    def test_normalize_keys_mismatch(self, snapshot_path):
+        """Test that a snapshot must match the key normalization setting"""
+        with pytest.raises(ValueError):
+            attached(snapshot_path, normalize_keys=True)
+
+
+class TestSnapshotWrites:
+    """Test mutations on top of a mapped snapshot"""
+
+    def test_create_continues_counters(self, snapshot_path):
+        """Test that new rows get fresh ids and are indexed"""
+        database = attached(snapshot_path)
+        user = database.create_user(name="Carol", email="carol@example.com", role="student")
+        assert user.id == 4
+        assert database.try_create_user("Again", "carol@example.com", "student") is None
+        assert database.create_enrollment(user_id=user.id, course_id=2).id == 4
+        assert [e.user_id for e in database.get_enrollments_by_course(2)] == [2, 4]
+        assert [u.id for u in database.get_all_users()] == [1, 2, 3, 4]
+
+    def test_update_course(self, snapshot_path):
+        """Test that updates free the old code and persist in the cache"""
+        database = attached(snapshot_path)
+        database.update_course(1, title="Advanced Python", code="CS102")
+        assert database.get_course(1).title == "Advanced Python"
+        assert not database.course_code_exists("CS101")
+        assert database.course_code_exists("CS102")
+
+    def test_delete_course_cascades(self, snapshot_path):
+        """Test that deleting a mapped course removes its enrollments"""
+        database = attached(snapshot_path)
+        assert database.enrollment_exists(2, 1) and database.enrollment_exists(2, 2)
+        assert database.delete_course(1) == 2
+        assert database.get_course(1) is None
+        assert not database.enrollment_exists(2, 1)
+        assert [e.id for e in database.get_all_enrollments()] == [3]
+        assert [e.id for e in database.get_enrollments_by_student(3)] == []
+
+    def test_delete_does_not_materialize_rows(self, snapshot_path):
+        """Test that compacting the id order after deletes builds no rows"""
+        database = attached(snapshot_path)
+        course = database.create_course(title="Compilers", code="CS400")
+        database.delete_course(1)
+        database.delete_course(course.id)
+        assert 2 in database.courses
+        assert database.courses.cache == {}
+        assert [c.id for c in database.get_all_courses()] == [2]
+
+    def test_delete_enrollment(self, snapshot_path):
+        """Test that a deleted pair can be enrolled again"""
+        database = attached(snapshot_path)
+        assert database.delete_enrollment(2)
+        assert not database.enrollment_exists(3, 1)
+        assert database.create_enrollment(user_id=3, course_id=1).id == 4
+
+    def test_snapshot_of_attached_database(self, snapshot_path, tmp_path):
+        """Test that an attached database with changes can be re-snapshotted"""
+        database = attached(snapshot_path)
+        database.create_course(title="Networks", code="NET300")
+        database.delete_enrollment(1)
+        path = str(tmp_path / "second.bin")
+        write_snapshot(path, database.export_state())
+
+        reloaded = attached(path)
+        assert [c.code for c in reloaded.get_all_courses()] == ["CS101", "DB200", "NET300"]
+        assert [e.id for e in reloaded.get_all_enrollments()] == [2, 3]
+
+    def test_capacity_and_waitlists_round_trip(self, snapshot_path, tmp_path):
+        """Test that seat limits and queue order survive a snapshot"""
+        database = attached(snapshot_path)
+        course = database.create_course(title="Networks", code="NET300", capacity=1)
+        for user_id in (2, 3, 1):
+            database.try_enroll(user_id, course.id)
+        path = str(tmp_path / "second.bin")
+        write_snapshot(path, database.export_state())
+
+        reloaded = attached(path)
+        assert reloaded.get_course(1).capacity is None
+        assert reloaded.get_course(course.id).capacity == 1
+        assert reloaded.get_waitlist(course.id) == [3, 1]
+        assert reloaded.delete_enrollment(4)
+        assert [e.user_id for e in reloaded.get_enrollments_by_course(course.id)] == [3]
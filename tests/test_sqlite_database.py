@@ -0,0 +1,178 @@
+from concurrent.futures import ThreadPoolExecutor
+import sqlite3
+import pytest
+from app.records import ENROLLED, WAITLISTED, ALREADY_ENROLLED, COURSE_FULL, COURSE_NOT_FOUND
+from app.sqlite_database import SQLiteDatabase
+
+
+@pytest.fixture
+def database(tmp_path):
+    """Provide a fresh SQLite database file"""
+    database = SQLiteDatabase(str(tmp_path / "test.db"))
+    yield database
+    database.close()
+
+
+class TestSQLiteStorage:
+    """Test the SQLite storage backend"""
+
+    def test_uses_wal_mode(self, database):
+        """Test that connections run in write-ahead log mode"""
+        mode = database.pool.get().execute("PRAGMA journal_mode").fetchone()[0]
+        assert mode == "wal"
+
+    def test_user_roundtrip_and_unique_email(self, database):
+        """Test creating and reading users with email uniqueness"""
+        user = database.try_create_user(name="A", email="a@example.com", role="student")
+        assert database.get_user(user.id) == user
+        assert database.email_exists("a@example.com")
+        assert database.try_create_user(name="B", email="a@example.com", role="admin") is None
+        created = database.create_users([
+            ("C", "c@example.com", "student"),
+            ("D", "a@example.com", "student"),
+            ("E", "c@example.com", "student")
+        ])
+        assert [u is not None for u in created] == [True, False, False]
+
+    def test_course_code_uniqueness_on_update(self, database):
+        """Test that code conflicts are enforced by the schema"""
+        database.create_course(title="A", code="A")
+        course = database.create_course(title="B", code="B")
+        assert database.try_update_course(course.id, title="B", code="A") is None
+        assert database.course_code_exists("A", exclude_id=course.id)
+        assert not database.course_code_exists("B", exclude_id=course.id)
+        assert database.try_update_course(999, title="X", code="X") is None
+
+    def test_delete_course_cascades(self, database):
+        """Test that enrollments are removed by the foreign key cascade"""
+        course = database.create_course(title="A", code="A")
+        other = database.create_course(title="B", code="B")
+        database.create_enrollment(user_id=1, course_id=course.id)
+        database.create_enrollment(user_id=2, course_id=course.id)
+        kept = database.create_enrollment(user_id=1, course_id=other.id)
+        assert database.delete_course(course.id) == 2
+        assert database.delete_course(course.id) is None
+        assert database.get_all_enrollments() == [kept]
+
+    def test_enrollment_lookups_and_paging(self, database):
+        """Test indexed enrollment lookups with keyset paging"""
+        courses = [database.create_course(title=str(i), code=str(i)) for i in range(4)]
+        ids = [database.create_enrollment(user_id=1, course_id=c.id).id for c in courses]
+        database.create_enrollment(user_id=2, course_id=courses[0].id)
+        page = database.get_enrollments_by_student(1, after_id=ids[0], limit=2)
+        assert [e.id for e in page] == ids[1:3]
+        assert len(database.get_enrollments_by_course(courses[0].id)) == 2
+        assert database.enrollment_exists(2, courses[0].id)
+        assert database.try_create_enrollment(2, courses[0].id) is None
+        assert database.try_create_enrollment(2, 999) is None
+
+    def test_reset_restarts_ids(self, database):
+        """Test that reset clears rows and id sequences"""
+        database.create_user(name="A", email="a@example.com", role="student")
+        database.reset()
+        assert database.get_all_users() == []
+        user = database.create_user(name="A", email="a@example.com", role="student")
+        assert user.id == 1
+
+    def test_normalized_keys(self, tmp_path):
+        """Test case-folded uniqueness"""
+        database = SQLiteDatabase(str(tmp_path / "normalized.db"), normalize_keys=True)
+        database.create_course(title="A", code="cs101")
+        assert database.try_create_course(title="B", code="CS101") is None
+        database.close()
+
+    def test_concurrent_enrollment_is_not_duplicated(self, database):
+        """Test that concurrent threads cannot create duplicate pairs"""
+        course = database.create_course(title="A", code="A")
+        with ThreadPoolExecutor(max_workers=8) as pool:
+            results = list(pool.map(
+                lambda _: database.try_create_enrollment(1, course.id), range(50)
+            ))
+        assert sum(r is not None for r in results) == 1
+
+    def test_versions_follow_changes(self, database):
+        """Test that triggers keep per-table and per-set change counters"""
+        database.create_user(name="A", email="a@example.com", role="student")
+        course = database.create_course(title="A", code="A")
+        courses_version = database.get_table_version("courses")
+        database.create_enrollment(user_id=1, course_id=course.id)
+        student_version = database.get_student_enrollments_version(1)
+        assert database.get_student_enrollments_version(2) == 0
+        database.delete_course(course.id)
+        assert database.get_table_version("courses") > courses_version
+        assert database.get_student_enrollments_version(1) > student_version
+        users_version = database.get_table_version("users")
+        database.reset()
+        assert database.get_student_enrollments_version(1) > student_version
+        assert database.get_table_version("users") > users_version
+
+    def test_capacity_and_waitlist(self, database):
+        """Test seat limits, FIFO promotion and leaving the queue"""
+        course = database.create_course(title="A", code="A", capacity=1)
+        first = database.try_enroll(1, course.id)
+        assert first.status == ENROLLED
+        assert [database.try_enroll(u, course.id).position for u in (2, 3, 4)] == [1, 2, 3]
+        assert database.try_enroll(1, course.id).status == ALREADY_ENROLLED
+        assert database.try_create_enrollment(5, course.id) is None
+        assert database.leave_waitlist(3, course.id)
+        assert database.delete_enrollment(first.enrollment.id)
+        assert [e.user_id for e in database.get_enrollments_by_course(course.id)] == [2]
+        assert database.get_waitlist(course.id) == [4]
+        assert database.get_waitlist_position(4, course.id) == 1
+        assert database.get_seats(course.id) == (1, 1, 1)
+        assert database.update_course(course.id, title="B", code="A").capacity == 1
+        assert database.get_seats(course.id) == (1, 1, 1)
+        database.update_course(course.id, title="A", code="A", capacity=5)
+        assert database.get_seats(course.id) == (5, 2, 0)
+
+    def test_batch_reports_skip_reasons(self, database):
+        """Test that batch inserts report why each skipped pair failed"""
+        course = database.create_course(title="A", code="A", capacity=2)
+        database.try_enroll(1, course.id)
+        outcomes = database.create_enrollments(
+            [(1, course.id), (2, course.id), (2, course.id), (3, course.id), (3, 999)]
+        )
+        assert [o.status for o in outcomes] == [
+            ALREADY_ENROLLED, ENROLLED, ALREADY_ENROLLED, COURSE_FULL, COURSE_NOT_FOUND
+        ]
+        assert outcomes[1].enrollment.user_id == 2
+
+    def test_seat_counts_do_not_bump_course_version(self, database):
+        """Test that enrollments leave course ETags alone"""
+        course = database.create_course(title="A", code="A", capacity=2)
+        version = database.get_table_version("courses")
+        database.try_enroll(1, course.id)
+        assert database.get_table_version("courses") == version
+
+    def test_concurrent_enrollment_never_oversells(self, database):
+        """Test that racing threads fill exactly the capacity"""
+        course = database.create_course(title="A", code="A", capacity=5)
+        with ThreadPoolExecutor(max_workers=8) as pool:
+            outcomes = list(pool.map(lambda i: database.try_enroll(i, course.id), range(40)))
+        assert sum(o.status == ENROLLED for o in outcomes) == 5
+        assert sorted(o.position for o in outcomes if o.status == WAITLISTED) == list(range(1, 36))
+
+    def test_migrates_files_without_capacity(self, tmp_path):
+        """Test that older files gain the capacity columns and seat counts"""
+        path = str(tmp_path / "old.db")
+        connection = sqlite3.connect(path)
+        connection.executescript("""
+            CREATE TABLE courses (
+                id INTEGER PRIMARY KEY AUTOINCREMENT, title TEXT NOT NULL,
+                code TEXT NOT NULL, code_key TEXT NOT NULL UNIQUE
+            );
+            CREATE TABLE enrollments (
+                id INTEGER PRIMARY KEY AUTOINCREMENT, user_id INTEGER NOT NULL,
+                course_id INTEGER NOT NULL REFERENCES courses(id) ON DELETE CASCADE,
+                UNIQUE (user_id, course_id)
+            );
+            INSERT INTO courses (title, code, code_key) VALUES ('A', 'A', 'A');
+            INSERT INTO enrollments (user_id, course_id) VALUES (1, 1), (2, 1);
+        """)
+        connection.close()
+        database = SQLiteDatabase(path)
+        assert database.get_course(1).capacity is None
+        database.update_course(1, title="A", code="A", capacity=2)
+        assert database.try_enroll(3, 1).status == WAITLISTED
+        assert database.get_seats(1) == (2, 2, 1)
+        database.close()
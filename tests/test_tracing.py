@@ -0,0 +1,195 @@
+import asyncio
+import pytest
+from fastapi.testclient import TestClient
+from app.async_database import AsyncDatabase
+from app.database import Database, db
+from app.main import app
+from app.sqlite_database import SQLiteDatabase
+from app.tracing import RequestTrace, StorageStats, current_request, storage_stats
+
+client = TestClient(app)
+
+
+@pytest.fixture(autouse=True)
+def reset_database():
+    """Reset database and storage stats before each test"""
+    db.reset()
+    storage_stats.reset()
+    yield
+    db.reset()
+
+
+@pytest.fixture
+def admin_user():
+    return client.post(
+        "/users/", json={"name": "Admin", "email": "admin@example.com", "role": "admin"}
+    ).json()
+
+
+def stats_by_method(summary):
+    return {entry["method"]: entry for entry in summary}
+
+
+class TestStorageStats:
+    """Test per-method storage call accounting"""
+
+    def test_rows_examined_versus_returned(self):
+        """Test that scans report more rows examined than returned"""
+        backend = Database()
+        stats = StorageStats()
+        database = AsyncDatabase(backend, max_blocking_calls=1, stats=stats)
+        student = backend.create_user("Student", "student@example.com", "student")
+        courses = [backend.create_course(f"Course {i}", f"C{i}") for i in range(5)]
+        for course in courses:
+            backend.create_enrollment(student.id, course.id)
+
+        async def run():
+            await database.get_enrollments_by_student(student.id)
+            await database.enrollment_exists(student.id, courses[-1].id)
+            await database.get_user(999)
+
+        asyncio.run(run())
+        summary = stats_by_method(stats.summary())
+        assert summary["get_enrollments_by_student"]["rows_returned"] == 5
+        assert summary["get_enrollments_by_student"]["rows_examined"] == 5
+        # The pair index answers without scanning either side
+        assert summary["enrollment_exists"]["rows_examined"] == 1
+        assert summary["enrollment_exists"]["rows_returned"] == 1
+        assert summary["get_user"]["rows_returned"] == 0
+        assert summary["get_user"]["examined_per_returned"] is None
+        assert all(entry["calls"] == 1 for entry in summary.values())
+
+    def test_tombstones_count_as_examined(self):
+        """Test that paging past deleted slots reports them as examined"""
+        backend = Database()
+        stats = StorageStats()
+        database = AsyncDatabase(backend, max_blocking_calls=1, stats=stats)
+        course = backend.create_course("Course", "C1")
+        enrollments = [backend.create_enrollment(user_id, course.id) for user_id in range(1, 11)]
+        for enrollment in enrollments[:4]:
+            backend.delete_enrollment(enrollment.id)
+
+        async def run():
+            await database.get_all_enrollments(limit=3)
+            await database.create_enrollments([(5, course.id), (11, course.id), (11, 999)])
+
+        asyncio.run(run())
+        summary = stats_by_method(stats.summary())
+        assert summary["get_all_enrollments"]["rows_examined"] == 7
+        assert summary["get_all_enrollments"]["rows_returned"] == 3
+        # Skipped pairs are not returned rows
+        assert summary["create_enrollments"]["rows_returned"] == 1
+
+    def test_sqlite_scan_counts_examined(self, tmp_path):
+        """Test that SQLite reports an unindexed scan as examining more than it returns"""
+        backend = SQLiteDatabase(str(tmp_path / "traced.db"), trace_steps=True)
+        stats = StorageStats()
+        database = AsyncDatabase(backend, max_blocking_calls=1, stats=stats)
+        try:
+            backend.create_users([(f"Student {i}", f"s{i}@example.com", "student") for i in range(20)])
+            backend.create_courses([(f"Course {i}", f"C{i}", None) for i in range(50)])
+            backend.create_enrollments(
+                [(user_id, course_id) for user_id in range(1, 21) for course_id in range(1, 51)]
+            )
+
+            asyncio.run(database.get_enrollments_by_course(1))
+            indexed = stats_by_method(stats.summary())["get_enrollments_by_course"]
+            assert indexed["rows_returned"] == 20
+            assert indexed["rows_examined"] < 2 * indexed["rows_returned"]
+
+            stats.reset()
+            backend.pool.get().execute("DROP INDEX enrollments_by_course")
+            asyncio.run(database.get_enrollments_by_course(1))
+            scan = stats_by_method(stats.summary())["get_enrollments_by_course"]
+            assert scan["rows_returned"] == 20
+            assert scan["rows_examined"] > 5 * scan["rows_returned"]
+        finally:
+            backend.close()
+
+    def test_untraced_facade(self):
+        """Test that a facade without stats records nothing"""
+        database = AsyncDatabase(Database(), max_blocking_calls=1)
+        assert asyncio.run(database.get_user(1)) is None
+
+    def test_server_timing_value(self):
+        """Test the Server-Timing header format"""
+        trace = RequestTrace()
+        trace.add("get_user", 1_500_000)
+        trace.add("get_user", 500_000)
+        assert trace.server_timing(5_000_000) == (
+            'storage;dur=2.000;desc="2 calls", '
+            'storage.get_user;dur=2.000;desc="2 calls", '
+            'total;dur=5.000'
+        )
+
+    def test_request_trace_is_per_request(self):
+        """Test that no trace is active outside a request"""
+        assert current_request.get() is None
+
+
+class TestStorageTracingEndpoints:
+    """Test the Server-Timing header and admin statistics"""
+
+    def test_server_timing_header(self, admin_user):
+        """Test that responses break down storage time per method"""
+        response = client.get(f"/users/{admin_user['id']}")
+        header = response.headers["Server-Timing"]
+        assert header.startswith('storage;dur=')
+        assert 'storage.get_user;dur=' in header
+        assert "total;dur=" in header
+
+    def test_course_delete_counts_cascade(self, admin_user):
+        """Test that a cascade delete reports the enrollments it examined"""
+        course = client.post(
+            "/courses/", json={"title": "Algorithms", "code": "CS201", "admin_id": admin_user["id"]}
+        ).json()
+        for i in range(3):
+            student = client.post(
+                "/users/",
+                json={"name": f"Student {i}", "email": f"s{i}@example.com", "role": "student"}
+            ).json()
+            client.post("/enrollments/", json={"user_id": student["id"], "course_id": course["id"]})
+        client.delete(f"/courses/{course['id']}?admin_id={admin_user['id']}")
+
+        response = client.get(f"/admin/storage?admin_id={admin_user['id']}")
+        assert response.status_code == 200
+        summary = stats_by_method(response.json())
+        if db.__class__ is Database:
+            assert summary["delete_course"]["rows_examined"] == 4
+        assert summary["delete_course"]["calls"] == 1
+
+    def test_reset(self, admin_user):
+        """Test that admins can reset the totals"""
+        client.get(f"/users/{admin_user['id']}")
+        response = client.delete(f"/admin/storage?admin_id={admin_user['id']}")
+        assert response.status_code == 200
+        assert response.json()["detail"] == "Storage statistics reset"
+        summary = stats_by_method(client.get(f"/admin/storage?admin_id={admin_user['id']}").json())
+        assert "get_user" not in summary
+
+    def test_requires_admin(self):
+        """Test that students cannot read the totals"""
+        student = client.post(
+            "/users/", json={"name": "Student", "email": "student@example.com", "role": "student"}
+        ).json()
+        response = client.get(f"/admin/storage?admin_id={student['id']}")
+        assert response.status_code == 403
+
+    def test_exported_as_metrics(self, admin_user):
+        """Test that storage totals appear on /metrics"""
+        client.get(f"/users/{admin_user['id']}")
+        text = client.get("/metrics").text
+        assert 'app_storage_calls_total{method="get_user"}' in text
+
+    def test_reset_keeps_metric_counters(self, admin_user):
+        """Test that an admin reset never makes the exported counters go backwards"""
+        def get_user_calls() -> float:
+            for line in client.get("/metrics").text.splitlines():
+                if line.startswith('app_storage_calls_total{method="get_user"}'):
+                    return float(line.rpartition(" ")[2])
+            return 0.0
+
+        client.get(f"/users/{admin_user['id']}")
+        before = get_user_calls()
+        client.delete(f"/admin/storage?admin_id={admin_user['id']}")
+        assert get_user_calls() >= before > 0
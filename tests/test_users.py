@@ -185,6 +185,151 @@ class TestUserRetrieval:
         response = client.get("/users/999")
         assert response.status_code == 404
         assert "not found" in response.json()["detail"].lower()
+    
+    def test_wildcard_etag_requires_existing_user(self):
+        """Test that If-None-Match: * only matches a user that exists"""
+        user = db.create_user(name="Test User", email="test@example.com", role="student")
+        wildcard = {"If-None-Match": "*"}
+        assert client.get(f"/users/{user.id}", headers=wildcard).status_code == 304
+        assert client.get("/users/999", headers=wildcard).status_code == 404
+    
+    def test_other_user_etag_does_not_match(self):
+        """Test that one user's ETag never answers for another id"""
+        user = db.create_user(name="Test User", email="test@example.com", role="student")
+        etag = client.get(f"/users/{user.id}").headers["etag"]
+        assert client.get("/users/999", headers={"If-None-Match": etag}).status_code == 404
+
+
+class TestUserBatchCreation:
+    """Test bulk user creation endpoint"""
+    
+    @pytest.fixture
+    def admin_id(self):
+        return db.create_user(name="Admin", email="admin@example.com", role="admin").id
+    
+    def test_create_users_batch(self, admin_id):
+        """Test creating several users in one request"""
+        response = client.post(
+            "/users/batch",
+            json={
+                "admin_id": admin_id,
+                "users": [
+                    {"name": f"User {i}", "email": f"user{i}@example.com", "role": "student"}
+                    for i in range(3)
+                ]
+            }
+        )
+        assert response.status_code == 200
+        data = response.json()
+        assert data["created"] == 3
+        assert [r["status_code"] for r in data["results"]] == [201, 201, 201]
+        assert len(client.get("/users/").json()) == 4
+    
+    def test_batch_reports_duplicates_per_item(self, admin_id):
+        """Test that stored and in-batch duplicate emails fail individually"""
+        db.create_user(name="Existing", email="taken@example.com", role="student")
+        response = client.post(
+            "/users/batch",
+            json={
+                "admin_id": admin_id,
+                "users": [
+                    {"name": "A", "email": "taken@example.com", "role": "student"},
+                    {"name": "B", "email": "new@example.com", "role": "student"},
+                    {"name": "C", "email": "new@example.com", "role": "admin"}
+                ]
+            }
+        )
+        data = response.json()
+        assert data["created"] == 1
+        assert [r["status_code"] for r in data["results"]] == [400, 201, 400]
+        assert data["results"][1]["user"]["name"] == "B"
+        assert "already registered" in data["results"][2]["detail"].lower()
+    
+    def test_batch_invalid_item_rejects_payload(self, admin_id):
+        """Test that a validation error anywhere rejects the whole batch"""
+        response = client.post(
+            "/users/batch",
+            json={
+                "admin_id": admin_id,
+                "users": [
+                    {"name": "A", "email": "a@example.com", "role": "student"},
+                    {"name": "B", "email": "not-an-email", "role": "student"}
+                ]
+            }
+        )
+        assert response.status_code == 422
+        assert len(client.get("/users/").json()) == 1
+    
+    def test_batch_requires_admin(self):
+        """Test that a non-admin cannot create users in bulk"""
+        student = db.create_user(name="Student", email="student@example.com", role="student")
+        response = client.post(
+            "/users/batch",
+            json={
+                "admin_id": student.id,
+                "users": [{"name": "A", "email": "a@example.com", "role": "admin"}]
+            }
+        )
+        assert response.status_code == 403
+        assert len(client.get("/users/").json()) == 1
+
+
+class TestUserPagination:
+    """Test keyset pagination of the user list"""
+    
+    def test_paginate_users(self):
+        """Test walking the user list page by page"""
+        for i in range(5):
+            client.post(
+                "/users/",
+                json={
+                    "name": f"User {i}",
+                    "email": f"user{i}@example.com",
+                    "role": "student"
+                }
+            )
+        
+        names = []
+        cursor = None
+        pages = 0
+        while True:
+            params = {"limit": 2}
+            if cursor:
+                params["cursor"] = cursor
+            response = client.get("/users/", params=params)
+            assert response.status_code == 200
+            names.extend(u["name"] for u in response.json())
+            pages += 1
+            cursor = response.headers.get("x-next-cursor")
+            if not cursor:
+                break
+        
+        assert pages == 3
+        assert names == [f"User {i}" for i in range(5)]
+    
+    def test_cursor_stable_across_deletes_and_inserts(self):
+        """Test that a cursor resumes after its row even if the table changes"""
+        for i in range(3):
+            db.create_user(name=f"User {i}", email=f"user{i}@example.com", role="student")
+        
+        first = client.get("/users/", params={"limit": 1})
+        cursor = first.headers["x-next-cursor"]
+        db.create_user(name="Late", email="late@example.com", role="student")
+        
+        response = client.get("/users/", params={"limit": 10, "cursor": cursor})
+        assert [u["name"] for u in response.json()] == ["User 1", "User 2", "Late"]
+        assert "x-next-cursor" not in response.headers
+    
+    def test_invalid_cursor(self):
+        """Test that malformed cursors are rejected"""
+        response = client.get("/users/", params={"cursor": "not-a-cursor"})
+        assert response.status_code == 400
+        assert "cursor" in response.json()["detail"].lower()
+    
+    def test_invalid_limit(self):
+        """Test that out-of-range limits fail validation"""
+        response = client.get("/users/", params={"limit": 0})
+        assert response.status_code == 422
 
 
 class TestUserValidation: